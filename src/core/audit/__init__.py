@@ -1,6 +1,6 @@
 # пакет аудита (спринт 5): подписка на события, подпись, форматирование, проверка
 
-from .audit_logger import register
+from .audit_logger import flush, register, shutdown
 from .integrity import verify_integrity
 
-__all__ = ["register", "verify_integrity"]
+__all__ = ["flush", "register", "shutdown", "verify_integrity"]
@@ -2,15 +2,26 @@
 
 import hashlib
 import json
+import threading
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from core import events
+from core.crypto import key_storage
 from core.key_manager import get_encryption_key
 from database import db
 
+from .audit_writer import AuditWriter
+from . import merkle, signer_cache
 from .log_signer import AuditLogSigner, derive_audit_signing_key
 
+# хвост цепочки (путь к БД, previous_hash следующей строки, последний sequence_number)
+# держится в памяти, чтобы пачка не читала get_audit_tail на каждое событие
+_chain_lock = threading.Lock()
+_tail = None
+# фоновый писатель; None — события пишутся синхронно (как в _log_event)
+_writer: Optional[AuditWriter] = None
+
 
 def _iso_utc() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -36,9 +47,10 @@ def _build_payload(
     details: Optional[str],
     previous_hash: str,
     sequence_number: int,
+    timestamp: Optional[str] = None,
 ) -> bytes:
     body: Dict[str, Any] = {
-        "timestamp": _iso_utc(),
+        "timestamp": timestamp or _iso_utc(),
         "event_type": event_type,
         "severity": _severity_for_event(event_type),
         "user_id": "local",
@@ -51,69 +63,183 @@ def _build_payload(
     return json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")
 
 
+def _signer_for(ek) -> AuditLogSigner:
+    # подписчик сессии (HKDF уже выполнен при входе); без сессии — вывод ключа на месте
+    cached = signer_cache.get_session_signer(ek)
+    if cached is not None:
+        return cached
+    sk = derive_audit_signing_key(ek)
+    return AuditLogSigner(sk if sk else b"__no_session_audit_hmac_dev_only__")
+
+
+def _tail_from_db():
+    from .integrity import entry_hash_for_chain
+
+    prev_row = db.get_audit_tail()
+    if prev_row and prev_row.get("entry_data"):
+        prev_hash = entry_hash_for_chain(
+            prev_row["entry_data"] if isinstance(prev_row["entry_data"], bytes) else b"",
+            str(prev_row.get("signature") or ""),
+        )
+        return prev_hash, int(prev_row.get("sequence_number") or prev_row.get("id") or 0)
+    return "0" * 64, 0
+
+
 def _log_event(event_type: str, entry_id=None, details=None):
+    # синхронная запись одной строки (хвост всегда читается из БД)
+    global _tail
     try:
-        ek = get_encryption_key()
-        sk = derive_audit_signing_key(ek)
-        signer = AuditLogSigner(sk if sk else b"__no_session_audit_hmac_dev_only__")
+        signer = _signer_for(get_encryption_key())
 
         from .integrity import entry_hash_for_chain
 
-        prev_row = db.get_audit_tail()
-        if prev_row and prev_row.get("entry_data"):
-            prev_hash = entry_hash_for_chain(
-                prev_row["entry_data"] if isinstance(prev_row["entry_data"], bytes) else b"",
-                str(prev_row.get("signature") or ""),
+        with _chain_lock:
+            prev_hash, last_seq = _tail_from_db()
+            seq = last_seq + 1
+
+            payload = _build_payload(event_type, entry_id, details, prev_hash, seq)
+            signature = signer.sign(prev_hash.encode("utf-8") + b"|" + payload)
+
+            db.insert_audit_log(
+                event_type,
+                entry_id,
+                details or "",
+                previous_hash=prev_hash,
+                entry_data=payload,
+                signature=signature,
+                sequence_number=seq,
             )
-            seq = int(prev_row.get("sequence_number") or prev_row.get("id") or 0) + 1
-        else:
-            prev_hash = "0" * 64
-            seq = 1
-
-        payload = _build_payload(event_type, entry_id, details, prev_hash, seq)
-        signature = signer.sign(prev_hash.encode("utf-8") + b"|" + payload)
-
-        db.insert_audit_log(
-            event_type,
-            entry_id,
-            details or "",
-            previous_hash=prev_hash,
-            entry_data=payload,
-            signature=signature,
-            sequence_number=seq,
-        )
+            _tail = (db.get_db_path(), entry_hash_for_chain(payload, signature), seq)
+            _seal_if_boundary(signer, last_seq, seq)
+    except Exception:
+        with _chain_lock:
+            _tail = None
+
+
+def _seal_if_boundary(signer: AuditLogSigner, before_seq: int, after_seq: int):
+    # запись заполнила сегмент — корень Меркла считается и подписывается сразу, но только у сегментов
+    # со строками before_seq+1..after_seq (их только что записали мы); старые — в _save_checkpoint
+    if after_seq // merkle.SEGMENT_SIZE == before_seq // merkle.SEGMENT_SIZE:
+        return
+    try:
+        merkle.seal_segments(signer, up_to_sequence=after_seq, from_sequence=before_seq + 1)
     except Exception:
+        # незакрытый сегмент закроется при следующей проверке журнала
         pass
 
 
-def register():
+def _write_events(items: List[tuple]):
+    # пачка из очереди писателя: (event_type, entry_id, details, timestamp, signer) -> одна транзакция
+    global _tail
+    from .integrity import entry_hash_for_chain
+
+    with _chain_lock:
+        path = db.get_db_path()
+        if _tail is not None and _tail[0] == path:
+            prev_hash, seq = _tail[1], _tail[2]
+        else:
+            prev_hash, seq = _tail_from_db()
+        start_seq = seq
+        rows = []
+        for event_type, entry_id, details, timestamp, signer in items:
+            seq += 1
+            payload = _build_payload(event_type, entry_id, details, prev_hash, seq, timestamp)
+            signature = signer.sign(prev_hash.encode("utf-8") + b"|" + payload)
+            rows.append((event_type, entry_id, details or "", signature, seq, prev_hash, payload))
+            prev_hash = entry_hash_for_chain(payload, signature)
+        try:
+            db.insert_audit_logs_bulk(rows)
+        except Exception:
+            # транзакция откатилась — хвост перечитаем из БД при следующей пачке
+            _tail = None
+            raise
+        _tail = (path, prev_hash, seq)
+        _seal_if_boundary(signer, start_seq, seq)
+
+
+def _submit(event_type: str, entry_id=None, details=None):
+    # из обработчиков событий: в очередь писателя, без него — синхронно
+    writer = _writer
+    if writer is None:
+        _log_event(event_type, entry_id=entry_id, details=details)
+        return
+    # в очередь идёт копия подписчика сессии, снятая в момент события (без сырого ключа хранилища):
+    # после logout очередь дописывается тем же ключом подписи
+    writer.submit((event_type, entry_id, details, _iso_utc(), _signer_for(get_encryption_key())))
+
+
+def start_writer(**kwargs) -> AuditWriter:
+    # kwargs: batch_size, flush_interval_ms, max_queue (см. audit_writer)
+    global _writer
+    if _writer is None:
+        _writer = AuditWriter(_write_events, **kwargs)
+    _writer.start()
+    return _writer
+
+
+def flush(timeout: float = 5.0) -> bool:
+    writer = _writer
+    return writer.flush(timeout) if writer is not None else True
+
+
+def shutdown():
+    # дозапись очереди и остановка потока (закрытие приложения)
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def _on_logged_in(**_):
+    # HKDF один раз на сессию: дальше все записи подписываются готовым ключом
+    signer_cache.open_session(get_encryption_key())
+
+
+def _on_logged_out(**_):
+    # цепочка не должна теряться: logout пишется и очередь сбрасывается синхронно
+    _submit(events.UserLoggedOut, details="user_logged_out")
+    flush()
+    signer_cache.close_session()
+
+
+def register(async_writes: bool = True):
+    # async_writes — события пишет фоновый поток пачками (GUI не ждёт I/O аудита)
+    if async_writes:
+        start_writer()
+    # подписчик сессии создаётся раньше записи самого UserLoggedIn
+    events.subscribe(events.UserLoggedIn, _on_logged_in)
+    # авто-блокировка / таймаут неактивности: ключ подписи уходит вместе с ключом хранилища
+    key_storage.add_clear_listener(signer_cache.close_session)
     events.subscribe(
         events.EntryAdded,
-        lambda **kw: _log_event(events.EntryAdded, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
+        lambda **kw: _submit(events.EntryAdded, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
     )
     events.subscribe(
         events.EntryCreated,
-        lambda **kw: _log_event(events.EntryCreated, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
+        lambda **kw: _submit(events.EntryCreated, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
     )
     events.subscribe(
         events.EntryUpdated,
-        lambda **kw: _log_event(events.EntryUpdated, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
+        lambda **kw: _submit(events.EntryUpdated, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
     )
     events.subscribe(
         events.EntryDeleted,
-        lambda **kw: _log_event(events.EntryDeleted, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
+        lambda **kw: _submit(events.EntryDeleted, entry_id=kw.get("entry_id"), details=f"entry_id={kw.get('entry_id')}"),
     )
+    for batch_event in (events.EntriesCreated, events.EntriesUpdated, events.EntriesDeleted):
+        # пакетные CRUD-события: одна строка аудита на транзакцию
+        events.subscribe(
+            batch_event,
+            lambda _ev=batch_event, **kw: _submit(_ev, details=f"count={len(kw.get('entry_ids') or [])}"),
+        )
     events.subscribe(
         events.UserLoggedIn,
-        lambda **kw: _log_event(events.UserLoggedIn, details=f"user={kw.get('username')}"),
-    )
-    events.subscribe(
-        events.UserLoggedOut,
-        lambda **kw: _log_event(events.UserLoggedOut, details="user_logged_out"),
+        lambda **kw: _submit(events.UserLoggedIn, details=f"user={kw.get('username')}"),
     )
+    events.subscribe(events.UserLoggedOut, _on_logged_out)
     events.subscribe(
         events.ClipboardCopied,
-        lambda **kw: _log_event(
+        lambda **kw: _submit(
             events.ClipboardCopied,
             entry_id=kw.get("entry_id"),
             details=f"kind={kw.get('kind')}",
@@ -121,23 +247,23 @@ def register():
     )
     events.subscribe(
         events.ClipboardCleared,
-        lambda **kw: _log_event(events.ClipboardCleared, details=f"reason={kw.get('reason')}"),
+        lambda **kw: _submit(events.ClipboardCleared, details=f"reason={kw.get('reason')}"),
     )
     events.subscribe(
         events.VaultExported,
-        lambda **kw: _log_event(
+        lambda **kw: _submit(
             events.VaultExported,
-            details=f"format={kw.get('format')} count={kw.get('entry_count')}",
+            details=f"format={kw.get('format')} count={kw.get('entry_count')} skipped={kw.get('skipped', 0)}",
         ),
     )
     events.subscribe(
         events.VaultImported,
-        lambda **kw: _log_event(
+        lambda **kw: _submit(
             events.VaultImported,
             details=f"mode={kw.get('mode')} added={kw.get('added')}",
         ),
     )
     events.subscribe(
         events.EntryShared,
-        lambda **kw: _log_event(events.EntryShared, details=f"permission={kw.get('permission')}"),
+        lambda **kw: _submit(events.EntryShared, details=f"permission={kw.get('permission')}"),
     )
@@ -0,0 +1,147 @@
+# фоновый писатель журнала аудита: события копятся в ограниченной очереди
+# и пишутся пачками одной транзакцией (каждые N событий или T мс)
+# GUI-поток только кладёт событие (с копией подписчика сессии) в очередь — HMAC и INSERT идут здесь
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL_MS = 200
+AUDIT_QUEUE_SIZE = 10000
+
+# сколько submit ждёт места в полной очереди, прежде чем записать событие сам
+_SUBMIT_TIMEOUT = 2.0
+# попыток записи одной пачки (занятая БД, откат транзакции) и пауза перед повтором, растущая с номером
+_WRITE_ATTEMPTS = 3
+_RETRY_DELAY = 0.05
+
+_log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _FlushMarker:
+    # метка в очереди: всё, что было до неё, записано, когда done установлен
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        write_batch: Callable[[List[Any]], None],
+        *,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval_ms: int = AUDIT_FLUSH_INTERVAL_MS,
+        max_queue: int = AUDIT_QUEUE_SIZE,
+    ):
+        self._write_batch = write_batch
+        self._batch_size = max(1, int(batch_size))
+        self._interval = max(1, int(flush_interval_ms)) / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.written = 0
+        # событий, которые не удалось записать и после повторов
+        self.failed = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, item):
+        # очередь ограничена: при переполнении вызывающий ждёт (backpressure), событие не теряется
+        if not self.is_running():
+            self._write([item])
+            return
+        try:
+            self._queue.put(item, timeout=_SUBMIT_TIMEOUT)
+        except queue.Full:
+            self._write([item])
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        # синхронно: к возврату всё, что было поставлено в очередь раньше, уже в БД
+        if not self.is_running():
+            self._drain_inline()
+            return True
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        # остановка с дозаписью очереди (logout / закрытие приложения)
+        if self.is_running():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+        self._drain_inline()
+
+    def _drain_inline(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _FlushMarker):
+                item.done.set()
+            elif item is not _STOP:
+                batch.append(item)
+        self._write(batch)
+
+    def _write(self, batch: List[Any]):
+        # пачка пишется одной транзакцией: после отката её можно повторить целиком
+        if not batch:
+            return
+        for attempt in range(1, _WRITE_ATTEMPTS + 1):
+            try:
+                self._write_batch(batch)
+            except Exception:
+                if attempt < _WRITE_ATTEMPTS:
+                    _log.warning("Запись пачки аудита (%d событий) не удалась, повтор %d", len(batch), attempt,
+                                 exc_info=True)
+                    time.sleep(_RETRY_DELAY * attempt)
+                    continue
+                self.failed += len(batch)
+                _log.error("Пачка аудита (%d событий) не записана после %d попыток", len(batch), attempt,
+                           exc_info=True)
+                return
+            self.batches += 1
+            self.written += len(batch)
+            return
+
+    def _run(self):
+        batch: List[Any] = []
+        deadline = 0.0
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._write(batch)
+                return
+            if isinstance(item, _FlushMarker):
+                self._write(batch)
+                batch = []
+                item.done.set()
+                continue
+            if item is not None:
+                batch.append(item)
+                if len(batch) == 1:
+                    deadline = time.monotonic() + self._interval
+            if batch and (item is None or len(batch) >= self._batch_size):
+                self._write(batch)
+                batch = []
@@ -1,41 +1,281 @@
 # проверка целостности журнала при старте и по запросу (спринт 5, VER-1/VER-3)
 
 import hashlib
-from typing import Any, Dict, Optional
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 from core import config
 from core.key_manager import get_encryption_key
 from database import db
 
+from . import merkle, signer_cache
 from .log_signer import AuditLogSigner, derive_audit_signing_key
-from .log_verifier import verify_audit_chain
+from .log_verifier import chain_hash_of, verify_audit_chain, verify_audit_chain_parallel
 
 
 AUDIT_MAX_ENTRIES = "audit_max_entries"
+# строк журнала на одну страницу keyset-чтения при проверке
+VERIFY_BATCH_SIZE = 1000
+# якорь смены ключа подписи (key_store): строки до него подписаны прежним ключом данных
+AUDIT_ANCHOR_KEY_TYPE = "audit_anchor"
 
 
-def _signer() -> AuditLogSigner:
+def _signer(with_key: bool = False) -> AuditLogSigner:
+    # with_key — процессам параллельной проверки нужен сырой ключ, а копия подписчика сессии его не несёт:
+    # ключ выводится заново, вызывающий обнуляет его после проверки (wipe)
     ek = get_encryption_key()
+    cached = None if with_key else signer_cache.get_session_signer(ek)
+    if cached is not None:
+        return cached
     sk = derive_audit_signing_key(ek)
     return AuditLogSigner(sk if sk else b"__no_session_audit_hmac_dev_only__")
 
 
-def verify_integrity(sample_limit: Optional[int] = None) -> Dict[str, Any]:
+def _checkpoint_message(sequence_number: int, chain_hash: str) -> bytes:
+    return b"audit-checkpoint|%d|%s" % (int(sequence_number), chain_hash.encode("utf-8"))
+
+
+def _load_checkpoint(signer: AuditLogSigner) -> Optional[Dict[str, Any]]:
+    # точка принимается, только если подпись верна и строка на границе не изменена и не удалена
+    cp = db.get_audit_checkpoint()
+    if not cp:
+        return None
+    if not signer.verify(_checkpoint_message(cp["sequence_number"], cp["chain_hash"]), cp["signature"]):
+        return None
+    anchor = db.get_audit_log_by_sequence(cp["sequence_number"])
+    if not anchor or chain_hash_of(anchor) != cp["chain_hash"]:
+        return None
+    return cp
+
+
+def _anchor_message(sequence_number: int, chain_hash: str) -> bytes:
+    return b"audit-anchor|%d|%s" % (int(sequence_number), chain_hash.encode("utf-8"))
+
+
+def _load_anchor(signer: AuditLogSigner) -> Optional[Dict[str, Any]]:
+    # как контрольная точка: подпись текущим ключом и неизменённая строка на границе
+    blob = db.get_key_store(AUDIT_ANCHOR_KEY_TYPE)
+    if not blob:
+        return None
+    try:
+        anchor = json.loads(blob.decode("utf-8"))
+        seq, chain_hash = int(anchor["sequence_number"]), str(anchor["chain_hash"])
+        if not signer.verify(_anchor_message(seq, chain_hash), anchor["signature"]):
+            return None
+    except (ValueError, KeyError, TypeError):
+        return None
+    row = db.get_audit_log_by_sequence(seq)
+    if not row or chain_hash_of(row) != chain_hash:
+        return None
+    return {"sequence_number": seq, "chain_hash": chain_hash}
+
+
+def _chain_start(signer: AuditLogSigner, bounds) -> Dict[str, Any]:
+    # откуда идёт полная проверка: от якоря смены ключа, от первой строки после prune или от начала журнала
+    anchor = _load_anchor(signer)
+    if anchor is not None and anchor["sequence_number"] >= bounds[0]:
+        # строки до якоря подписаны прежним ключом — проверены им при смене ключа (prepare_key_rotation)
+        return {"start_hash": anchor["chain_hash"], "after_sequence": anchor["sequence_number"],
+                "anchored_before": anchor["sequence_number"] + 1}
+    if bounds[0] > 1:
+        # начало журнала удалено prune_audit_logs: нулевой хеш для первой оставшейся строки не подходит,
+        # цепочка сверяется от её previous_hash (как от начала журнала; удалённые строки не проверить)
+        first = db.get_audit_log_by_sequence(bounds[0])
+        if first:
+            return {"start_hash": first.get("previous_hash") or "", "after_sequence": bounds[0] - 1,
+                    "pruned_before": bounds[0]}
+    return {"start_hash": "0" * 64, "after_sequence": 0}
+
+
+def _save_checkpoint(signer: AuditLogSigner, result: Dict[str, Any]):
+    seq = result.get("last_sequence")
+    if seq is None:
+        return
+    chain_hash = result["last_hash"]
+    db.set_audit_checkpoint(seq, chain_hash, signer.sign(_checkpoint_message(seq, chain_hash)))
+    # строки до точки проверены — полные сегменты без корня (журнал до версии 7) закрываются здесь
+    merkle.seal_segments(signer, up_to_sequence=seq)
+
+
+def _counted(rows: Iterable[Dict[str, Any]], total: int, on_progress: Callable[[int, int], None]) -> Iterator[Dict[str, Any]]:
+    # прогресс проверки — по прочитанным строкам, раз в страницу (как VaultRekeyer: done, total)
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % VERIFY_BATCH_SIZE == 0:
+            on_progress(done, total)
+    on_progress(done, done)
+
+
+def verify_integrity(
+    sample_limit: Optional[int] = None,
+    full: bool = False,
+    parallel: bool = False,
+    workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    # по умолчанию — инкрементально: только строки после подписанной контрольной точки;
+    # full=True — полная перепроверка от начала цепочки (по запросу пользователя);
+    # после prune начало — первая оставшаяся строка (pruned_before / anchor_hash в результате),
+    # после смены ключа данных — якорь (anchored_before: строки до него подписаны прежним ключом)
+    # sample_limit действует, пока точки нет: проверяется окно последних строк
+    # parallel=True — HMAC и хеши строк пачками на всех ядрах (verify_audit_chain_parallel)
+    # on_progress(done, total) — для фоновой проверки из окна журнала
     max_entries = int(config.get(AUDIT_MAX_ENTRIES, "10000") or "10000")
     db.prune_audit_logs(max_entries)
 
-    total = db.count_audit_logs()
-    limit = sample_limit if sample_limit is not None else total
-    if limit <= 0:
-        return {"verified": True, "total_entries": 0, "breaks": [], "valid_entries": 0}
+    bounds = db.get_audit_sequence_bounds()
+    total = 0 if bounds is None else bounds[1] - bounds[0] + 1
+    if total <= 0:
+        return {"verified": True, "total_entries": 0, "breaks": [], "valid_entries": 0, "checked": 0, "total_in_db": 0}
 
-    rows = db.list_audit_logs(limit=limit, offset=0)
-    rows = list(reversed(rows))
-    result = verify_audit_chain(rows, _signer())
+    has_key = bool(get_encryption_key())
+    signer = _signer()
+    start_hash = "0" * 64
+    after_sequence = 0
+    from_genesis = True
+    mode = "full"
+
+    checkpoint = None if full or not has_key else _load_checkpoint(signer)
+    if checkpoint is not None:
+        start_hash = checkpoint["chain_hash"]
+        after_sequence = int(checkpoint["sequence_number"])
+        mode = "incremental"
+    elif not full and sample_limit is not None and sample_limit < total:
+        if sample_limit <= 0:
+            return {"verified": True, "total_entries": 0, "breaks": [], "valid_entries": 0, "checked": 0, "total_in_db": total}
+        # окно — последние limit строк; цепочка внутри окна сверяется от хеша строки перед окном
+        anchor = db.list_audit_logs(limit=1, offset=sample_limit)
+        if anchor:
+            start_hash = chain_hash_of(anchor[0])
+            after_sequence = int(anchor[0].get("sequence_number") or 0)
+            from_genesis = False
+            mode = "sample"
+
+    start: Dict[str, Any] = {}
+    if mode == "full":
+        start = _chain_start(signer, bounds)
+    elif mode == "sample":
+        anchored = _chain_start(signer, bounds)
+        if "anchored_before" in anchored and after_sequence < anchored["after_sequence"]:
+            # окно заходит в строки под прежним ключом подписи — проверка идёт от якоря, как полная
+            start, from_genesis, mode = anchored, True, "full"
+    if start:
+        start_hash, after_sequence = start["start_hash"], start["after_sequence"]
+
+    # строки идут страницами по sequence_number — в памяти одна страница, а не весь журнал
+    rows = db.iter_audit_logs(batch_size=VERIFY_BATCH_SIZE, after_sequence=after_sequence)
+    if on_progress is not None:
+        rows = _counted(rows, max(0, bounds[1] - after_sequence), on_progress)
+    if parallel:
+        worker_signer = _signer(with_key=True)
+        try:
+            result = verify_audit_chain_parallel(rows, worker_signer, start_hash=start_hash, workers=workers)
+        finally:
+            worker_signer.wipe()
+    else:
+        result = verify_audit_chain(rows, signer, start_hash=start_hash, presorted=True)
+    # окно без проверенного начала точкой не становится: до него цепочка не проверялась
+    if result["verified"] and from_genesis and has_key:
+        _save_checkpoint(signer, result)
     result["total_in_db"] = total
-    result["checked"] = len(rows)
+    result["checked"] = result["total_entries"]
+    result["mode"] = mode
+    # проверены строки после after_sequence (точка, якорь или строка перед окном)
+    result["after_sequence"] = after_sequence
+    for key in ("pruned_before", "anchored_before"):
+        if key in start:
+            result[key] = start[key]
+            result["anchor_hash"] = start_hash
     return result
 
 
+def prepare_key_rotation(old_key: bytes, new_key: bytes) -> List[tuple]:
+    # смена ключа данных меняет ключ подписи журнала (он выводится из ключа данных): строки под старым
+    # ключом проверяются им один раз и закрываются якорем, подписанным новым, — дальше проверка идёт от якоря
+    # результат — записи key_store для транзакции подмены ключа (db.swap_vault_shadow); сломанная цепочка
+    # якоря не получает, её разрывы останутся видны под новым ключом
+    # контрольная точка и корни сегментов старым ключом сбрасываются: они производные и пересобираются
+    # (finish_key_rotation, а после сбоя — _save_checkpoint при следующей проверке)
+    old_signer = AuditLogSigner(derive_audit_signing_key(old_key))
+    new_signer = AuditLogSigner(derive_audit_signing_key(new_key))
+    try:
+        items = []
+        bounds = db.get_audit_sequence_bounds()
+        if bounds is not None:
+            start = _chain_start(old_signer, bounds)
+            rows = db.iter_audit_logs(batch_size=VERIFY_BATCH_SIZE, after_sequence=start["after_sequence"])
+            result = verify_audit_chain(rows, old_signer, start_hash=start["start_hash"], presorted=True)
+            if result["verified"] and result["last_sequence"] is not None:
+                seq, chain_hash = int(result["last_sequence"]), result["last_hash"]
+                anchor = {
+                    "sequence_number": seq,
+                    "chain_hash": chain_hash,
+                    "signature": new_signer.sign(_anchor_message(seq, chain_hash)),
+                }
+                items.append((AUDIT_ANCHOR_KEY_TYPE, json.dumps(anchor, sort_keys=True).encode("utf-8"), 1))
+        db.clear_audit_checkpoints()
+        db.delete_audit_segments()
+        return items
+    finally:
+        old_signer.wipe()
+        new_signer.wipe()
+
+
+def finish_key_rotation(new_key: bytes):
+    # после подмены: контрольная точка и сегменты до якоря — уже новым ключом
+    signer = AuditLogSigner(derive_audit_signing_key(new_key))
+    try:
+        anchor = _load_anchor(signer)
+        if anchor is not None:
+            _save_checkpoint(signer, {"last_sequence": anchor["sequence_number"], "last_hash": anchor["chain_hash"]})
+    finally:
+        signer.wipe()
+
+
+def verify_event(sequence_number: int) -> bool:
+    # одна строка журнала за O(log n): доказательство Меркла + подпись корня сегмента
+    row = db.get_audit_log_by_sequence(sequence_number)
+    if not row:
+        return False
+    try:
+        proof = merkle.prove_event(sequence_number)
+    except ValueError:
+        return False
+    return merkle.verify_proof(proof, _signer(), row)
+
+
+def verify_events(sequence_numbers) -> Dict[str, Any]:
+    # выборка строк (окно журнала, экспорт): закрытые сегменты — по доказательствам,
+    # строки хвостового незакрытого сегмента — инкрементальной проверкой от контрольной точки
+    breaks: List[Dict[str, Any]] = []
+    pending = []
+    for seq in sorted({int(s) for s in sequence_numbers}):
+        if db.get_audit_segment(merkle.segment_of(seq)) is None:
+            pending.append(seq)
+        elif not verify_event(seq):
+            breaks.append({"sequence": seq, "reason": "merkle_proof_failed"})
+    if pending:
+        tail = verify_integrity()
+        if not tail["verified"]:
+            # подтверждены только строки между началом проверки и первым разрывом; изменённая строка ломает
+            # previous_hash следующей — под подозрением и строка перед разрывом, и всё после него
+            start = int(tail.get("after_sequence") or 0)
+            bad = [int(b["sequence"]) for b in tail["breaks"] if b.get("sequence") is not None]
+            first_bad = min(bad) if bad else start + 1
+            for s in pending:
+                if s <= start:
+                    breaks.append({"sequence": s, "reason": "unverified"})
+                elif s >= first_bad - 1:
+                    breaks.append({"sequence": s, "reason": "chain_break"})
+    total = len({int(s) for s in sequence_numbers})
+    return {"verified": not breaks, "breaks": breaks, "checked": total, "valid_entries": total - len(breaks)}
+
+
+def verify_segments(workers: Optional[int] = None) -> Dict[str, Any]:
+    return merkle.verify_segments(_signer(), workers=workers)
+
+
 def entry_hash_for_chain(entry_data: bytes, signature: str) -> str:
     return hashlib.sha256(entry_data + (signature or "").encode("utf-8")).hexdigest()
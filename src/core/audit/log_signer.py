@@ -23,18 +23,46 @@ def derive_audit_signing_key(encryption_key: Optional[bytes]) -> bytes:
 
 class AuditLogSigner:
     def __init__(self, signing_key: bytes):
-        self._key = signing_key
+        self._key = bytearray(signing_key or b"")
+        # HMAC с уже обработанным ключом: на сообщение — только copy() состояния, без повторной подготовки ключа
+        self._mac = hmac.new(bytes(self._key), digestmod=hashlib.sha256) if self._key else None
+
+    def _digest(self, data: bytes) -> str:
+        h = self._mac.copy()
+        h.update(data)
+        return h.hexdigest()
 
     def sign(self, data: bytes) -> str:
-        if not self._key:
+        if self._mac is None:
             return ""
-        return hmac.new(self._key, data, hashlib.sha256).hexdigest()
+        return self._digest(data)
 
     def verify(self, data: bytes, signature_hex: str) -> bool:
-        if not signature_hex or not self._key:
+        if not signature_hex or self._mac is None:
             return False
         try:
-            expected = hmac.new(self._key, data, hashlib.sha256).hexdigest()
-            return hmac.compare_digest(expected, signature_hex)
+            return hmac.compare_digest(self._digest(data), signature_hex)
         except Exception:
             return False
+
+    def clone(self) -> "AuditLogSigner":
+        # копия для другого потока: своё состояние HMAC, сырого ключа в ней нет;
+        # wipe() оригинала её не затрагивает
+        other = AuditLogSigner.__new__(AuditLogSigner)
+        other._key = bytearray()
+        other._mac = self._mac.copy() if self._mac is not None else None
+        return other
+
+    def export_key(self) -> bytearray:
+        # единственный путь ключа в процесс-воркер (log_verifier): копию обнуляет вызывающий после пула;
+        # у копии из clone() ключа нет — пустой результат
+        return bytearray(self._key)
+
+    def __reduce__(self):
+        # объект HMAC не сериализуется, а ключ не уходит в pickle неявно — только через export_key
+        raise TypeError("AuditLogSigner не сериализуется: ключ передаётся явно (export_key)")
+
+    def wipe(self):
+        # ключ обнуляется на месте; состояние HMAC (внутри OpenSSL) просто отпускается
+        self._key[:] = bytes(len(self._key))
+        self._mac = None
@@ -2,7 +2,12 @@
 
 import hashlib
 import json
-from typing import Any, Dict, List, Optional
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .log_signer import AuditLogSigner
 
@@ -11,14 +16,25 @@ def _entry_hash(entry_data: bytes, signature: str) -> str:
     return hashlib.sha256(entry_data + (signature or "").encode("utf-8")).hexdigest()
 
 
-def verify_audit_chain(rows: List[Dict[str, Any]], signer: Optional[AuditLogSigner]) -> Dict[str, Any]:
+def verify_audit_chain(
+    rows: Iterable[Dict[str, Any]],
+    signer: Optional[AuditLogSigner],
+    *,
+    start_hash: str = "0" * 64,
+    presorted: bool = False,
+) -> Dict[str, Any]:
+    # presorted=True — rows уже идут по sequence_number (db.iter_audit_logs), проверка потоковая;
+    # start_hash — хеш строки перед первой проверяемой (для окна не с начала журнала)
     breaks: List[Dict[str, Any]] = []
     skipped = signer is None
-    ordered = sorted(rows, key=lambda r: int(r.get("sequence_number") or r.get("id") or 0))
-    prev_chain_hash = "0" * 64
+    ordered = rows if presorted else sorted(rows, key=lambda r: int(r.get("sequence_number") or r.get("id") or 0))
+    prev_chain_hash = start_hash
     valid = 0
+    total = 0
+    last_sequence = None
 
     for row in ordered:
+        total += 1
         seq = row.get("sequence_number")
         ph = row.get("previous_hash") or ""
         payload = row.get("entry_data") or b""
@@ -27,6 +43,7 @@ def verify_audit_chain(rows: List[Dict[str, Any]], signer: Optional[AuditLogSign
         if isinstance(payload, str):
             payload = payload.encode("utf-8")
         sig = row.get("signature") or ""
+        last_sequence = seq
 
         if ph != prev_chain_hash:
             breaks.append({"sequence": seq, "reason": "previous_hash_mismatch"})
@@ -44,11 +61,156 @@ def verify_audit_chain(rows: List[Dict[str, Any]], signer: Optional[AuditLogSign
         "verified": not breaks,
         "breaks": breaks,
         "valid_entries": valid,
-        "total_entries": len(ordered),
+        "total_entries": total,
         "skipped": skipped,
+        # конец проверенного участка: из них строится контрольная точка
+        "last_sequence": last_sequence,
+        "last_hash": prev_chain_hash,
     }
 
 
+# строк на одну задачу параллельной проверки: меньше — больше накладных расходов на передачу
+VERIFY_CHUNK_SIZE = 5000
+
+
+def _row_tuple(row: Dict[str, Any]) -> Tuple[Any, str, bytes, str]:
+    payload = row.get("entry_data") or b""
+    if isinstance(payload, memoryview):
+        payload = payload.tobytes()
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return row.get("sequence_number"), row.get("previous_hash") or "", payload, row.get("signature") or ""
+
+
+def _check_chunk(signer: Optional[AuditLogSigner], items: List[Tuple[Any, str, bytes, str]]) -> List[Tuple[str, bool]]:
+    # независимая от соседей часть проверки: хеш строки и HMAC по её собственному previous_hash
+    out = []
+    for _seq, ph, payload, sig in items:
+        if payload:
+            h = _entry_hash(payload, sig)
+            ok = not (sig and signer) or signer.verify(ph.encode("utf-8") + b"|" + payload, sig)
+        else:
+            h = hashlib.sha256((ph + sig).encode("utf-8")).hexdigest()
+            ok = True
+        out.append((h, ok))
+    return out
+
+
+# подписчик процесса-воркера: собирается один раз из ключа в initializer пула
+_worker_signer: Optional[AuditLogSigner] = None
+
+
+def _init_worker_signer(key: Optional[bytearray]):
+    # копия ключа, пришедшая в процесс, обнуляется сразу — дальше живёт только состояние HMAC
+    global _worker_signer
+    _worker_signer = AuditLogSigner(key) if key else None
+    if key:
+        key[:] = bytes(len(key))
+
+
+def _check_chunk_in_worker(items: List[Tuple[Any, str, bytes, str]]) -> List[Tuple[str, bool]]:
+    return _check_chunk(_worker_signer, items)
+
+
+def verify_audit_chain_parallel(
+    rows: Iterable[Dict[str, Any]],
+    signer: Optional[AuditLogSigner],
+    *,
+    start_hash: str = "0" * 64,
+    workers: Optional[int] = None,
+    chunk_size: int = VERIFY_CHUNK_SIZE,
+    use_processes: Optional[bool] = None,
+) -> Dict[str, Any]:
+    # rows — уже по возрастанию sequence_number (db.iter_audit_logs)
+    # HMAC и хеши строк считаются пачками в пуле; связность цепочки сшивается последовательно
+    # use_processes=None — процессы, если ядер больше одного (HMAC маленьких строк GIL не отпускает)
+    # процессам нужен сырой ключ (signer.export_key); у копии без ключа (clone) — только потоки
+    workers = workers or os.cpu_count() or 1
+    if use_processes is None:
+        use_processes = workers > 1
+    key = signer.export_key() if signer is not None and use_processes and workers > 1 else None
+    if signer is not None and not key:
+        use_processes = False
+    started = time.perf_counter()
+
+    breaks: List[Dict[str, Any]] = []
+    prev_chain_hash = start_hash
+    valid = 0
+    total = 0
+    last_sequence = None
+
+    def stitch(items, results):
+        nonlocal prev_chain_hash, valid, total, last_sequence
+        for (seq, ph, _payload, _sig), (h, ok) in zip(items, results):
+            total += 1
+            last_sequence = seq
+            if ph != prev_chain_hash:
+                breaks.append({"sequence": seq, "reason": "previous_hash_mismatch"})
+            elif not ok:
+                breaks.append({"sequence": seq, "reason": "bad_signature"})
+            else:
+                valid += 1
+            prev_chain_hash = h
+
+    source = (_row_tuple(r) for r in rows)
+    chunks = iter(lambda: list(islice(source, chunk_size)), [])
+    if workers <= 1:
+        for items in chunks:
+            stitch(items, _check_chunk(signer, items))
+    else:
+        if use_processes:
+            # ключ уходит в каждый процесс один раз (initargs), а не с каждой пачкой
+            pool: Executor = ProcessPoolExecutor(workers, initializer=_init_worker_signer, initargs=(key,))
+        else:
+            pool = ThreadPoolExecutor(workers)
+        try:
+            with pool:
+                # в работе не больше 2×workers пачек — журнал не читается в память целиком
+                in_flight: deque = deque()
+                for items in chunks:
+                    if use_processes:
+                        fut = pool.submit(_check_chunk_in_worker, items)
+                    else:
+                        # у каждой пачки своя копия состояния HMAC
+                        fut = pool.submit(_check_chunk, signer.clone() if signer else None, items)
+                    in_flight.append((items, fut))
+                    if len(in_flight) >= 2 * workers:
+                        done_items, fut = in_flight.popleft()
+                        stitch(done_items, fut.result())
+                while in_flight:
+                    done_items, fut = in_flight.popleft()
+                    stitch(done_items, fut.result())
+        finally:
+            if key:
+                key[:] = bytes(len(key))
+
+    elapsed = time.perf_counter() - started
+    return {
+        "verified": not breaks,
+        "breaks": breaks,
+        "valid_entries": valid,
+        "total_entries": total,
+        "skipped": signer is None,
+        "last_sequence": last_sequence,
+        "last_hash": prev_chain_hash,
+        "elapsed": elapsed,
+        "rows_per_second": total / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def chain_hash_of(row: Dict[str, Any]) -> str:
+    # хеш, на который должна ссылаться следующая строка (previous_hash)
+    payload = row.get("entry_data") or b""
+    if isinstance(payload, memoryview):
+        payload = payload.tobytes()
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    sig = row.get("signature") or ""
+    if payload:
+        return _entry_hash(payload, sig)
+    return hashlib.sha256(((row.get("previous_hash") or "") + sig).encode("utf-8")).hexdigest()
+
+
 def summarize_entry(row: Dict[str, Any]) -> Dict[str, str]:
     payload = row.get("entry_data") or b""
     if isinstance(payload, memoryview):
@@ -0,0 +1,171 @@
+# сегменты журнала с корнем Меркла (спринт 5, VER): строки группируются по SEGMENT_SIZE,
+# корень сегмента подписывается AuditLogSigner и хранится в audit_segments
+# доказательство одного события — путь из log2(SEGMENT_SIZE) хешей, без обхода всей цепочки
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from database import db
+
+from .log_signer import AuditLogSigner
+from .log_verifier import chain_hash_of
+
+SEGMENT_SIZE = 256
+
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+
+def segment_of(sequence_number: int) -> int:
+    # sequence_number начинается с 1: сегмент 0 — строки 1..SEGMENT_SIZE
+    return (int(sequence_number) - 1) // SEGMENT_SIZE
+
+
+def segment_bounds(index: int):
+    first = int(index) * SEGMENT_SIZE + 1
+    return first, first + SEGMENT_SIZE - 1
+
+
+def _leaf(entry_hash: str) -> bytes:
+    # префиксы листа и узла разные — лист нельзя выдать за внутренний узел
+    return hashlib.sha256(_LEAF_PREFIX + bytes.fromhex(entry_hash)).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def _levels(leaves: List[bytes]) -> List[List[bytes]]:
+    # уровни дерева снизу вверх; непарный узел поднимается на уровень выше без изменений
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        cur = levels[-1]
+        nxt = [_node(cur[i], cur[i + 1]) for i in range(0, len(cur) - 1, 2)]
+        if len(cur) % 2:
+            nxt.append(cur[-1])
+        levels.append(nxt)
+    return levels
+
+
+def merkle_root(entry_hashes: List[str]) -> str:
+    if not entry_hashes:
+        return ""
+    return _levels([_leaf(h) for h in entry_hashes])[-1][0].hex()
+
+
+def _segment_message(index: int, first: int, last: int, root: str) -> bytes:
+    return b"audit-segment|%d|%d|%d|%s" % (int(index), int(first), int(last), root.encode("utf-8"))
+
+
+def _segment_rows(index: int) -> List[Dict[str, Any]]:
+    first, last = segment_bounds(index)
+    return db.list_audit_logs_by_sequence(first, last)
+
+
+def seal_segments(
+    signer: AuditLogSigner,
+    up_to_sequence: Optional[int] = None,
+    from_sequence: Optional[int] = None,
+) -> int:
+    # закрываются полные сегменты, ещё не записанные в audit_segments (до up_to_sequence включительно)
+    # from_sequence — только сегменты со строками from_sequence..up_to_sequence: запись журнала закрывает
+    # то, что сама дописала; более старые строки закрываются после проверки цепочки (_save_checkpoint)
+    bounds = db.get_audit_sequence_bounds()
+    if bounds is None:
+        return 0
+    limit = bounds[1] if up_to_sequence is None else min(int(up_to_sequence), bounds[1])
+    # сегменты, начало которых уже удалено prune_audit_logs, не закрываются
+    index = -(-(bounds[0] - 1) // SEGMENT_SIZE)
+    if from_sequence is not None:
+        index = max(index, segment_of(from_sequence))
+    last_index = segment_of(limit + 1) - 1
+    if last_index < index:
+        return 0
+    done = db.list_audit_segment_indices(index, last_index)
+    sealed = 0
+    for index in range(index, last_index + 1):
+        if index in done:
+            continue
+        first, last = segment_bounds(index)
+        rows = _segment_rows(index)
+        if len(rows) != SEGMENT_SIZE:
+            break
+        root = merkle_root([chain_hash_of(r) for r in rows])
+        db.insert_audit_segment(index, first, last, root, signer.sign(_segment_message(index, first, last, root)))
+        sealed += 1
+    return sealed
+
+
+def prove_event(sequence_number: int) -> Dict[str, Any]:
+    # доказательство включения: хеш записи, путь до корня и подписанный корень сегмента
+    seq = int(sequence_number)
+    index = segment_of(seq)
+    segment = db.get_audit_segment(index)
+    if not segment:
+        raise ValueError("Событие ещё не входит в закрытый сегмент")
+    rows = _segment_rows(index)
+    hashes = [chain_hash_of(r) for r in rows]
+    position = seq - segment["first_sequence"]
+    if len(rows) != SEGMENT_SIZE or not 0 <= position < len(rows):
+        raise ValueError("Строки сегмента отсутствуют")
+
+    path = []
+    pos = position
+    for level in _levels([_leaf(h) for h in hashes])[:-1]:
+        sibling = pos ^ 1
+        if sibling < len(level):
+            path.append({"side": "left" if sibling < pos else "right", "hash": level[sibling].hex()})
+        pos //= 2
+    return {
+        "sequence_number": seq,
+        "segment_index": index,
+        "first_sequence": segment["first_sequence"],
+        "last_sequence": segment["last_sequence"],
+        "entry_hash": hashes[position],
+        "path": path,
+        "merkle_root": segment["merkle_root"],
+        "signature": segment["signature"],
+    }
+
+
+def verify_proof(proof: Dict[str, Any], signer: AuditLogSigner, row: Optional[Dict[str, Any]] = None) -> bool:
+    # row — сама строка журнала: тогда проверяется и то, что доказательство относится именно к ней
+    try:
+        if row is not None and chain_hash_of(row) != proof["entry_hash"]:
+            return False
+        node = _leaf(proof["entry_hash"])
+        for step in proof["path"]:
+            sibling = bytes.fromhex(step["hash"])
+            node = _node(sibling, node) if step["side"] == "left" else _node(node, sibling)
+        if node.hex() != proof["merkle_root"]:
+            return False
+        msg = _segment_message(proof["segment_index"], proof["first_sequence"], proof["last_sequence"], proof["merkle_root"])
+        return signer.verify(msg, proof["signature"])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def _check_segment(segment: Dict[str, Any], signer: AuditLogSigner) -> Optional[Dict[str, Any]]:
+    index = segment["segment_index"]
+    msg = _segment_message(index, segment["first_sequence"], segment["last_sequence"], segment["merkle_root"])
+    if not signer.verify(msg, segment["signature"]):
+        return {"segment": index, "reason": "bad_segment_signature"}
+    rows = _segment_rows(index)
+    if len(rows) != SEGMENT_SIZE:
+        return {"segment": index, "reason": "rows_missing"}
+    if merkle_root([chain_hash_of(r) for r in rows]) != segment["merkle_root"]:
+        return {"segment": index, "reason": "merkle_root_mismatch"}
+    return None
+
+
+def verify_segments(signer: AuditLogSigner, workers: Optional[int] = None) -> Dict[str, Any]:
+    # сегменты независимы — проверяются параллельно; каждый поток сам читает свои строки
+    segments = db.list_audit_segments()
+    workers = workers or min(8, (os.cpu_count() or 1) + 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # у каждого потока своя копия состояния HMAC
+        results = list(pool.map(lambda s: _check_segment(s, signer.clone()), segments))
+    breaks = [r for r in results if r is not None]
+    return {"verified": not breaks, "breaks": breaks, "segments": len(segments)}
@@ -0,0 +1,58 @@
+# подписчик журнала на время сессии: HKDF от ключа хранилища выполняется один раз при входе,
+# дальше все записи и проверки берут готовый AuditLogSigner (спринт 5, CRY-1)
+# привязан к отпечатку текущего ключа; при logout / авто-блокировке ключ подписи обнуляется
+
+import hashlib
+import hmac
+import threading
+from typing import Optional
+
+from .log_signer import AuditLogSigner, derive_audit_signing_key
+
+_lock = threading.Lock()
+_fingerprint: Optional[bytes] = None
+_signer: Optional[AuditLogSigner] = None
+
+
+def _fingerprint_of(encryption_key: bytes) -> bytes:
+    return hashlib.sha256(b"audit-signer|" + bytes(encryption_key)).digest()
+
+
+def open_session(encryption_key: Optional[bytes]) -> Optional[AuditLogSigner]:
+    # вызывается на UserLoggedIn; повторный вход с другим ключом заменяет подписчика
+    global _fingerprint, _signer
+    if not encryption_key:
+        close_session()
+        return None
+    fp = _fingerprint_of(encryption_key)
+    with _lock:
+        if _signer is not None and _fingerprint is not None and hmac.compare_digest(_fingerprint, fp):
+            return _signer
+        if _signer is not None:
+            _signer.wipe()
+        _signer = AuditLogSigner(derive_audit_signing_key(encryption_key))
+        _fingerprint = fp
+        return _signer
+
+
+def get_session_signer(encryption_key: Optional[bytes]) -> Optional[AuditLogSigner]:
+    # копия подписчика сессии, если он создан для этого же ключа; иначе None (вызывающий выводит ключ сам)
+    # копия — чтобы close_session из другого потока не обнулил подписчика посреди пачки или проверки
+    if not encryption_key:
+        return None
+    with _lock:
+        if _signer is None or _fingerprint is None:
+            return None
+        if not hmac.compare_digest(_fingerprint, _fingerprint_of(encryption_key)):
+            return None
+        return _signer.clone()
+
+
+def close_session():
+    # logout / clear_cached_key: ключ подписи обнуляется, следующий вход создаёт новый
+    global _fingerprint, _signer
+    with _lock:
+        if _signer is not None:
+            _signer.wipe()
+        _signer = None
+        _fingerprint = None
@@ -3,6 +3,8 @@
 import os
 import sqlite3
 import base64
+import threading
+import time
 
 
 def _config_path():
@@ -11,6 +13,18 @@ def _config_path():
     return os.path.join(base, "config.db")
 
 
+# кэш настроек на процесс: все строки читаются один раз, get обслуживается из словаря,
+# set/set_many пишут в БД и сразу в словарь (write-through) через одно долгоживущее соединение
+_lock = threading.RLock()
+_conn = None
+_conn_path = None
+_cache = None
+_data_version = None
+_last_check = 0.0
+# как часто get проверяет, не изменил ли config.db другой процесс (PRAGMA data_version)
+_EXTERNAL_CHECK_INTERVAL = 1.0
+
+
 def _ensure_settings_table(conn):
     # создаётся таблица settings, если её ещё нет (ключ — значение)
     conn.cursor().execute(
@@ -22,35 +36,99 @@ def _ensure_settings_table(conn):
 def _connect():
     # открывается config.db, создаётся таблица при необходимости, возвращается соединение
     path = _config_path()
-    conn = sqlite3.connect(path)
+    conn = sqlite3.connect(path, check_same_thread=False)
     _ensure_settings_table(conn)
     return conn
 
 
+def _close():
+    global _conn, _conn_path, _cache, _data_version
+    if _conn is not None:
+        try:
+            _conn.close()
+        except Exception:
+            pass
+    _conn = None
+    _conn_path = None
+    _cache = None
+    _data_version = None
+
+
+def _read_data_version():
+    return _conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _load():
+    # соединение открывается один раз; таблица читается целиком в словарь
+    global _conn, _conn_path, _cache, _data_version, _last_check
+    path = _config_path()
+    if _conn is None or _conn_path != path:
+        _close()
+        _conn = _connect()
+        _conn_path = path
+    _cache = dict(_conn.execute("SELECT key, value FROM settings").fetchall())
+    _data_version = _read_data_version()
+    _last_check = time.monotonic()
+
+
+def _cached():
+    # словарь настроек; раз в _EXTERNAL_CHECK_INTERVAL — проверка, не писал ли в файл кто-то ещё
+    # (data_version меняется только от чужих коммитов, свои set его не двигают)
+    global _last_check
+    if _cache is None:
+        _load()
+        return _cache
+    now = time.monotonic()
+    if now - _last_check >= _EXTERNAL_CHECK_INTERVAL:
+        _last_check = now
+        try:
+            if _conn_path != _config_path() or _read_data_version() != _data_version:
+                _load()
+        except sqlite3.Error:
+            _close()
+            _load()
+    return _cache
+
+
+def refresh():
+    # принудительно перечитать config.db (после правки файла извне)
+    with _lock:
+        _close()
+        _load()
+
+
 def get(key, default=None):
     # чтение настройки по ключу; при отсутствии возвращается default
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("SELECT value FROM settings WHERE key = ?", (key,))
-    row = cur.fetchone()
-    conn.close()
-    return row[0] if row else default
+    with _lock:
+        value = _cached().get(key)
+    return default if value is None else value
+
+
+def set_many(values):
+    # несколько настроек одной транзакцией (например, окно настроек); кэш обновляется после коммита
+    items = [(k, str(v)) for k, v in dict(values).items()]
+    if not items:
+        return
+    with _lock:
+        cache = _cached()
+        try:
+            with _conn:
+                _conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", items)
+        except sqlite3.Error:
+            _close()
+            raise
+        cache.update(items)
 
 
 def set(key, value):
     # запись настройки в config; при существующем ключе выполняется перезапись
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
-        (key, str(value)),
-    )
-    conn.commit()
-    conn.close()
+    set_many({key: value})
 
 
 # константы — имена ключей в config, чтобы не ошибаться в строках по коду
 DB_PATH = "db_path"
+DB_POOL_MODE = "db_pool_mode"
+DB_READER_POOL_SIZE = "db_reader_pool_size"
 MASTER_PASSWORD_HASH = "master_password_hash"
 VAULT_SALT = "vault_salt"
 ENCRYPTION_ITERATIONS = "encryption_iterations"
@@ -0,0 +1,158 @@
+# параметры KDF в key_store("params") и их калибровка под конкретную машину (KEY-3)
+# вход считает Argon2 и PBKDF2 параллельно (kdf_worker), поэтому каждый из них подбирается
+# под целевую задержку отдельно: время входа ≈ max(argon2, pbkdf2) ≈ target_ms
+#
+# версия 1 — только pbkdf2_iterations/salt_len/key_len; версия 2 добавляет параметры Argon2id,
+# целевую задержку и pending_pbkdf2_iterations: новые итерации PBKDF2 меняют ключ из пароля (KEK),
+# поэтому после калибровки из настроек они применяются при следующей смене пароля (переобёртка DEK)
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from argon2 import PasswordHasher
+
+from .key_derivation import (
+    DEFAULT_HASH_LEN,
+    DEFAULT_MEMORY_MIB,
+    DEFAULT_PARALLELISM,
+    DEFAULT_TIME_COST,
+    PBKDF2_ITERATIONS,
+    PBKDF2_KEY_LEN,
+    PBKDF2_SALT_LEN,
+)
+
+KDF_PARAMS_VERSION = 2
+TARGET_UNLOCK_MS = 500
+
+# нижние границы не опускаются ниже прежних дефолтов / рекомендаций OWASP для Argon2id (m=19 MiB, t=2)
+ARGON2_MIN_TIME_COST = 2
+ARGON2_MAX_TIME_COST = 10
+ARGON2_MIN_MEMORY_MIB = 19
+ARGON2_MAX_MEMORY_MIB = 1024
+PBKDF2_MIN_ITERATIONS = PBKDF2_ITERATIONS
+PBKDF2_MAX_ITERATIONS = 10_000_000
+# замер PBKDF2 — на небольшом числе итераций, дальше линейная экстраполяция
+_PBKDF2_PROBE_ITERATIONS = 20_000
+
+
+def default_params() -> Dict[str, Any]:
+    return {
+        "version": KDF_PARAMS_VERSION,
+        "pbkdf2_iterations": PBKDF2_ITERATIONS,
+        "salt_len": PBKDF2_SALT_LEN,
+        "key_len": PBKDF2_KEY_LEN,
+        "argon2_time_cost": DEFAULT_TIME_COST,
+        "argon2_memory_mib": DEFAULT_MEMORY_MIB,
+        "argon2_parallelism": DEFAULT_PARALLELISM,
+        "argon2_hash_len": DEFAULT_HASH_LEN,
+        "target_ms": None,
+        "calibrated_at": None,
+    }
+
+
+def load_params() -> Dict[str, Any]:
+    # запись версии 1 (или её отсутствие) дополняется дефолтами; итерации PBKDF2 берутся как есть
+    from database import db
+
+    params = default_params()
+    blob = db.get_key_store("params")
+    if blob:
+        try:
+            stored = json.loads(blob.decode("utf-8") if isinstance(blob, bytes) else blob)
+        except (ValueError, UnicodeDecodeError):
+            stored = {}
+        if isinstance(stored, dict):
+            params.update({k: v for k, v in stored.items() if v is not None})
+    params["pbkdf2_iterations"] = int(params["pbkdf2_iterations"])
+    params["version"] = KDF_PARAMS_VERSION
+    return params
+
+
+def encode_params(params: Dict[str, Any]) -> bytes:
+    data = dict(params)
+    data["version"] = KDF_PARAMS_VERSION
+    return json.dumps(data, sort_keys=True).encode("utf-8")
+
+
+def save_params(params: Dict[str, Any]):
+    from database import db
+
+    db.set_key_store("params", encode_params(params), version=KDF_PARAMS_VERSION)
+
+
+def pbkdf2_iterations_for_new_key(params: Dict[str, Any]) -> int:
+    # смена пароля всё равно выводит новый KEK — самое время перейти на откалиброванные итерации
+    return int(params.get("pending_pbkdf2_iterations") or params["pbkdf2_iterations"])
+
+
+def _elapsed_ms(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000.0
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _calibrate_argon2(target_ms: float, parallelism: int) -> Dict[str, int]:
+    # один проход (t=1) на стартовой памяти; время Argon2 ~ t * m
+    memory_mib = DEFAULT_MEMORY_MIB
+    probe = PasswordHasher(time_cost=1, memory_cost=memory_mib * 1024, parallelism=parallelism, hash_len=DEFAULT_HASH_LEN)
+    per_pass = max(_elapsed_ms(lambda: probe.hash("calibration")), 0.1)
+    if per_pass * ARGON2_MIN_TIME_COST > target_ms:
+        # медленная машина: минимум проходов, память уменьшается, чтобы вход не растягивался на секунды
+        memory_mib = int(memory_mib * target_ms / (per_pass * ARGON2_MIN_TIME_COST))
+        time_cost = ARGON2_MIN_TIME_COST
+    else:
+        time_cost = _clamp(int(target_ms / per_pass), ARGON2_MIN_TIME_COST, ARGON2_MAX_TIME_COST)
+        if time_cost == ARGON2_MAX_TIME_COST:
+            # быстрая машина: запас по времени уходит в память (она дороже для перебора на GPU)
+            memory_mib = int(memory_mib * target_ms / (per_pass * ARGON2_MAX_TIME_COST))
+    return {
+        "argon2_time_cost": time_cost,
+        "argon2_memory_mib": _clamp(memory_mib, ARGON2_MIN_MEMORY_MIB, ARGON2_MAX_MEMORY_MIB),
+        "argon2_parallelism": parallelism,
+        "argon2_hash_len": DEFAULT_HASH_LEN,
+    }
+
+
+def _calibrate_pbkdf2(target_ms: float) -> int:
+    salt = os.urandom(PBKDF2_SALT_LEN)
+    probe_ms = max(
+        _elapsed_ms(lambda: hashlib.pbkdf2_hmac("sha256", b"calibration", salt, _PBKDF2_PROBE_ITERATIONS, dklen=PBKDF2_KEY_LEN)),
+        0.01,
+    )
+    iterations = int(_PBKDF2_PROBE_ITERATIONS * target_ms / probe_ms)
+    # круглое число итераций — проще сверять в логах и экспорте параметров
+    iterations = iterations // 10_000 * 10_000
+    return _clamp(iterations, PBKDF2_MIN_ITERATIONS, PBKDF2_MAX_ITERATIONS)
+
+
+def calibrate(target_ms: float = TARGET_UNLOCK_MS) -> Dict[str, Any]:
+    # замер на этой машине; результат — полный набор параметров версии 2 (ещё не сохранён)
+    parallelism = _clamp(os.cpu_count() or 1, 1, DEFAULT_PARALLELISM)
+    params = default_params()
+    params.update(_calibrate_argon2(target_ms, parallelism))
+    params["pbkdf2_iterations"] = _calibrate_pbkdf2(target_ms)
+    params["target_ms"] = int(target_ms)
+    params["calibrated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return params
+
+
+def apply_calibration(calibrated: Dict[str, Any], current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # калибровка для существующего хранилища: Argon2 — сразу (хеш пересчитается при следующем входе),
+    # PBKDF2 — отложенно, до смены пароля (текущий DEK обёрнут ключом со старыми итерациями)
+    params = dict(current if current is not None else load_params())
+    for k in ("argon2_time_cost", "argon2_memory_mib", "argon2_parallelism", "argon2_hash_len", "target_ms", "calibrated_at"):
+        params[k] = calibrated[k]
+    if int(calibrated["pbkdf2_iterations"]) != int(params["pbkdf2_iterations"]):
+        params["pending_pbkdf2_iterations"] = int(calibrated["pbkdf2_iterations"])
+    else:
+        params.pop("pending_pbkdf2_iterations", None)
+    save_params(params)
+    return params
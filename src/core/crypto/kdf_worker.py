@@ -0,0 +1,164 @@
+# фоновый вывод ключей: проверка Argon2, PBKDF2 и хеширование нового пароля не выполняются в GUI-потоке
+# независимые операции идут параллельно (argon2-cffi и hashlib.pbkdf2_hmac отпускают GIL),
+# поэтому вход занимает max(argon2, pbkdf2), а не их сумму
+# прогресс и завершение — через callback'и из фонового потока (GUI пересылает их сигналами Qt)
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from . import kdf_params
+from .key_derivation import derive_key_pbkdf2, hash_password_argon2, verify_password_argon2
+
+KDF_STAGE_WAIT = "wait"
+KDF_STAGE_VERIFY = "verify"
+KDF_STAGE_DERIVE = "derive"
+KDF_STAGE_HASH = "hash"
+KDF_STAGE_CALIBRATE = "calibrate"
+
+
+class KdfResult:
+    def __init__(self, ok: bool = False, key: Optional[bytes] = None, auth_hash: Optional[str] = None, error=None,
+                 params: Optional[dict] = None):
+        # ok — пароль подтверждён (или проверка не требовалась); key/auth_hash — только при ok
+        # params — результат калибровки (calibrate)
+        self.ok = ok
+        self.key = key
+        self.auth_hash = auth_hash
+        self.error = error
+        self.params = params
+
+
+class KdfJob:
+    def __init__(self, stages: List[str], on_progress=None, on_done=None):
+        self._stages = stages
+        self._completed: List[str] = []
+        self._on_progress = on_progress
+        self._on_done = on_done
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.result: Optional[KdfResult] = None
+
+    @property
+    def progress(self) -> float:
+        with self._lock:
+            return len(self._completed) / float(len(self._stages) or 1)
+
+    def done(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[KdfResult]:
+        self._event.wait(timeout)
+        return self.result
+
+    def _step(self, stage: str):
+        with self._lock:
+            self._completed.append(stage)
+            fraction = len(self._completed) / float(len(self._stages) or 1)
+        if self._on_progress is not None:
+            try:
+                self._on_progress(stage, fraction)
+            except Exception:
+                pass
+
+    def _finish(self, result: KdfResult):
+        # callback до события: к возврату wait() on_done уже отработал
+        self.result = result
+        if self._on_done is not None:
+            try:
+                self._on_done(result)
+            except Exception:
+                pass
+        self._event.set()
+
+
+class KdfWorker:
+    def __init__(self, max_workers: int = 3):
+        # пул только для «листовых» операций; координатор каждой задачи — отдельный поток,
+        # поэтому задачи не ждут друг друга внутри пула
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kdf")
+
+    def _run(self, job: KdfJob, delay: float, tasks: List[tuple], combine: Callable):
+        # tasks: [(stage, fn, args)]; combine(results_by_stage) -> KdfResult
+        def coordinator():
+            try:
+                if delay > 0:
+                    time.sleep(delay)
+                    job._step(KDF_STAGE_WAIT)
+                futures = {self._pool.submit(fn, *args): stage for stage, fn, args in tasks}
+                results = {}
+                # прогресс — по мере завершения этапов, в порядке их готовности
+                for fut in as_completed(futures):
+                    results[futures[fut]] = fut.result()
+                    job._step(futures[fut])
+                job._finish(combine(results))
+            except Exception as exc:
+                job._finish(KdfResult(ok=False, error=exc))
+
+        threading.Thread(target=coordinator, name="kdf-job", daemon=True).start()
+        return job
+
+    def unlock(self, password: str, stored_hash: str, salt: bytes, iterations: Optional[int] = None, *,
+               delay: float = 0.0, on_progress=None, on_done=None) -> KdfJob:
+        # вход: проверка Argon2 и вывод ключа PBKDF2 одновременно; при неверном пароле ключ не отдаётся
+        # delay — задержка backoff после неудачных попыток (ждёт фоновый поток, а не GUI)
+        stages = ([KDF_STAGE_WAIT] if delay > 0 else []) + [KDF_STAGE_VERIFY, KDF_STAGE_DERIVE]
+
+        def combine(res):
+            if not res[KDF_STAGE_VERIFY]:
+                return KdfResult(ok=False)
+            return KdfResult(ok=True, key=res[KDF_STAGE_DERIVE])
+
+        return self._run(
+            KdfJob(stages, on_progress, on_done),
+            delay,
+            [
+                (KDF_STAGE_VERIFY, verify_password_argon2, (stored_hash, password)),
+                (KDF_STAGE_DERIVE, derive_key_pbkdf2, (password, salt, iterations)),
+            ],
+            combine,
+        )
+
+    def new_credentials(self, new_password: str, salt: bytes, iterations: Optional[int] = None, *,
+                        current_password: Optional[str] = None, stored_hash: Optional[str] = None,
+                        derive_key: bool = True, params: Optional[dict] = None,
+                        on_progress=None, on_done=None) -> KdfJob:
+        # смена пароля / первый запуск: хеш Argon2 нового пароля и ключ PBKDF2 (и, если задан, проверка текущего)
+        # params — набор kdf_params: новый хеш Argon2 считается с его параметрами
+        tasks = []
+        if current_password is not None:
+            tasks.append((KDF_STAGE_VERIFY, verify_password_argon2, (stored_hash, current_password)))
+        tasks.append((KDF_STAGE_HASH, hash_password_argon2, (new_password, params)))
+        if derive_key:
+            tasks.append((KDF_STAGE_DERIVE, derive_key_pbkdf2, (new_password, salt, iterations)))
+
+        def combine(res):
+            if current_password is not None and not res[KDF_STAGE_VERIFY]:
+                return KdfResult(ok=False)
+            return KdfResult(ok=True, key=res.get(KDF_STAGE_DERIVE), auth_hash=res[KDF_STAGE_HASH])
+
+        return self._run(KdfJob([t[0] for t in tasks], on_progress, on_done), 0.0, tasks, combine)
+
+    def calibrate(self, target_ms: float = kdf_params.TARGET_UNLOCK_MS, *, on_progress=None, on_done=None) -> KdfJob:
+        # замер KDF на этой машине (несколько сотен мс) — тоже не в GUI-потоке
+        return self._run(
+            KdfJob([KDF_STAGE_CALIBRATE], on_progress, on_done),
+            0.0,
+            [(KDF_STAGE_CALIBRATE, kdf_params.calibrate, (target_ms,))],
+            lambda res: KdfResult(ok=True, params=res[KDF_STAGE_CALIBRATE]),
+        )
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+_kdf_worker_instance = None
+
+
+def get_kdf_worker() -> KdfWorker:
+    # один общий пул KDF на приложение
+    global _kdf_worker_instance
+    if _kdf_worker_instance is None:
+        _kdf_worker_instance = KdfWorker()
+    return _kdf_worker_instance
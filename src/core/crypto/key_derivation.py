@@ -33,12 +33,33 @@ def _get_hasher(time_cost=None, memory_cost=None, parallelism=None, hash_len=Non
     )
 
 
-def hash_password_argon2(password: str) -> str:
+def _hasher_for(params=None):
+    # params — набор из key_store("params") (kdf_params); без него — config/дефолты
+    if not params:
+        return _get_hasher()
+    memory_mib = params.get("argon2_memory_mib")
+    return _get_hasher(
+        time_cost=params.get("argon2_time_cost"),
+        memory_cost=int(memory_mib) * 1024 if memory_mib else None,
+        parallelism=params.get("argon2_parallelism"),
+        hash_len=params.get("argon2_hash_len"),
+    )
+
+
+def hash_password_argon2(password: str, params=None) -> str:
     # пароль хешируется Argon2id; строка содержит соль и параметры, её сохраняем в config
-    hasher = _get_hasher()
+    hasher = _hasher_for(params)
     return hasher.hash(password)
 
 
+def argon2_needs_rehash(stored_hash: str, params=None) -> bool:
+    # хеш посчитан с другими параметрами (например, после калибровки) — пересчитать при следующем входе
+    try:
+        return _hasher_for(params).check_needs_rehash(stored_hash)
+    except Exception:
+        return False
+
+
 def verify_password_argon2(stored_hash: str, password: str) -> bool:
     # проверка пароля против сохранённого Argon2-хеша; при ошибке — фиктивное сравнение чтобы не светить тайминг
     if not stored_hash or not password:
@@ -4,6 +4,10 @@ import ctypes
 
 # ключ хранится только пока хранилище разблокировано; снаружи доступ через get/set/clear
 _cached_key = None
+# кто должен очиститься вместе с ключом (кэши расшифрованных данных сессии)
+_clear_listeners = []
+# растёт при каждой установке/очистке ключа: кэши, привязанные к ключу, сверяются с ним без чтения ключа
+_key_generation = 0
 
 
 def _zero_key(buf):
@@ -20,10 +24,26 @@ def _zero_key(buf):
         ctypes.memset(ctypes.addressof(arr), 0, len(mutable))
 
 
+def add_clear_listener(callback):
+    # callback() вызывается при каждом clear_cached_key (logout, авто-блокировка, таймаут неактивности)
+    if callback not in _clear_listeners:
+        _clear_listeners.append(callback)
+
+
+def remove_clear_listener(callback):
+    if callback in _clear_listeners:
+        _clear_listeners.remove(callback)
+
+
 def set_cached_key(key: bytes):
     # в кэш кладётся копия ключа; при clear обнуляется временный буфер
-    global _cached_key
+    global _cached_key, _key_generation
     _cached_key = bytes(key) if key else None
+    _key_generation += 1
+
+
+def get_key_generation() -> int:
+    return _key_generation
 
 
 def get_cached_key():
@@ -42,9 +62,14 @@ def get_cached_key():
 
 def clear_cached_key():
     # ключ удаляется из кэша и обнуляется в памяти (при logout, авто-блокировке, закрытии)
-    global _cached_key
+    global _cached_key, _key_generation
+    _key_generation += 1
     if _cached_key is not None:
         mutable = bytearray(_cached_key)
         _zero_key(mutable)
         _cached_key = None
-
+    for cb in list(_clear_listeners):
+        try:
+            cb()
+        except Exception:
+            pass
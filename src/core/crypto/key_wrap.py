@@ -0,0 +1,38 @@
+# обёртка ключа данных (DEK) ключом из пароля (KEK): записи хранилища шифруются случайным DEK,
+# в key_store("wrapped_dek") лежит nonce || AES-256-GCM(KEK, DEK) — смена пароля переобёртывает 32 байта
+
+import os
+
+DEK_LEN = 32
+WRAPPED_DEK_KEY_TYPE = "wrapped_dek"
+WRAPPED_DEK_VERSION = 1
+_NONCE_LEN = 12
+# AAD привязывает шифротекст к назначению: обёрнутый DEK нельзя выдать за запись хранилища
+_AAD = b"cryptosafe-dek|v1"
+
+
+def _aesgcm(key: bytes):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    return AESGCM(bytes(key))
+
+
+def generate_dek() -> bytes:
+    return os.urandom(DEK_LEN)
+
+
+def wrap_dek(kek: bytes, dek: bytes) -> bytes:
+    nonce = os.urandom(_NONCE_LEN)
+    return nonce + _aesgcm(kek).encrypt(nonce, bytes(dek), _AAD)
+
+
+def unwrap_dek(kek: bytes, blob: bytes) -> bytes:
+    # неверный KEK или подменённый blob — ValueError (тег GCM не сошёлся)
+    from cryptography.exceptions import InvalidTag
+
+    if not blob or len(blob) != _NONCE_LEN + DEK_LEN + 16:
+        raise ValueError("Повреждённый ключ хранилища")
+    try:
+        return _aesgcm(kek).decrypt(blob[:_NONCE_LEN], blob[_NONCE_LEN:], _AAD)
+    except InvalidTag as e:
+        raise ValueError("Ключ хранилища не расшифровывается") from e
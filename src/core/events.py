@@ -9,6 +9,10 @@ EntryAdded = "EntryAdded"
 EntryCreated = "EntryCreated"
 EntryUpdated = "EntryUpdated"
 EntryDeleted = "EntryDeleted"
+# пакетные события (bulk CRUD): одно событие на транзакцию, в payload — entry_ids
+EntriesCreated = "EntriesCreated"
+EntriesUpdated = "EntriesUpdated"
+EntriesDeleted = "EntriesDeleted"
 UserLoggedIn = "UserLoggedIn"
 UserLoggedOut = "UserLoggedOut"
 ClipboardCopied = "ClipboardCopied"
@@ -31,6 +35,13 @@ def subscribe(event_type, callback):
     _subscribers[event_type].append(callback)
 
 
+def unsubscribe(event_type, callback):
+    # отписка (например, при закрытии окна, чтобы кэш не получал события после уничтожения)
+    callbacks = _subscribers.get(event_type, [])
+    if callback in callbacks:
+        callbacks.remove(callback)
+
+
 def publish(event_type, sync=True, **kwargs):
     # sync=True — подписчики вызываются сразу; False — событие кладётся в очередь
     if sync:
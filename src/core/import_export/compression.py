@@ -0,0 +1,221 @@
+# кодеки сжатия для экспорта и QR (спринт 6, EXP/QR)
+# кодек задаётся строкой "имя[:уровень]" — "zlib:9", "gzip", "lzma:1", "zstd:3", "none"; эта же строка
+# (Codec.spec) пишется в метаданные пакета, по ней читатель выбирает распаковку
+# zstd — только если установлен пакет zstandard; lzma, zlib и gzip — стандартная библиотека
+# "auto" — кодек выбирается по образцу данных (select_codec): самый компактный из достаточно быстрых
+
+import gzip
+import lzma
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Type, Union
+
+AUTO = "auto"
+# образец для auto: начало данных, не больше
+AUTO_SAMPLE_BYTES = 64 * 1024
+# auto не берёт кодек медленнее этого (МБ/с на образце)
+AUTO_MIN_MBPS = 20.0
+# кандидаты auto по порядку предпочтения при равном размере; недоступные пропускаются
+AUTO_CANDIDATES = ("zstd:3", "zlib:6", "zlib:1", "lzma:1")
+
+
+class Codec:
+    name = ""
+    default_level: Optional[int] = None
+    levels = range(0)
+
+    def __init__(self, level: Optional[int] = None):
+        if level is None:
+            level = self.default_level
+        elif level not in self.levels:
+            raise ValueError("Уровень сжатия %s вне диапазона для %s" % (level, self.name))
+        self.level = level
+
+    @property
+    def spec(self) -> str:
+        return self.name if self.level is None else "%s:%d" % (self.name, self.level)
+
+    def __repr__(self):
+        return "<Codec %s>" % self.spec
+
+    def compressor(self):
+        # потоковый объект с compress(data) и flush()
+        raise NotImplementedError
+
+    def decompressor(self):
+        # потоковый объект с decompress(data) (и, возможно, flush())
+        raise NotImplementedError
+
+    def compress(self, data: bytes) -> bytes:
+        c = self.compressor()
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        return b"".join(self.iter_decompress((data,)))
+
+    def iter_compress(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        c = self.compressor()
+        for chunk in chunks:
+            out = c.compress(chunk)
+            if out:
+                yield out
+        tail = c.flush()
+        if tail:
+            yield tail
+
+    def iter_decompress(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        d = self.decompressor()
+        for chunk in chunks:
+            out = d.decompress(chunk)
+            if out:
+                yield out
+        flush = getattr(d, "flush", None)
+        if flush is not None:
+            tail = flush()
+            if tail:
+                yield tail
+
+
+class _Passthrough:
+    def compress(self, data: bytes) -> bytes:
+        return bytes(data)
+
+    decompress = compress
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class NoneCodec(Codec):
+    name = "none"
+
+    def compressor(self):
+        return _Passthrough()
+
+    def decompressor(self):
+        return _Passthrough()
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+    default_level = 6
+    levels = range(0, 10)
+    _wbits = zlib.MAX_WBITS
+
+    def compressor(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, self._wbits)
+
+    def decompressor(self):
+        return zlib.decompressobj(self._wbits)
+
+
+class GzipCodec(ZlibCodec):
+    # формат gzip.compress (прежний compressed=True); уровень по умолчанию — как у gzip.compress
+    name = "gzip"
+    default_level = 9
+    _wbits = 16 + zlib.MAX_WBITS
+
+    def decompress(self, data: bytes) -> bytes:
+        # gzip.decompress читает и склеенные члены gzip
+        return gzip.decompress(data)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+    default_level = 6
+    levels = range(0, 10)
+
+    def compressor(self):
+        return lzma.LZMACompressor(preset=self.level)
+
+    def decompressor(self):
+        return lzma.LZMADecompressor()
+
+
+CODECS: Dict[str, Type[Codec]] = {}
+
+
+def register_codec(cls: Type[Codec]) -> Type[Codec]:
+    CODECS[cls.name] = cls
+    return cls
+
+
+for _cls in (NoneCodec, ZlibCodec, GzipCodec, LzmaCodec):
+    register_codec(_cls)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+if zstandard is not None:
+
+    @register_codec
+    class ZstdCodec(Codec):
+        name = "zstd"
+        default_level = 3
+        levels = range(1, 23)
+
+        def compressor(self):
+            return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+        def decompressor(self):
+            return zstandard.ZstdDecompressor().decompressobj()
+
+
+def available_codecs() -> list:
+    return sorted(CODECS)
+
+
+def get_codec(spec: Union[str, bool, None, Codec] = None) -> Codec:
+    # True — gzip (прежний флаг compress), False / None / "" — без сжатия
+    if isinstance(spec, Codec):
+        return spec
+    if spec is True:
+        return GzipCodec()
+    if not spec:
+        return NoneCodec()
+    name, _, level = str(spec).strip().lower().partition(":")
+    if name == AUTO:
+        raise ValueError("auto выбирается по данным: select_codec(образец)")
+    cls = CODECS.get(name)
+    if cls is None:
+        raise ValueError("Кодек сжатия недоступен: %s" % name)
+    try:
+        return cls(int(level) if level else None)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Неверный кодек сжатия: %s" % spec) from exc
+
+
+def is_auto(spec) -> bool:
+    return isinstance(spec, str) and spec.strip().lower() == AUTO
+
+
+def select_codec(
+    sample: bytes,
+    candidates: Optional[Sequence[str]] = None,
+    min_mbps: float = AUTO_MIN_MBPS,
+) -> Codec:
+    # auto: каждый кандидат сжимает образец; из тех, что не медленнее min_mbps, берётся самый компактный;
+    # если ничего не ужимает образец — "none" (например, уже сжатые или зашифрованные данные)
+    sample = bytes(sample[:AUTO_SAMPLE_BYTES])
+    best: Optional[Codec] = None
+    best_size = len(sample)
+    for spec in candidates or AUTO_CANDIDATES:
+        try:
+            codec = get_codec(spec)
+        except ValueError:
+            continue
+        started = time.perf_counter()
+        size = len(codec.compress(sample))
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        if sample and min_mbps and len(sample) / elapsed / 1e6 < min_mbps:
+            continue
+        if size < best_size:
+            best, best_size = codec, size
+    return best or NoneCodec()
+
+
+def resolve_codec(spec: Union[str, bool, None, Codec], sample: bytes = b"") -> Codec:
+    # spec из настроек экспорта: "auto" выбирается по образцу, остальное — get_codec
+    return select_codec(sample) if is_auto(spec) else get_codec(spec)
@@ -0,0 +1,141 @@
+# поиск дубликатов при импорте (IMP): индекс по нормализованному ключу вместо прохода по всем записям
+# индекс строится один раз из list_entries и пополняется созданными записями — импорт линеен по размеру файла
+# стратегии:
+# - exact           — title + username без учёта регистра (прежнее поведение)
+# - normalized_url  — title + username + домен (без схемы, www., порта и пути), пробелы схлопнуты
+# - fuzzy           — username + домен совпадают, title похож (SequenceMatcher >= FUZZY_TITLE_RATIO);
+#                     сравнение только внутри корзины (username, домен) и не больше FUZZY_BUCKET_LIMIT записей
+
+import difflib
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+FUZZY_TITLE_RATIO = 0.8
+FUZZY_BUCKET_LIMIT = 64
+
+_SPACES = re.compile(r"\s+")
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def _text(value) -> str:
+    return _SPACES.sub(" ", str(value or "")).strip().casefold()
+
+
+def normalize_domain(url) -> str:
+    # "https://www.Example.com:443/login" и "example.com" -> "example.com"
+    raw = str(url or "").strip()
+    if not raw:
+        return ""
+    parsed = urlparse(raw if "://" in raw else "//" + raw)
+    host = (parsed.hostname or "").casefold().rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def _entry_domain(entry: Dict[str, Any]) -> str:
+    # полная запись несёт url, строка списка — уже url_domain
+    return normalize_domain(entry.get("url") or entry.get("url_domain"))
+
+
+class DuplicateIndex:
+    # ключ записи -> id первой записи с этим ключом (None — ещё не записанная строка импорта);
+    # сами записи (и пароли) индекс не держит; проверка — O(1) в среднем
+    name = ""
+
+    def __init__(self):
+        self._ids: Dict[Tuple, Optional[int]] = {}
+
+    def key(self, entry: Dict[str, Any]) -> Tuple:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def extend(self, entries: Iterable[Dict[str, Any]]):
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: Dict[str, Any]):
+        self._ids.setdefault(self.key(entry), entry.get("id"))
+
+    def __contains__(self, entry: Dict[str, Any]) -> bool:
+        return self.key(entry) in self._ids
+
+    def find_id(self, entry: Dict[str, Any]) -> Optional[int]:
+        # id совпавшей записи хранилища; None — совпадения нет или совпала ещё не записанная строка
+        return self._ids.get(self.key(entry))
+
+
+class ExactDuplicateIndex(DuplicateIndex):
+    name = "exact"
+
+    def key(self, entry):
+        return ((entry.get("title") or "").lower(), (entry.get("username") or "").lower())
+
+
+class NormalizedUrlDuplicateIndex(DuplicateIndex):
+    name = "normalized_url"
+
+    def key(self, entry):
+        return (_text(entry.get("title")), _text(entry.get("username")), _entry_domain(entry))
+
+
+class FuzzyDuplicateIndex(DuplicateIndex):
+    name = "fuzzy"
+
+    def __init__(self):
+        super().__init__()
+        # (username, домен) -> [(title без пунктуации, id)]
+        self._buckets: Dict[Tuple[str, str], List[Tuple[str, Optional[int]]]] = {}
+
+    @staticmethod
+    def _title(entry) -> str:
+        return _NON_ALNUM.sub("", _text(entry.get("title")))
+
+    def key(self, entry):
+        return (_text(entry.get("username")), _entry_domain(entry), self._title(entry))
+
+    def add(self, entry):
+        key = self.key(entry)
+        if key in self._ids:
+            return
+        self._ids[key] = entry.get("id")
+        self._buckets.setdefault(key[:2], []).append((key[2], entry.get("id")))
+
+    def _match(self, entry) -> Tuple[bool, Optional[int]]:
+        key = self.key(entry)
+        if key in self._ids:
+            return True, self._ids[key]
+        if not key[2]:
+            return False, None
+        for title, entry_id in self._buckets.get(key[:2], ())[:FUZZY_BUCKET_LIMIT]:
+            if title and difflib.SequenceMatcher(None, key[2], title).ratio() >= FUZZY_TITLE_RATIO:
+                return True, entry_id
+        return False, None
+
+    def __contains__(self, entry):
+        return self._match(entry)[0]
+
+    def find_id(self, entry):
+        return self._match(entry)[1]
+
+
+DUPLICATE_STRATEGIES: Dict[str, Callable[[], DuplicateIndex]] = {
+    ExactDuplicateIndex.name: ExactDuplicateIndex,
+    NormalizedUrlDuplicateIndex.name: NormalizedUrlDuplicateIndex,
+    FuzzyDuplicateIndex.name: FuzzyDuplicateIndex,
+}
+
+
+def register_duplicate_strategy(name: str, factory: Callable[[], DuplicateIndex]):
+    DUPLICATE_STRATEGIES[name] = factory
+
+
+def make_duplicate_index(strategy: Union[str, Callable[[], DuplicateIndex]] = "exact") -> DuplicateIndex:
+    # strategy — имя из DUPLICATE_STRATEGIES или фабрика своего DuplicateIndex
+    if callable(strategy):
+        return strategy()
+    try:
+        return DUPLICATE_STRATEGIES[strategy]()
+    except KeyError:
+        raise ValueError("Неизвестная стратегия поиска дубликатов: %s" % strategy) from None
@@ -1,18 +1,21 @@
 # экспорт хранилища (спринт 6, EXP)
 
+import inspect
 import json
 import os
 import secrets
 import tempfile
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
 from core import events
 from core.crypto.authentication import verify_master_password
 
+from .compression import get_codec, is_auto
 from .export_crypto import derive_export_material
 from .formats.bitwarden_format import entries_to_bitwarden
 from .formats.csv_format import entries_to_csv
+from .formats.export_v2_format import write_encrypted_export_v2
 from .formats.json_format import build_encrypted_export
 
 
@@ -21,29 +24,67 @@ class ExportOptions:
         self,
         *,
         include_notes: bool = True,
-        compress: bool = False,
+        compress: Union[bool, str] = False,
         key_bits: int = 256,
         entry_ids: Optional[List[int]] = None,
         recipient_public_key_pem: Optional[str] = None,
     ):
         self.include_notes = include_notes
+        # True — gzip (как раньше), строка — кодек из compression: "zlib:9", "lzma:1", "zstd", "auto"
         self.compress = compress
         self.key_bits = key_bits
         self.entry_ids = entry_ids
         self.recipient_public_key_pem = recipient_public_key_pem
 
 
+class _CountingIter:
+    # считает отданные записи: entry_count в событии без промежуточного списка
+    def __init__(self, items: Iterable[Dict[str, Any]]):
+        self._it = iter(items)
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        item = next(self._it)
+        self.count += 1
+        return item
+
+
 class VaultExporter:
     def __init__(self, entry_provider):
-        # entry_provider: callable() -> List[dict] полных записей (с password)
+        # entry_provider: callable() -> iterable полных записей (с password),
+        # например EntryManager.iter_entries — записи расшифровываются по мере записи в файл
+        # если провайдер принимает errors=, повреждённые записи пропускаются и попадают в skipped_entries
         self._entries = entry_provider
+        try:
+            self._accepts_errors = "errors" in inspect.signature(entry_provider).parameters
+        except (TypeError, ValueError):
+            self._accepts_errors = False
+        self.skipped_entries: List[Dict[str, Any]] = []
 
-    def _select_entries(self, options: ExportOptions) -> List[Dict[str, Any]]:
-        all_entries = self._entries()
+    def _select_entries(self, options: ExportOptions) -> _CountingIter:
+        self.skipped_entries = []
+        if self._accepts_errors:
+            all_entries = self._entries(errors=self.skipped_entries)
+        else:
+            all_entries = self._entries()
         if not options.entry_ids:
-            return all_entries
+            return _CountingIter(all_entries)
         ids = set(options.entry_ids)
-        return [e for e in all_entries if e.get("id") in ids]
+        return _CountingIter(e for e in all_entries if e.get("id") in ids)
+
+    @staticmethod
+    def _check_encrypted(master_password: Optional[str], options: Optional[ExportOptions]) -> ExportOptions:
+        if master_password is not None and not verify_master_password(master_password):
+            raise PermissionError("Неверный мастер-пароль")
+        options = options or ExportOptions()
+        if options.key_bits not in (128, 256):
+            raise ValueError("Поддерживается key_bits 128 или 256")
+        if not is_auto(options.compress):
+            get_codec(options.compress)  # неизвестный кодек — до чтения хранилища
+        return options
 
     def export_encrypted_json(
         self,
@@ -52,11 +93,7 @@ class VaultExporter:
         master_password: Optional[str] = None,
         options: Optional[ExportOptions] = None,
     ) -> Dict[str, Any]:
-        if master_password is not None and not verify_master_password(master_password):
-            raise PermissionError("Неверный мастер-пароль")
-        options = options or ExportOptions()
-        if options.key_bits not in (128, 256):
-            raise ValueError("Поддерживается key_bits 128 или 256")
+        options = self._check_encrypted(master_password, options)
         entries = self._select_entries(options)
         data_key = secrets.token_bytes(16 if options.key_bits == 128 else 32)
         _ = derive_export_material()  # ARC-2: отделение от vault-ключа
@@ -72,7 +109,8 @@ class VaultExporter:
             events.VaultExported,
             sync=True,
             format="encrypted_json",
-            entry_count=len(entries),
+            entry_count=entries.count,
+            skipped=len(self.skipped_entries),
             selective=bool(options.entry_ids),
         )
         return package
@@ -92,6 +130,42 @@ class VaultExporter:
         )
         return self._write_temp_json(path, package)
 
+    def write_encrypted_v2_file(
+        self,
+        path: str,
+        export_password: str,
+        *,
+        master_password: Optional[str] = None,
+        options: Optional[ExportOptions] = None,
+    ) -> str:
+        # контейнер v2 (formats/export_v2_format): записи шифруются чанками по мере чтения из хранилища
+        options = self._check_encrypted(master_password, options)
+        entries = self._select_entries(options)
+        data_key = secrets.token_bytes(16 if options.key_bits == 128 else 32)
+        _ = derive_export_material()  # ARC-2: отделение от vault-ключа
+        target = self._write_temp(
+            path,
+            ".csx",
+            lambda f: write_encrypted_export_v2(
+                f,
+                entries,
+                export_password,
+                include_notes=options.include_notes,
+                compress=options.compress,
+                data_key=data_key,
+                recipient_public_key_pem=options.recipient_public_key_pem,
+            ),
+        )
+        events.publish(
+            events.VaultExported,
+            sync=True,
+            format="encrypted_v2",
+            entry_count=entries.count,
+            skipped=len(self.skipped_entries),
+            selective=bool(options.entry_ids),
+        )
+        return target
+
     def export_csv(self, *, encrypt: bool = False, export_password: str = "", options: Optional[ExportOptions] = None) -> str:
         options = options or ExportOptions()
         entries = self._select_entries(options)
@@ -105,22 +179,33 @@ class VaultExporter:
                 include_notes=True,
             )
             return json.dumps(pkg, ensure_ascii=False)
-        events.publish(events.VaultExported, sync=True, format="csv", entry_count=len(entries), selective=bool(options.entry_ids))
+        events.publish(events.VaultExported, sync=True, format="csv", entry_count=entries.count,
+                       skipped=len(self.skipped_entries), selective=bool(options.entry_ids))
         return text
 
     def export_bitwarden(self, options: Optional[ExportOptions] = None) -> str:
         options = options or ExportOptions()
         entries = self._select_entries(options)
-        events.publish(events.VaultExported, sync=True, format="bitwarden", entry_count=len(entries), selective=bool(options.entry_ids))
-        return entries_to_bitwarden(entries)
+        text = entries_to_bitwarden(entries)
+        events.publish(events.VaultExported, sync=True, format="bitwarden", entry_count=entries.count,
+                       skipped=len(self.skipped_entries), selective=bool(options.entry_ids))
+        return text
+
+    @classmethod
+    def _write_temp_json(cls, path: str, package: Dict[str, Any]) -> str:
+        def dump(f):
+            f.write(json.dumps(package, ensure_ascii=False, indent=2).encode("utf-8"))
+
+        return cls._write_temp(path, ".json", dump)
 
     @staticmethod
-    def _write_temp_json(path: str, package: Dict[str, Any]) -> str:
+    def _write_temp(path: str, default_suffix: str, write: Callable[[BinaryIO], Any]) -> str:
+        # запись во временный файл рядом с целевым и замена — недописанный экспорт не остаётся под именем файла
         target = Path(path)
-        fd, tmp = tempfile.mkstemp(suffix=target.suffix or ".json", dir=str(target.parent or "."))
+        fd, tmp = tempfile.mkstemp(suffix=target.suffix or default_suffix, dir=str(target.parent or "."))
         try:
-            with os.fdopen(fd, "w", encoding="utf-8") as f:
-                json.dump(package, f, ensure_ascii=False, indent=2)
+            with os.fdopen(fd, "wb") as f:
+                write(f)
             if target.exists():
                 target.unlink()
             os.replace(tmp, str(target))
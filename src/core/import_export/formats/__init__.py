@@ -1,12 +1,19 @@
 from .json_format import build_encrypted_export, parse_encrypted_export
-from .csv_format import entries_to_csv, csv_to_entries
-from .bitwarden_format import entries_to_bitwarden, bitwarden_to_entries
+from .csv_format import entries_to_csv, csv_to_entries, iter_csv_entries
+from .bitwarden_format import entries_to_bitwarden, bitwarden_to_entries, iter_bitwarden_entries
+from .export_v2_format import ExportV2Reader, ExportV2Writer, read_encrypted_export_v2, write_encrypted_export_v2
 
 __all__ = [
     "build_encrypted_export",
     "parse_encrypted_export",
     "entries_to_csv",
     "csv_to_entries",
+    "iter_csv_entries",
     "entries_to_bitwarden",
     "bitwarden_to_entries",
+    "iter_bitwarden_entries",
+    "ExportV2Reader",
+    "ExportV2Writer",
+    "read_encrypted_export_v2",
+    "write_encrypted_export_v2",
 ]
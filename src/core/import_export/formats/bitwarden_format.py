@@ -1,10 +1,21 @@
 # совместимость с JSON Bitwarden (спринт 6, EXP-4)
+# импорт потоковый: массив items разбирается по одному элементу, файл целиком в память не читается
 
+import io
 import json
-from typing import Any, Dict, List
+import re
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
 
+STREAM_CHUNK = 64 * 1024
+# один элемент верхнего уровня не может быть больше — битый файл не разрастается в памяти до конца
+MAX_VALUE_CHARS = 16 * 1024 * 1024
 
-def entries_to_bitwarden(entries: List[Dict[str, Any]]) -> str:
+_WS = re.compile(r"[ \t\r\n]*")
+# после числа в буфере только символы числа — число могло оборваться на границе фрагмента ("12." + "5e3")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+def entries_to_bitwarden(entries: Iterable[Dict[str, Any]]) -> str:
     items = []
     for e in entries:
         items.append(
@@ -23,23 +34,112 @@ def entries_to_bitwarden(entries: List[Dict[str, Any]]) -> str:
     return json.dumps({"encrypted": False, "items": items}, ensure_ascii=False, indent=2)
 
 
+class _JsonStream:
+    # инкрементальный JSON: в памяти текущий фрагмент потока и одно значение, которое сейчас разбирается
+    def __init__(self, stream: TextIO, chunk: int = STREAM_CHUNK):
+        self._stream = stream
+        self._chunk = max(1, int(chunk))
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._stream.read(self._chunk)
+        if not data:
+            self._eof = True
+            return False
+        if len(self._buf) - self._pos + len(data) > MAX_VALUE_CHARS:
+            raise ValueError("Неверный JSON Bitwarden: слишком большой элемент")
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        # следующий значимый символ; "" — конец потока
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def take(self, char: str) -> bool:
+        if self.peek() != char:
+            return False
+        self._pos += 1
+        return True
+
+    def expect(self, char: str):
+        if not self.take(char):
+            raise ValueError("Неверный JSON Bitwarden: ожидалось %r" % char)
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # значение оборвалось на границе фрагмента — дочитываем
+                if self._fill():
+                    continue
+                raise
+            # число на границе фрагмента могло разобраться не целиком
+            if (
+                isinstance(obj, (int, float))
+                and not isinstance(obj, bool)
+                and _NUMBER_TAIL.fullmatch(self._buf, end)
+                and self._fill()
+            ):
+                continue
+            self._pos = end
+            return obj
+
+
+def _item_to_entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    login = item.get("login") or {}
+    uris = login.get("uris") or []
+    url = uris[0].get("uri", "") if uris else ""
+    return {
+        "title": item.get("name", "") or "",
+        "username": login.get("username", "") or "",
+        "password": login.get("password", "") or "",
+        "url": url,
+        "category": item.get("folder", "") or "",
+        "notes": item.get("notes", "") or "",
+    }
+
+
+def iter_bitwarden_entries(stream: TextIO, chunk: int = STREAM_CHUNK) -> Iterator[Dict[str, Any]]:
+    # {"encrypted": ..., "folders": [...], "items": [...]} — ключи верхнего уровня по очереди,
+    # элементы items отдаются по мере чтения
+    js = _JsonStream(stream, chunk)
+    js.expect("{")
+    if js.take("}"):
+        return
+    while True:
+        key = js.value()
+        js.expect(":")
+        if key == "items":
+            js.expect("[")
+            if not js.take("]"):
+                while True:
+                    item = js.value()
+                    if isinstance(item, dict):
+                        yield _item_to_entry(item)
+                    if not js.take(","):
+                        js.expect("]")
+                        break
+        else:
+            value = js.value()
+            if key == "encrypted" and value:
+                raise ValueError("Зашифрованный экспорт Bitwarden не поддерживается")
+        if not js.take(","):
+            js.expect("}")
+            return
+
+
 def bitwarden_to_entries(text: str) -> List[Dict[str, Any]]:
-    data = json.loads(text)
-    if data.get("encrypted"):
-        raise ValueError("Зашифрованный экспорт Bitwarden не поддерживается")
-    out: List[Dict[str, Any]] = []
-    for item in data.get("items") or []:
-        login = item.get("login") or {}
-        uris = login.get("uris") or []
-        url = uris[0].get("uri", "") if uris else ""
-        out.append(
-            {
-                "title": item.get("name", "") or "",
-                "username": login.get("username", "") or "",
-                "password": login.get("password", "") or "",
-                "url": url,
-                "category": item.get("folder", "") or "",
-                "notes": item.get("notes", "") or "",
-            }
-        )
-    return out
+    return list(iter_bitwarden_entries(io.StringIO(text)))
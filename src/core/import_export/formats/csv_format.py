@@ -2,12 +2,13 @@
 
 import csv
 import io
-from typing import Any, Dict, List
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List
 
 CSV_FIELDS = ("title", "username", "password", "url", "category", "notes")
 
 
-def entries_to_csv(entries: List[Dict[str, Any]]) -> str:
+def entries_to_csv(entries: Iterable[Dict[str, Any]]) -> str:
     buf = io.StringIO()
     writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, extrasaction="ignore")
     writer.writeheader()
@@ -17,14 +18,21 @@ def entries_to_csv(entries: List[Dict[str, Any]]) -> str:
     return buf.getvalue()
 
 
-def csv_to_entries(text: str) -> List[Dict[str, Any]]:
-    buf = io.StringIO(text.strip())
-    reader = csv.DictReader(buf)
+def skip_leading_blank(lines: Iterable[str]) -> Iterator[str]:
+    # пустые строки до заголовка (раньше — text.strip() над всем файлом)
+    return itertools.dropwhile(lambda line: not line.strip(), lines)
+
+
+def iter_csv_entries(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    # lines — текстовый поток (open(..., newline="")) или любой итератор строк; читается по строке
+    reader = csv.DictReader(skip_leading_blank(lines))
     if not reader.fieldnames:
         raise ValueError("Пустой CSV")
-    out: List[Dict[str, Any]] = []
     for row in reader:
         item = {f: (row.get(f) or "").strip() for f in CSV_FIELDS}
         if any(item.values()):
-            out.append(item)
-    return out
+            yield item
+
+
+def csv_to_entries(text: str) -> List[Dict[str, Any]]:
+    return list(iter_csv_entries(io.StringIO(text.strip())))
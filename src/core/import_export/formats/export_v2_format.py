@@ -0,0 +1,255 @@
+# зашифрованный экспорт v2 — бинарный контейнер из независимых чанков (спринт 6, EXP-2)
+# в отличие от v1 (один шифротекст в JSON) запись и чтение идут по чанку: в памяти не больше
+# CHUNK_ENTRIES записей, импорт начинает отдавать записи после первого чанка
+#
+# MAGIC | u32 длина заголовка | заголовок (JSON) | чанк 0 | чанк 1 | ... | индекс (JSON) | трейлер
+# - заголовок: формат, блок "kdf" (обёрнутый ключ данных, как в v1), префикс nonce, кодек сжатия (spec)
+# - чанк i: AES-GCM(ключ данных, nonce = префикс(4) || i (u64 BE), aad = sha256(заголовок) || i)
+#   над JSON-массивом записей чанка, сжатым кодеком заголовка (каждый чанк отдельно — для произвольного доступа)
+# - индекс: [[смещение, длина, записей], ...] и entry_count — по нему чанк читается без остальных
+# - трейлер: u64 смещение индекса | u32 длина индекса | HMAC-SHA256(заголовок || индекс) | END_MAGIC;
+#   ключ HMAC выводится из ключа данных (HKDF) — подмена, перестановка или обрезка чанков видна до чтения
+
+import hashlib
+import hmac
+import json
+import secrets
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from ..compression import get_codec, is_auto, resolve_codec
+from .json_format import APP_NAME, unwrap_data_key, wrap_data_key
+
+FORMAT_ID_V2 = "cryptosafe-export-v2"
+MAGIC = b"CSEXPv2\x00"
+END_MAGIC = b"CSEXPEND"
+CHUNK_ENTRIES = 256
+# защита от порченого файла: чанк, заголовок и индекс не читаются в память сверх этого
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+MAX_HEADER_BYTES = 1024 * 1024
+MAX_INDEX_BYTES = 64 * 1024 * 1024
+
+_U32 = struct.Struct(">I")
+_TRAILER = struct.Struct(">QI32s8s")
+INDEX_INFO = b"cryptosafe-export-v2-index"
+
+
+def _mac_key(data_key: bytes) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=INDEX_INFO).derive(data_key)
+
+
+def _chunk_nonce(prefix: bytes, counter: int) -> bytes:
+    return prefix + counter.to_bytes(8, "big")
+
+
+def _entry_item(e: Dict[str, Any], include_notes: bool) -> Dict[str, Any]:
+    item = {
+        "title": e.get("title", "") or "",
+        "username": e.get("username", "") or "",
+        "password": e.get("password", "") or "",
+        "url": e.get("url", "") or "",
+        "category": e.get("category", "") or "",
+    }
+    if include_notes:
+        item["notes"] = e.get("notes", "") or ""
+    return item
+
+
+def is_export_v2(head: bytes) -> bool:
+    return head[: len(MAGIC)] == MAGIC
+
+
+class ExportV2Writer:
+    # поток записей -> контейнер; stream может быть несикаемым (смещения считаются по записанным байтам)
+    def __init__(
+        self,
+        stream: BinaryIO,
+        export_password: str,
+        *,
+        include_notes: bool = True,
+        compress: Union[bool, str] = False,
+        data_key: Optional[bytes] = None,
+        recipient_public_key_pem: Optional[str] = None,
+        chunk_entries: int = CHUNK_ENTRIES,
+    ):
+        # compress: как в build_encrypted_export; "auto" выбирается по первому чанку,
+        # поэтому заголовок пишется вместе с ним
+        self._stream = stream
+        self._include_notes = include_notes
+        self._compress = compress
+        self._codec = None if is_auto(compress) else get_codec(compress)
+        self._chunk_entries = max(1, int(chunk_entries))
+        self._key = data_key if data_key is not None else secrets.token_bytes(32)
+        self._aesgcm = AESGCM(self._key)
+        self._nonce_prefix = secrets.token_bytes(4)
+        self._kdf = wrap_data_key(self._key, export_password, recipient_public_key_pem)
+        self._header = b""
+        self._header_hash = b""
+        self._pending: List[Dict[str, Any]] = []
+        self._index: List[List[int]] = []
+        self._count = 0
+        self._closed = False
+        self._offset = 0
+
+    def _write_header(self, sample: bytes):
+        self._codec = self._codec or resolve_codec(self._compress, sample)
+        header = {
+            "format": FORMAT_ID_V2,
+            "app": APP_NAME,
+            "version": 2,
+            "kdf": self._kdf,
+            "nonce_prefix": self._nonce_prefix.hex(),
+            "chunk_entries": self._chunk_entries,
+            "compression": self._codec.spec,
+            "include_notes": self._include_notes,
+        }
+        self._header = json.dumps(header, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        self._header_hash = hashlib.sha256(self._header).digest()
+        self._write(MAGIC + _U32.pack(len(self._header)) + self._header)
+
+    @property
+    def entry_count(self) -> int:
+        return self._count
+
+    def _write(self, data: bytes):
+        self._stream.write(data)
+        self._offset += len(data)
+
+    def write(self, entry: Dict[str, Any]):
+        if self._closed:
+            raise ValueError("Контейнер уже закрыт")
+        self._pending.append(_entry_item(entry, self._include_notes))
+        self._count += 1
+        if len(self._pending) >= self._chunk_entries:
+            self._flush()
+
+    def write_all(self, entries: Iterable[Dict[str, Any]]) -> int:
+        for entry in entries:
+            self.write(entry)
+        return self._count
+
+    def _flush(self):
+        if not self._pending:
+            return
+        counter = len(self._index)
+        raw = json.dumps(self._pending, ensure_ascii=False).encode("utf-8")
+        if not self._header:
+            self._write_header(raw)
+        raw = self._codec.compress(raw)
+        aad = self._header_hash + counter.to_bytes(8, "big")
+        sealed = self._aesgcm.encrypt(_chunk_nonce(self._nonce_prefix, counter), raw, aad)
+        self._index.append([self._offset, len(sealed), len(self._pending)])
+        self._write(sealed)
+        self._pending = []
+
+    def close(self) -> int:
+        # дописывает последний чанк, индекс и трейлер; поток не закрывает
+        if self._closed:
+            return self._count
+        self._flush()
+        if not self._header:
+            self._write_header(b"")
+        index = json.dumps({"chunks": self._index, "entry_count": self._count}).encode("utf-8")
+        index_offset = self._offset
+        signature = hmac.new(_mac_key(self._key), self._header + index, hashlib.sha256).digest()
+        self._write(index)
+        self._write(_TRAILER.pack(index_offset, len(index), signature, END_MAGIC))
+        self._closed = True
+        return self._count
+
+
+def write_encrypted_export_v2(stream: BinaryIO, entries: Iterable[Dict[str, Any]], export_password: str, **kwargs) -> int:
+    writer = ExportV2Writer(stream, export_password, **kwargs)
+    writer.write_all(entries)
+    return writer.close()
+
+
+class ExportV2Reader:
+    # stream — сикаемый бинарный поток; индекс и трейлер проверяются при открытии, чанки читаются по запросу
+    def __init__(self, stream: BinaryIO, export_password: str, *, private_key_pem: Optional[str] = None):
+        self._stream = stream
+        stream.seek(0)
+        if not is_export_v2(stream.read(len(MAGIC))):
+            raise ValueError("Неверный формат файла экспорта")
+        (header_len,) = _U32.unpack(self._read_exact(_U32.size))
+        if header_len > MAX_HEADER_BYTES:
+            raise ValueError("Повреждён заголовок экспорта")
+        self._header = self._read_exact(header_len)
+        self._data_start = len(MAGIC) + _U32.size + header_len
+        try:
+            self.header: Dict[str, Any] = json.loads(self._header.decode("utf-8"))
+            if self.header.get("format") != FORMAT_ID_V2:
+                raise ValueError
+            self._nonce_prefix = bytes.fromhex(self.header["nonce_prefix"])
+            if len(self._nonce_prefix) != 4:
+                raise ValueError
+            self.codec = get_codec(self.header.get("compression", "none"))
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Повреждён заголовок экспорта") from None
+        self._header_hash = hashlib.sha256(self._header).digest()
+        key = unwrap_data_key(self.header, export_password, private_key_pem)
+        self._aesgcm = AESGCM(key)
+        self._chunks = self._read_index(key)
+
+    def _read_exact(self, size: int) -> bytes:
+        data = self._stream.read(size)
+        if len(data) != size:
+            raise ValueError("Файл экспорта обрезан")
+        return data
+
+    def _read_index(self, key: bytes) -> List[List[int]]:
+        end = self._stream.seek(0, 2)
+        if end < self._data_start + _TRAILER.size:
+            raise ValueError("Файл экспорта обрезан")
+        self._stream.seek(end - _TRAILER.size)
+        index_offset, index_len, signature, end_magic = _TRAILER.unpack(self._read_exact(_TRAILER.size))
+        if end_magic != END_MAGIC or index_offset < self._data_start or index_offset + index_len + _TRAILER.size != end:
+            raise ValueError("Файл экспорта обрезан")
+        if index_len > MAX_INDEX_BYTES:
+            raise ValueError("Повреждён индекс экспорта")
+        self._stream.seek(index_offset)
+        index = self._read_exact(index_len)
+        expected = hmac.new(_mac_key(key), self._header + index, hashlib.sha256).digest()
+        if not hmac.compare_digest(signature, expected):
+            raise ValueError("Нарушена целостность экспорта (индекс)")
+        data = json.loads(index.decode("utf-8"))
+        chunks = [[int(o), int(n), int(c)] for o, n, c in data.get("chunks") or []]
+        self.entry_count = int(data.get("entry_count", 0))
+        for offset, length, _ in chunks:
+            if offset < self._data_start or offset + length > index_offset or length > MAX_CHUNK_BYTES:
+                raise ValueError("Повреждён индекс экспорта")
+        return chunks
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._chunks)
+
+    def read_chunk(self, i: int) -> List[Dict[str, Any]]:
+        # произвольный доступ: один чанк без чтения предыдущих
+        offset, length, count = self._chunks[i]
+        self._stream.seek(offset)
+        sealed = self._read_exact(length)
+        aad = self._header_hash + i.to_bytes(8, "big")
+        try:
+            raw = self._aesgcm.decrypt(_chunk_nonce(self._nonce_prefix, i), sealed, aad)
+        except Exception:
+            raise ValueError("Нарушена целостность экспорта (чанк %d)" % i) from None
+        raw = self.codec.decompress(raw)
+        entries = json.loads(raw.decode("utf-8"))
+        if not isinstance(entries, list) or len(entries) != count:
+            raise ValueError("Повреждён чанк экспорта %d" % i)
+        return entries
+
+    def iter_entries(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self._chunks)):
+            yield from self.read_chunk(i)
+
+
+def read_encrypted_export_v2(
+    stream: BinaryIO, export_password: str, *, private_key_pem: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    return ExportV2Reader(stream, export_password, private_key_pem=private_key_pem).iter_entries()
@@ -1,13 +1,13 @@
 # зашифрованный JSON — основной формат экспорта (спринт 6, EXP-2)
 
 import base64
-import gzip
 import hashlib
 import json
 import secrets
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Union
 
+from ..compression import get_codec, resolve_codec
 from ..export_crypto import (
     PBKDF2_EXPORT_ITERATIONS,
     decrypt_blob,
@@ -18,6 +18,9 @@ from ..export_crypto import (
 )
 
 FORMAT_ID = "cryptosafe-export-v1"
+# metadata.version: 1 — без сжатия или gzip (читается и версиями до кодеков: они знают только compressed);
+# 2 — другой кодек из compression; версии до кодеков такой пакет не откроют
+_LEGACY_CODECS = ("none", "gzip")
 APP_NAME = "CryptoSafe Manager"
 
 
@@ -30,11 +33,11 @@ def _b64d(text: str) -> bytes:
 
 
 def build_encrypted_export(
-    entries: List[Dict[str, Any]],
+    entries: Iterable[Dict[str, Any]],
     export_password: str,
     *,
     include_notes: bool = True,
-    compress: bool = False,
+    compress: Union[bool, str] = False,
     data_key: Optional[bytes] = None,
     recipient_public_key_pem: Optional[str] = None,
 ) -> Dict[str, Any]:
@@ -57,30 +60,15 @@ def build_encrypted_export(
         "exported_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
     }
     raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    if compress:
-        raw = gzip.compress(raw)
+    # compress: True — gzip (как раньше), строка — кодек из compression ("zlib:9", "lzma", "auto")
+    codec = resolve_codec(compress, raw)
+    raw = codec.compress(raw)
 
     if data_key is None:
         data_key = secrets.token_bytes(32)
 
-    salt = secrets.token_bytes(16)
-    wrap_mode = "password"
-    if recipient_public_key_pem:
-        from ..key_exchange import wrap_key_for_public
-
-        wrapped = wrap_key_for_public(data_key, recipient_public_key_pem)
-        kdf_meta = {"mode": "rsa-oaep", "wrapped_key": wrapped}
-        wrap_mode = "rsa-oaep"
-    else:
-        wrap_key = derive_key_from_export_password(export_password, salt)
-        w_nonce, w_cipher = encrypt_blob(data_key, wrap_key)
-        kdf_meta = {
-            "mode": "password",
-            "salt": _b64(salt),
-            "iterations": PBKDF2_EXPORT_ITERATIONS,
-            "algorithm": "PBKDF2-HMAC-SHA256",
-            "wrapped_key": {"nonce": _b64(w_nonce), "ciphertext": _b64(w_cipher)},
-        }
+    kdf_meta = wrap_data_key(data_key, export_password, recipient_public_key_pem)
+    wrap_mode = kdf_meta["mode"]
 
     nonce, ciphertext = encrypt_blob(raw, data_key)
     sig = integrity_digest(raw, data_key)
@@ -89,9 +77,10 @@ def build_encrypted_export(
         "format": FORMAT_ID,
         "metadata": {
             "app": APP_NAME,
-            "version": 1,
+            "version": 1 if codec.name in _LEGACY_CODECS else 2,
             "entry_count": len(plain_entries),
-            "compressed": compress,
+            "compressed": codec.name == "gzip",
+            "compression": codec.spec,
             "wrap_mode": wrap_mode,
         },
         "kdf": kdf_meta,
@@ -104,7 +93,26 @@ def build_encrypted_export(
     }
 
 
-def _unwrap_data_key(package: Dict[str, Any], export_password: str, private_key_pem: Optional[str]) -> bytes:
+def wrap_data_key(data_key: bytes, export_password: str, recipient_public_key_pem: Optional[str] = None) -> Dict[str, Any]:
+    # блок "kdf" пакета: ключ данных под паролем экспорта (PBKDF2) или под RSA-ключом получателя
+    if recipient_public_key_pem:
+        from ..key_exchange import wrap_key_for_public
+
+        return {"mode": "rsa-oaep", "wrapped_key": wrap_key_for_public(data_key, recipient_public_key_pem)}
+    salt = secrets.token_bytes(16)
+    wrap_key = derive_key_from_export_password(export_password, salt)
+    w_nonce, w_cipher = encrypt_blob(data_key, wrap_key)
+    return {
+        "mode": "password",
+        "salt": _b64(salt),
+        "iterations": PBKDF2_EXPORT_ITERATIONS,
+        "algorithm": "PBKDF2-HMAC-SHA256",
+        "wrapped_key": {"nonce": _b64(w_nonce), "ciphertext": _b64(w_cipher)},
+    }
+
+
+def unwrap_data_key(package: Dict[str, Any], export_password: str, private_key_pem: Optional[str]) -> bytes:
+    # package — пакет v1 или заголовок v2 (оба несут блок "kdf")
     kdf = package.get("kdf") or {}
     wrapped = kdf.get("wrapped_key") or {}
     mode = kdf.get("mode", "password")
@@ -133,7 +141,7 @@ def parse_encrypted_export(
     if package.get("format") != FORMAT_ID:
         raise ValueError("Неверный формат файла экспорта")
 
-    key = _unwrap_data_key(package, export_password, private_key_pem)
+    key = unwrap_data_key(package, export_password, private_key_pem)
 
     nonce = _b64d(package.get("nonce", ""))
     ciphertext = _b64d(package.get("ciphertext", ""))
@@ -148,8 +156,9 @@ def parse_encrypted_export(
     if hmac_sig and not verify_integrity(raw, key, hmac_sig):
         raise ValueError("Нарушена целостность экспорта (hmac)")
 
-    if package.get("metadata", {}).get("compressed"):
-        raw = gzip.decompress(raw)
+    metadata = package.get("metadata") or {}
+    # пакеты до кодеков знают только compressed (gzip)
+    raw = get_codec(metadata.get("compression") or bool(metadata.get("compressed"))).decompress(raw)
 
     data = json.loads(raw.decode("utf-8"))
     return list(data.get("entries") or [])
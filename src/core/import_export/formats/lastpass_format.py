@@ -2,15 +2,15 @@
 
 import csv
 import io
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .csv_format import skip_leading_blank
 
 LASTPASS_FIELDS = ("url", "username", "password", "extra", "name", "grouping", "fav")
 
 
-def lastpass_to_entries(text: str) -> List[Dict[str, Any]]:
-    buf = io.StringIO(text.strip())
-    reader = csv.DictReader(buf)
-    out: List[Dict[str, Any]] = []
+def iter_lastpass_entries(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(skip_leading_blank(lines))
     for row in reader:
         title = (row.get("name") or row.get("Name") or "").strip()
         username = (row.get("username") or row.get("Username") or "").strip()
@@ -20,14 +20,15 @@ def lastpass_to_entries(text: str) -> List[Dict[str, Any]]:
         category = (row.get("grouping") or row.get("Grouping") or "").strip()
         if not any((title, username, password, url)):
             continue
-        out.append(
-            {
-                "title": title or url or username,
-                "username": username,
-                "password": password,
-                "url": url,
-                "notes": notes,
-                "category": category,
-            }
-        )
-    return out
+        yield {
+            "title": title or url or username,
+            "username": username,
+            "password": password,
+            "url": url,
+            "notes": notes,
+            "category": category,
+        }
+
+
+def lastpass_to_entries(text: str) -> List[Dict[str, Any]]:
+    return list(iter_lastpass_entries(io.StringIO(text.strip())))
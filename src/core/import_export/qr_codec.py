@@ -1,52 +1,255 @@
 # QR: checksum, chunking, без plaintext (спринт 6, QR)
+# транспорт CSM2: payload упаковывается в байты (без JSON и base64) и режется на кадры
+#   кадр = varint total | varint index | u32 CRC32 сообщения | данные | u32 CRC32 кадра
+# кадр кодируется base45 (RFC 9285) — алфавит совпадает с алфавитно-цифровым режимом QR (5.5 бит на символ);
+# размер кадра — по ёмкости выбранной версии QR и уровня коррекции ошибок
+# кадры собираются QrAssembler в любом порядке, повторы игнорируются; CSM1 (JSON-кадры) читается как раньше
 
 import base64
 import hashlib
 import hmac
 import json
 import zlib
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .compression import get_codec, is_auto, select_codec
 
 PAYLOAD_TYPES = ("public_key", "share_package", "share_link")
-MAX_CHUNK_LEN = 900
-QR_PREFIX = "CSM1:"
+QR_PREFIX = "CSM2:"
+LEGACY_QR_PREFIX = "CSM1:"
+# версия 20 / M — 970 символов на код: ещё уверенно считывается камерой телефона с экрана
+QR_VERSION = 20
+QR_ERROR_CORRECTION = "M"
+BASE45_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+# для QR важен только размер (меньше кодов): auto без порога скорости, из кодеков с максимальным сжатием
+QR_CODEC = "auto"
+QR_AUTO_CANDIDATES = ("zlib:9", "zstd:19", "lzma:9")
+
+_B45_INDEX = {c: i for i, c in enumerate(BASE45_ALPHABET)}
+_EC_LEVELS = "LMQH"
+# кодовые слова данных по версиям 1..40 для уровней L, M, Q, H (ISO/IEC 18004, табл. 7)
+_DATA_CODEWORDS = (
+    (19, 16, 13, 9), (34, 28, 22, 16), (55, 44, 34, 26), (80, 64, 48, 36), (108, 86, 62, 46),
+    (136, 108, 76, 60), (156, 124, 88, 66), (194, 154, 110, 86), (232, 182, 132, 100), (274, 216, 154, 122),
+    (324, 254, 180, 140), (370, 290, 206, 158), (428, 334, 244, 180), (461, 365, 261, 197), (523, 415, 295, 223),
+    (589, 453, 325, 253), (647, 507, 367, 283), (721, 563, 397, 313), (795, 627, 445, 341), (861, 669, 485, 385),
+    (932, 714, 512, 406), (1006, 782, 568, 442), (1094, 860, 614, 464), (1174, 914, 664, 514),
+    (1276, 1000, 718, 538), (1370, 1062, 754, 596), (1468, 1128, 808, 628), (1531, 1193, 871, 661),
+    (1631, 1267, 911, 701), (1735, 1373, 985, 745), (1843, 1455, 1033, 793), (1955, 1541, 1115, 845),
+    (2071, 1631, 1171, 901), (2191, 1725, 1231, 961), (2306, 1812, 1286, 986), (2434, 1914, 1354, 1054),
+    (2566, 1992, 1426, 1096), (2702, 2102, 1502, 1142), (2812, 2216, 1582, 1222), (2956, 2334, 1666, 1276),
+)
+# total, index (varint) + CRC32 сообщения + CRC32 кадра
+_FRAME_FIXED = 8
 
 
 def _checksum(payload_bytes: bytes, secret: bytes = b"cryptosafe-qr-v1") -> str:
     return hmac.new(secret, payload_bytes, hashlib.sha256).hexdigest()[:16]
 
 
-def build_payload(payload_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+def build_payload(payload_type: str, data: Dict[str, Any], *, codec: str = QR_CODEC) -> Dict[str, Any]:
     if payload_type not in PAYLOAD_TYPES:
         raise ValueError(f"payload_type: {PAYLOAD_TYPES}")
     inner = json.dumps({"type": payload_type, "data": data}, ensure_ascii=False, sort_keys=True).encode("utf-8")
-    compressed = base64.b64encode(zlib.compress(inner)).decode("ascii")
-    body = {"v": 1, "blob": compressed}
+    chosen = select_codec(inner, QR_AUTO_CANDIDATES, min_mbps=0) if is_auto(codec) else get_codec(codec)
+    compressed = base64.b64encode(chosen.compress(inner)).decode("ascii")
+    body = {"v": 1, "codec": chosen.spec, "blob": compressed}
     raw = json.dumps(body, sort_keys=True).encode("utf-8")
     body["checksum"] = _checksum(raw)
     return body
 
 
-def encode_chunks(payload: Dict[str, Any]) -> List[str]:
-    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
-    if len(raw) <= MAX_CHUNK_LEN:
-        return [QR_PREFIX + raw]
-    chunks: List[str] = []
-    total = (len(raw) + MAX_CHUNK_LEN - 1) // MAX_CHUNK_LEN
-    for i in range(total):
-        part = raw[i * MAX_CHUNK_LEN : (i + 1) * MAX_CHUNK_LEN]
-        chunk_obj = {"v": 1, "chunk": i, "total": total, "data": part}
-        chunks.append(QR_PREFIX + json.dumps(chunk_obj, ensure_ascii=False))
+def alphanumeric_capacity(version: int = QR_VERSION, error_correction: str = QR_ERROR_CORRECTION) -> int:
+    # символов в алфавитно-цифровом режиме: биты данных минус индикатор режима (4) и счётчик символов
+    level = _EC_LEVELS.find(str(error_correction).upper())
+    if not 1 <= int(version) <= 40 or level < 0 or len(str(error_correction)) != 1:
+        raise ValueError("Версия QR 1..40, уровень коррекции L/M/Q/H")
+    version = int(version)
+    count_bits = 9 if version <= 9 else 11 if version <= 26 else 13
+    bits = _DATA_CODEWORDS[version - 1][level] * 8 - 4 - count_bits
+    return bits // 11 * 2 + (1 if bits % 11 >= 6 else 0)
+
+
+def base45_encode(data: bytes) -> str:
+    out = []
+    for i in range(0, len(data) - 1, 2):
+        n = data[i] * 256 + data[i + 1]
+        n, c = divmod(n, 45)
+        e, d = divmod(n, 45)
+        out.append(BASE45_ALPHABET[c] + BASE45_ALPHABET[d] + BASE45_ALPHABET[e])
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        out.append(BASE45_ALPHABET[c] + BASE45_ALPHABET[d])
+    return "".join(out)
+
+
+def base45_decode(text: str) -> bytes:
+    try:
+        values = [_B45_INDEX[c] for c in text]
+    except KeyError:
+        raise ValueError("Неверный символ base45") from None
+    if len(values) % 3 == 1:
+        raise ValueError("Неверная длина base45")
+    out = bytearray()
+    for i in range(0, len(values), 3):
+        group = values[i:i + 3]
+        n = sum(v * 45 ** k for k, v in enumerate(group))
+        if len(group) == 3:
+            if n > 0xFFFF:
+                raise ValueError("Неверный блок base45")
+            out += n.to_bytes(2, "big")
+        else:
+            if n > 0xFF:
+                raise ValueError("Неверный блок base45")
+            out.append(n)
+    return bytes(out)
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        if pos >= len(data) or shift > 28:
+            raise ValueError("Повреждён кадр QR")
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return n, pos
+        shift += 7
+
+
+def _pack_message(payload: Dict[str, Any]) -> bytes:
+    # payload build_payload -> varint v | codec | checksum | сжатые данные (codec пустой — payload до кодеков)
+    codec = str(payload.get("codec") or "").encode("ascii")
+    checksum = bytes.fromhex(payload.get("checksum") or "")
+    blob = base64.b64decode(str(payload.get("blob", "")).encode("ascii"))
+    return (_varint(int(payload.get("v", 1))) + _varint(len(codec)) + codec
+            + _varint(len(checksum)) + checksum + blob)
+
+
+def _unpack_message(message: bytes) -> Dict[str, Any]:
+    version, pos = _read_varint(message, 0)
+    size, pos = _read_varint(message, pos)
+    codec = message[pos:pos + size].decode("ascii", errors="replace")
+    pos += size
+    size, pos = _read_varint(message, pos)
+    checksum = message[pos:pos + size]
+    pos += size
+    payload: Dict[str, Any] = {"v": version, "blob": base64.b64encode(message[pos:]).decode("ascii")}
+    if codec:
+        payload["codec"] = codec
+    if checksum:
+        payload["checksum"] = checksum.hex()
+    return payload
+
+
+def encode_chunks(
+    payload: Dict[str, Any],
+    *,
+    version: int = QR_VERSION,
+    error_correction: str = QR_ERROR_CORRECTION,
+) -> List[str]:
+    # строки для QR-кодов версии version / уровня error_correction (render_qr_png с теми же параметрами)
+    message = _pack_message(payload)
+    msg_crc = zlib.crc32(message).to_bytes(4, "big")
+    chars = alphanumeric_capacity(version, error_correction) - len(QR_PREFIX)
+    frame_bytes = chars // 3 * 2 + (1 if chars % 3 == 2 else 0)
+    # число кадров зависит от длины varint total — подбираем, пока не сойдётся
+    total = 1
+    while True:
+        size = frame_bytes - _FRAME_FIXED - 2 * len(_varint(total))
+        if size < 1:
+            raise ValueError("QR версии %s/%s слишком мал для кадра" % (version, error_correction))
+        need = max(1, -(-len(message) // size))
+        if need <= total:
+            total = need
+            break
+        total = need
+    chunks = []
+    for index in range(total):
+        body = _varint(total) + _varint(index) + msg_crc + message[index * size:(index + 1) * size]
+        chunks.append(QR_PREFIX + base45_encode(body + zlib.crc32(body).to_bytes(4, "big")))
     return chunks
 
 
-def decode_chunks(lines: List[str]) -> Dict[str, Any]:
-    cleaned = []
-    for line in lines:
+class QrAssembler:
+    # сборка сообщения по мере сканирования: кадры в любом порядке, повторно считанные игнорируются
+    def __init__(self):
+        self._parts: Dict[int, bytes] = {}
+        self._total: Optional[int] = None
+        self._msg_crc: Optional[bytes] = None
+
+    @property
+    def total(self) -> Optional[int]:
+        return self._total
+
+    @property
+    def received(self) -> int:
+        return len(self._parts)
+
+    @property
+    def complete(self) -> bool:
+        return self._total is not None and len(self._parts) == self._total
+
+    def missing(self) -> List[int]:
+        if self._total is None:
+            return []
+        return [i for i in range(self._total) if i not in self._parts]
+
+    def add(self, line: str) -> bool:
+        # ValueError — не наш префикс, битый кадр (CRC) или кадр другого сообщения; возвращает complete
         line = line.strip()
         if not line.startswith(QR_PREFIX):
             raise ValueError("Неверный префикс QR")
-        cleaned.append(line[len(QR_PREFIX) :])
+        frame = base45_decode(line[len(QR_PREFIX):])
+        if len(frame) < _FRAME_FIXED + 2 or zlib.crc32(frame[:-4]).to_bytes(4, "big") != frame[-4:]:
+            raise ValueError("Неверная контрольная сумма кадра QR")
+        total, pos = _read_varint(frame, 0)
+        index, pos = _read_varint(frame, pos)
+        msg_crc = frame[pos:pos + 4]
+        if not 0 <= index < total:
+            raise ValueError("Повреждён кадр QR")
+        if self._total is None:
+            self._total, self._msg_crc = total, msg_crc
+        elif (total, msg_crc) != (self._total, self._msg_crc):
+            raise ValueError("Кадр QR из другого набора")
+        self._parts.setdefault(index, frame[pos + 4:-4])
+        return self.complete
+
+    def result(self) -> Dict[str, Any]:
+        if not self.complete:
+            raise ValueError("Неполный набор chunk QR")
+        message = b"".join(self._parts[i] for i in range(self._total))
+        if zlib.crc32(message).to_bytes(4, "big") != self._msg_crc:
+            raise ValueError("Неверная контрольная сумма QR")
+        return _validate_payload(_unpack_message(message))
+
+
+def decode_chunks(lines: Iterable[str]) -> Dict[str, Any]:
+    lines = [line.strip() for line in lines]
+    if lines and all(line.startswith(LEGACY_QR_PREFIX) for line in lines):
+        return _decode_legacy_chunks(lines)
+    assembler = QrAssembler()
+    for line in lines:
+        assembler.add(line)
+    return assembler.result()
+
+
+def _decode_legacy_chunks(lines: List[str]) -> Dict[str, Any]:
+    # CSM1: JSON payload, при нарезке — JSON-кадры {"chunk", "total", "data"}
+    cleaned = [line[len(LEGACY_QR_PREFIX):] for line in lines]
     if len(cleaned) == 1:
         obj = json.loads(cleaned[0])
         if "chunk" in obj:
@@ -69,14 +272,16 @@ def _validate_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not checksum or not hmac.compare_digest(_checksum(raw), checksum):
         raise ValueError("Неверная контрольная сумма QR")
     blob = payload.get("blob", "")
-    inner = zlib.decompress(base64.b64decode(blob.encode("ascii")))
+    # payload без codec — до кодеков, всегда zlib
+    inner = get_codec(payload.get("codec", "zlib")).decompress(base64.b64decode(blob.encode("ascii")))
     decoded = json.loads(inner.decode("utf-8"))
     if decoded.get("type") not in PAYLOAD_TYPES:
         raise ValueError("Неподдерживаемый тип QR")
     return decoded
 
 
-def render_qr_png(text: str, *, error_correction: str = "M") -> bytes:
+def render_qr_png(text: str, *, error_correction: str = QR_ERROR_CORRECTION, version: Optional[int] = None) -> bytes:
+    # version — та же, что при encode_chunks: кадр заполняет код этой версии; None — минимальная подходящая
     try:
         import qrcode
     except ImportError as exc:
@@ -87,9 +292,9 @@ def render_qr_png(text: str, *, error_correction: str = "M") -> bytes:
         "Q": qrcode.constants.ERROR_CORRECT_Q,
         "H": qrcode.constants.ERROR_CORRECT_H,
     }.get(error_correction.upper(), qrcode.constants.ERROR_CORRECT_M)
-    qr = qrcode.QRCode(error_correction=level)
+    qr = qrcode.QRCode(version=version, error_correction=level)
     qr.add_data(text)
-    qr.make(fit=True)
+    qr.make(fit=version is None)
     img = qr.make_image()
     import io
 
@@ -1,7 +1,14 @@
 # работа с ключом шифрования: вывод через PBKDF2, кэш в памяти (KeyManager + key_storage) (спринт 2)
+# ключ из пароля (KEK) шифрует только ключ данных (DEK) в key_store("wrapped_dek");
+# в кэше сессии лежит DEK — им шифруются записи, экспорт и подпись аудита
+
+import logging
 
 from core.crypto.key_derivation import derive_key_pbkdf2
-from core.crypto import key_storage
+from core.crypto import key_storage, key_wrap
+
+
+_log = logging.getLogger(__name__)
 
 
 def derive_key(password: str, salt: bytes, iterations: int = None) -> bytes:
@@ -24,6 +31,49 @@ def clear_encryption_key():
     key_storage.clear_cached_key()
 
 
+def needs_vault_key_migration() -> bool:
+    # хранилище до появления DEK: записи зашифрованы прямо ключом из пароля
+    from database import db
+
+    return not db.get_key_store(key_wrap.WRAPPED_DEK_KEY_TYPE)
+
+
+def unwrap_vault_key(kek: bytes, on_progress=None) -> bytes:
+    # вход: DEK из key_store по ключу из пароля
+    # хранилище до появления DEK переводится один раз (migrate_vault_key); on_progress(done, total) — от неё
+    from database import db
+
+    blob = db.get_key_store(key_wrap.WRAPPED_DEK_KEY_TYPE)
+    if blob:
+        return key_wrap.unwrap_dek(kek, blob)
+    return migrate_vault_key(kek, on_progress)
+
+
+def migrate_vault_key(kek: bytes, on_progress=None) -> bytes:
+    # новый случайный DEK, записи перешифровываются один раз (core.vault.rekey: теневая таблица);
+    # обёрнутый DEK и якорь журнала аудита пишутся в транзакции подмены таблицы — всё или ничего
+    # оставить ключ из пароля ключом данных нельзя: старый пароль и старая копия vault.db
+    # открывали бы записи и после смены скомпрометированного пароля
+    from core.audit import integrity
+    from core.vault.rekey import VaultRekeyer
+    from database import db
+
+    dek = key_wrap.generate_dek()
+    items = [wrapped_vault_key_item(kek, dek)] + integrity.prepare_key_rotation(kek, dek)
+    result = VaultRekeyer(db, kek, dek, items).run(on_progress)
+    if not result["ok"]:
+        # старое состояние не тронуто: вход по ключу из пароля, перевод повторится при следующем входе
+        _log.warning("Перевод хранилища на ключ данных не выполнен: %r", result["error"] or "отменён")
+        return bytes(kek)
+    integrity.finish_key_rotation(dek)
+    return dek
+
+
+def wrapped_vault_key_item(new_kek: bytes, dek: bytes):
+    # запись key_store для set_key_store_many: DEK, обёрнутый новым KEK (смена пароля, первый запуск)
+    return (key_wrap.WRAPPED_DEK_KEY_TYPE, key_wrap.wrap_dek(new_kek, dek), key_wrap.WRAPPED_DEK_VERSION)
+
+
 def store_key():
     # запись в key_store делается в setup_wizard и change_password через database.set_key_store; здесь заглушка API
     pass
@@ -53,6 +103,12 @@ class KeyManager:
     def get_encryption_key(self):
         return get_encryption_key()
 
+    def unwrap_vault_key(self, kek: bytes, on_progress=None) -> bytes:
+        return unwrap_vault_key(kek, on_progress)
+
+    def needs_vault_key_migration(self) -> bool:
+        return needs_vault_key_migration()
+
     def set_encryption_key(self, key: bytes):
         set_encryption_key(key)
 
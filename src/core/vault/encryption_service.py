@@ -1,9 +1,14 @@
 import json
 import os
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.crypto import key_storage
 
 
 # ВАЖНО (спринт3):
@@ -17,55 +22,164 @@ class EncryptedEntry:
     encrypted_blob: bytes
 
 
-class EncryptionServiceAESGCM:
-    VERSION = 1
-    NONCE_LEN = 12
+@dataclass(frozen=True)
+class DecryptResult:
+    # результат одного элемента пакетной расшифровки: payload или ошибка (повреждённая запись)
+    payload: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
 
-    def __init__(self, key_manager):
-        # key_manager — это KeyManager из спринт 2 (кэш ключа в памяти после логина)
-        self._key_manager = key_manager
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
-    def _get_aesgcm(self):
-        # ленивый импорт: чтобы модуль можно было импортировать даже без установленного пакета cryptography
+
+_AESGCM = None
+
+
+def _load_aesgcm_class():
+    # ленивый импорт: чтобы модуль можно было импортировать даже без установленного пакета cryptography
+    global _AESGCM
+    if _AESGCM is None:
         try:
             from cryptography.hazmat.primitives.ciphers.aead import AESGCM
         except Exception as e:
             raise RuntimeError(
                 "Зависимость 'cryptography' не установлена, AES-256-GCM недоступен (спринт3)."
             ) from e
+        _AESGCM = AESGCM
+    return _AESGCM
+
+
+_KEY_RECHECK_INTERVAL = 1.0
+_ZERO_COPY_MIN_LEN = 4096
+# все сервисы процесса: при очистке ключа (logout, авто-блокировка) их контексты сбрасываются сразу
+_services = weakref.WeakSet()
+
+
+def _drop_contexts():
+    for service in list(_services):
+        service._ctx = None
+
+
+key_storage.add_clear_listener(_drop_contexts)
+
+
+# общий пул расшифровки: AESGCM из cryptography отпускает GIL, поэтому пакет масштабируется по ядрам
+# пакет меньше _PARALLEL_MIN_BATCH расшифровывается в вызывающем потоке — передача в пул дороже работы
+_PARALLEL_MIN_BATCH = 256
+_decrypt_pool: Optional[ThreadPoolExecutor] = None
+_decrypt_pool_lock = threading.Lock()
+
+
+def _decrypt_workers() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def _get_decrypt_pool() -> ThreadPoolExecutor:
+    global _decrypt_pool
+    with _decrypt_pool_lock:
+        if _decrypt_pool is None:
+            _decrypt_pool = ThreadPoolExecutor(max_workers=_decrypt_workers(), thread_name_prefix="vault-decrypt")
+        return _decrypt_pool
 
+
+class EncryptionServiceAESGCM:
+    VERSION = 1
+    NONCE_LEN = 12
+    TAG_LEN = 16
+
+    def __init__(self, key_manager):
+        # key_manager — это KeyManager из спринт 2 (кэш ключа в памяти после логина)
+        self._key_manager = key_manager
+        # контекст сессии (ключ, AESGCM, поколение ключа, время проверки): AESGCM пересоздаётся
+        # только при смене ключа
+        self._ctx: Optional[Tuple[bytes, Any, int, float]] = None
+        _services.add(self)
+
+    def _get_aesgcm(self):
+        # контекст годен, пока ключ в key_storage не менялся; сам ключ (и проверка неактивности
+        # в get_cached_key) перечитывается не чаще раза в _KEY_RECHECK_INTERVAL
+        ctx = self._ctx
+        now = time.monotonic()
+        if ctx is not None and ctx[2] == key_storage.get_key_generation() and now - ctx[3] < _KEY_RECHECK_INTERVAL:
+            return ctx[1]
+        generation = key_storage.get_key_generation()
         key = self._key_manager.get_encryption_key()
         if not key:
+            self._ctx = None
             # общий текст ошибки: чтобы не раскрывать состояние конкретных id
             raise ValueError("Хранилище заблокировано или ключ недоступен (PBKDF2)")
-        return AESGCM(key)
-
-    def encrypt_entry_payload(self, payload: Dict[str, Any]) -> EncryptedEntry:
+        if ctx is not None and (ctx[0] is key or ctx[0] == key):
+            aesgcm = ctx[1]
+        else:
+            aesgcm = _load_aesgcm_class()(key)
+        self._ctx = (key, aesgcm, generation, now)
+        return aesgcm
+
+    def _encrypt_with(self, aesgcm, payload: Dict[str, Any]) -> bytes:
         # payload шифруется как JSON, чтобы внутри можно было версионировать поля
-        aesgcm = self._get_aesgcm()
-
         nonce = os.urandom(self.NONCE_LEN)
         plaintext = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        # nonce (12B) || ciphertext || tag(16B); ciphertext_with_tag = ciphertext || tag(16B)
+        return nonce + aesgcm.encrypt(nonce, plaintext, None)
 
-        # ciphertext_with_tag = ciphertext || tag(16B)
-        ciphertext_with_tag = aesgcm.encrypt(nonce, plaintext, None)
+    def _decrypt_with(self, aesgcm, encrypted_blob) -> Dict[str, Any]:
+        if not encrypted_blob or len(encrypted_blob) < (self.NONCE_LEN + self.TAG_LEN):
+            raise ValueError("Повреждённый зашифрованный формат")
+        # большой BLOB режется через memoryview без копии; для типичной записи (сотни байт)
+        # обычный срез bytes дешевле, чем создание memoryview
+        blob = memoryview(encrypted_blob) if len(encrypted_blob) >= _ZERO_COPY_MIN_LEN else encrypted_blob
+        # AESGCM.decrypt проверяет authentication tag и выбрасывает исключение при подмене
+        plaintext = aesgcm.decrypt(blob[: self.NONCE_LEN], blob[self.NONCE_LEN :], None)
+        return json.loads(plaintext.decode("utf-8"))
 
-        # nonce (12B) || ciphertext || tag(16B)
-        encrypted_blob = nonce + ciphertext_with_tag
-        return EncryptedEntry(encrypted_blob=encrypted_blob)
+    def encrypt_entry_payload(self, payload: Dict[str, Any]) -> EncryptedEntry:
+        return EncryptedEntry(encrypted_blob=self._encrypt_with(self._get_aesgcm(), payload))
 
     def decrypt_entry_payload(self, encrypted_blob: bytes) -> Dict[str, Any]:
-        if not encrypted_blob or len(encrypted_blob) < (self.NONCE_LEN + 16):
+        if not encrypted_blob or len(encrypted_blob) < (self.NONCE_LEN + self.TAG_LEN):
             raise ValueError("Повреждённый зашифрованный формат")
+        return self._decrypt_with(self._get_aesgcm(), encrypted_blob)
 
+    def encrypt_many(self, payloads: Iterable[Dict[str, Any]]) -> List[EncryptedEntry]:
+        # пакет (импорт, пакетное обновление): ключ и контекст берутся один раз на весь набор
         aesgcm = self._get_aesgcm()
+        return [EncryptedEntry(encrypted_blob=self._encrypt_with(aesgcm, p)) for p in payloads]
 
-        nonce = encrypted_blob[: self.NONCE_LEN]
-        ciphertext_with_tag = encrypted_blob[self.NONCE_LEN :]
-
-        # AESGCM.decrypt проверяет authentication tag и выбрасывает исключение при подмене
-        plaintext = aesgcm.decrypt(nonce, ciphertext_with_tag, None)
-        return json.loads(plaintext.decode("utf-8"))
+    def decrypt_many(self, encrypted_blobs: Iterable[bytes]) -> List[Dict[str, Any]]:
+        # пакет (загрузка списка, экспорт); первая повреждённая запись прерывает пакет исключением
+        aesgcm = self._get_aesgcm()
+        return [self._decrypt_with(aesgcm, b) for b in encrypted_blobs]
+
+    def _decrypt_chunk(self, aesgcm, blobs: List[bytes]) -> List[DecryptResult]:
+        out: List[DecryptResult] = []
+        for blob in blobs:
+            try:
+                out.append(DecryptResult(payload=self._decrypt_with(aesgcm, blob)))
+            except Exception as exc:
+                out.append(DecryptResult(error=exc))
+        return out
+
+    def decrypt_many_parallel(self, encrypted_blobs: Iterable[bytes], workers: Optional[int] = None) -> List[DecryptResult]:
+        # пакет на всех ядрах: результаты в порядке входа, ошибка каждой записи — в её DecryptResult,
+        # повреждённая запись не прерывает пакет (заблокированное хранилище — по-прежнему исключение)
+        blobs = list(encrypted_blobs)
+        aesgcm = self._get_aesgcm()
+        workers = workers or _decrypt_workers()
+        if workers <= 1 or len(blobs) < _PARALLEL_MIN_BATCH:
+            return self._decrypt_chunk(aesgcm, blobs)
+        # по несколько кусков на поток: неравные по длине записи не оставляют ядра без работы
+        step = max(1, -(-len(blobs) // (workers * 4)))
+        chunks = [blobs[i:i + step] for i in range(0, len(blobs), step)]
+        # свой AESGCM на кусок (как в rekey): контекст сессии не делится между потоками пула
+        ctx = self._ctx
+        if ctx is None:
+            raise ValueError("Хранилище заблокировано или ключ недоступен (PBKDF2)")
+        key, aesgcm_class = ctx[0], _load_aesgcm_class()
+        out: List[DecryptResult] = []
+        for part in _get_decrypt_pool().map(lambda c: self._decrypt_chunk(aesgcm_class(key), c), chunks):
+            out.extend(part)
+        return out
 
     @staticmethod
     def build_payload_for_encrypt(data_dict: Dict[str, Any], created_at: str) -> Dict[str, Any]:
@@ -1,4 +1,5 @@
-from typing import Any, Dict, List
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from urllib.parse import urlparse
 
@@ -7,6 +8,11 @@ from core.vault.encryption_service import EncryptionServiceAESGCM
 # db — это module-уровень API из src/database/db.py
 from database import db as database_db
 
+# колонка заметок в таблице показывает превью; поиск и фильтр notes: идут по полному тексту
+LIST_NOTES_PREVIEW_LEN = 120
+# версия meta_data: в версии 1 заметки хранились обрезанными до превью — такие записи пересобираются
+LIST_META_VERSION = 2
+
 
 def _mask_username(username: str) -> str:
     username = (username or "").strip()
@@ -38,6 +44,18 @@ def _format_date_from_ts(ts_value) -> str:
         return str(ts_value or "")
 
 
+def _build_list_meta(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # компактная запись для списка (meta_data): без пароля; заметки целиком — по ним ищет индекс
+    return {
+        "title": payload.get("title", ""),
+        "username_masked": _mask_username(payload.get("username", "")),
+        "url_domain": _extract_domain(payload.get("url", "")),
+        "notes": payload.get("notes", "") or "",
+        "category": payload.get("category", ""),
+        "version": LIST_META_VERSION,
+    }
+
+
 class EntryManager:
     # Контроллер CRUD (спринт3).
     # Он шифрует/дешифрует через EncryptionServiceAESGCM,
@@ -54,9 +72,10 @@ class EntryManager:
         payload = self._crypto.build_payload_for_encrypt(data_dict, created_at=created_at)
 
         encrypted = self._crypto.encrypt_entry_payload(payload).encrypted_blob
+        meta = self._crypto.encrypt_entry_payload(_build_list_meta(payload)).encrypted_blob
 
         tags = data_dict.get("tags") or data_dict.get("category") or ""
-        entry_id = self._db.insert_vault_entry(encrypted_data=encrypted, tags=tags)
+        entry_id = self._db.insert_vault_entry(encrypted_data=encrypted, tags=tags, meta_data=meta)
 
         # событие публикуем здесь (CRUD-3)
         self._events.publish(self._events.EntryCreated, sync=True, entry_id=entry_id)
@@ -64,6 +83,40 @@ class EntryManager:
         self._events.publish(self._events.EntryAdded, sync=True, entry_id=entry_id)
         return self.get_entry(entry_id)
 
+    def get_list_entries(self, entry_ids: List[int]) -> List[Dict[str, Any]]:
+        # строки списка для набора id одним запросом (пакетные события)
+        rows = self._db.get_vault_entries_meta_by_ids(entry_ids)
+        backfill: List = []
+        out = [self._list_row(r, backfill) for r in rows]
+        self._db.set_vault_entries_meta(backfill)
+        return out
+
+    def create_entries(self, data_dicts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # пакетное создание (импорт): сначала шифруем всё, затем одна транзакция INSERT
+        created_at = self._crypto.now_timestamp()
+        rows = []
+        for data_dict in data_dicts:
+            payload = self._crypto.build_payload_for_encrypt(data_dict, created_at=created_at)
+            tags = data_dict.get("tags") or data_dict.get("category") or ""
+            rows.append((payload, tags))
+        if not rows:
+            return []
+        encrypted = self._crypto.encrypt_many(p for p, _ in rows)
+        metas = self._crypto.encrypt_many(_build_list_meta(p) for p, _ in rows)
+        prepared = [(e.encrypted_blob, tags, m.encrypted_blob) for e, m, (_, tags) in zip(encrypted, metas, rows)]
+
+        entry_ids = self._db.insert_vault_entries_bulk(prepared)
+        # одно событие на пакет вместо N (аудит и кэш списка обрабатывают entry_ids целиком)
+        self._events.publish(self._events.EntriesCreated, sync=True, entry_ids=list(entry_ids))
+
+        # без повторной расшифровки: возвращаем то, что только что зашифровали
+        out: List[Dict[str, Any]] = []
+        for entry_id, (payload, tags) in zip(entry_ids, rows):
+            item = {k: payload.get(k, "") for k in ("title", "username", "password", "url", "notes", "category")}
+            item.update({"id": entry_id, "created_at": created_at, "tags": tags})
+            out.append(item)
+        return out
+
     def get_entry(self, entry_id: int) -> Dict[str, Any]:
         row = self._db.get_vault_entry(entry_id)
         if not row:
@@ -88,26 +141,109 @@ class EntryManager:
             "tags": tags or "",
         }
 
-    def get_all_entries(self) -> List[Dict[str, Any]]:
-        rows = self._db.get_all_vault_entries()
-        out: List[Dict[str, Any]] = []
-        for r in rows:
-            entry_id, encrypted_data, created_at, updated_at, tags = r
+    def _list_row(self, r, backfill: List, decrypted_meta=None) -> Dict[str, Any]:
+        # r: (id, meta_data, encrypted_data|None, created_at, updated_at, tags) из get_all_vault_entries_meta
+        # decrypted_meta — готовый DecryptResult для meta_data (пакетная расшифровка страницы)
+        entry_id, meta_blob, encrypted_data, created_at, updated_at, tags = r
+        meta = None
+        if decrypted_meta is not None:
+            meta = decrypted_meta.payload
+        elif meta_blob:
+            try:
+                meta = self._crypto.decrypt_entry_payload(meta_blob)
+            except Exception:
+                # meta_data устарела (например, перешифрована не тем ключом) — пересоберём ниже
+                meta = None
+        if meta is not None and meta.get("version", 1) < LIST_META_VERSION:
+            meta = None
+        if meta is None:
+            # миграция (версия 5): запись без meta_data или с устаревшей — один раз читаем полный payload
+            if encrypted_data is None:
+                row = self._db.get_vault_entry(entry_id)
+                encrypted_data = row[1] if row else None
             payload = self._crypto.decrypt_entry_payload(encrypted_data)
+            meta = _build_list_meta(payload)
+            backfill.append((entry_id, self._crypto.encrypt_entry_payload(meta).encrypted_blob))
 
-            # SEC-1: для списка паролей не возвращаем, чтобы UI не держал секрет постоянно
-            out.append(
-                {
-                    "id": entry_id,
+        return {
+            "id": entry_id,
+            "title": meta.get("title", ""),
+            "username_masked": meta.get("username_masked", ""),
+            "url_domain": meta.get("url_domain", ""),
+            "notes": meta.get("notes", ""),
+            "notes_preview": (meta.get("notes", "") or "")[:LIST_NOTES_PREVIEW_LEN],
+            "updated_at": _format_date_from_ts(updated_at),
+            "tags": tags or meta.get("category", ""),
+        }
+
+    def get_all_entries(self, batch_size: int = 500, errors: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        # SEC-1: для списка расшифровываем только meta_data — пароль и полные заметки не трогаем
+        # строки читаются страницами (keyset по id), BLOB полной записи не держится дольше страницы
+        # meta_data страницы расшифровываются параллельно (decrypt_many_parallel); запись, которую
+        # не удалось восстановить и из полного payload, пропускается и попадает в errors: {"id", "error"}
+        out: List[Dict[str, Any]] = []
+        backfill: List = []
+        rows_iter = iter(self._db.iter_vault_entries_meta(batch_size))
+        while True:
+            page = list(islice(rows_iter, batch_size))
+            if not page:
+                break
+            metas = self._crypto.decrypt_many_parallel(r[1] for r in page)
+            for r, meta in zip(page, metas):
+                try:
+                    # meta_data нет или она устарела (meta.payload is None) — _list_row пересоберёт её из payload
+                    out.append(self._list_row(r, backfill, meta))
+                except Exception as exc:
+                    if errors is None:
+                        raise
+                    errors.append({"id": r[0], "error": str(exc) or type(exc).__name__})
+            if len(backfill) >= batch_size:
+                self._db.set_vault_entries_meta(backfill)
+                backfill = []
+        # заполненные meta_data пишем пачками — следующая загрузка уже без полного decrypt
+        self._db.set_vault_entries_meta(backfill)
+        return out
+
+    def iter_entries(self, batch_size: int = 500, errors: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        # полные записи (с паролем) по одной — для экспорта; список целиком в памяти не строится
+        # расшифровка — страницей на всех ядрах (decrypt_many_parallel), порядок записей сохраняется
+        # errors — список для повреждённых записей {"id", "error"}: они пропускаются, экспорт не прерывается;
+        # без errors первая повреждённая запись прерывает итерацию, как раньше
+        rows_iter = iter(self._db.iter_vault_entries(batch_size))
+        while True:
+            page = list(islice(rows_iter, batch_size))
+            if not page:
+                return
+            results = self._crypto.decrypt_many_parallel(r[1] for r in page)
+            for (_id, _enc, created_at, updated_at, tags), result in zip(page, results):
+                if not result.ok:
+                    if errors is None:
+                        raise result.error
+                    errors.append({"id": _id, "error": str(result.error) or type(result.error).__name__})
+                    continue
+                payload = result.payload
+                yield {
+                    "id": _id,
                     "title": payload.get("title", ""),
-                    "username_masked": _mask_username(payload.get("username", "")),
-                    "url_domain": _extract_domain(payload.get("url", "")),
+                    "username": payload.get("username", ""),
+                    "password": payload.get("password", ""),
                     "url": payload.get("url", ""),
                     "notes": payload.get("notes", ""),
+                    "category": payload.get("category", ""),
+                    "version": payload.get("version", 1),
+                    "created_at": created_at or payload.get("created_at"),
                     "updated_at": _format_date_from_ts(updated_at),
-                    "tags": tags or payload.get("category", ""),
+                    "tags": tags or "",
                 }
-            )
+
+    def get_list_entry(self, entry_id: int) -> Dict[str, Any]:
+        # одна строка списка (для точечного обновления кэша после CRUD-события)
+        row = self._db.get_vault_entry_meta(entry_id)
+        if not row:
+            raise ValueError("Entry not found")
+        backfill: List = []
+        out = self._list_row(row, backfill)
+        self._db.set_vault_entries_meta(backfill)
         return out
 
     def update_entry(self, entry_id: int, data_dict: Dict[str, Any]) -> Dict[str, Any]:
@@ -121,13 +257,46 @@ class EntryManager:
         created_at_use = created_at or self._crypto.now_timestamp()
         payload = self._crypto.build_payload_for_encrypt(data_dict, created_at=created_at_use)
         encrypted_new = self._crypto.encrypt_entry_payload(payload).encrypted_blob
+        meta_new = self._crypto.encrypt_entry_payload(_build_list_meta(payload)).encrypted_blob
 
         tags = data_dict.get("tags") or data_dict.get("category") or tags_old or ""
-        self._db.update_vault_entry(entry_id, encrypted_data=encrypted_new, tags=tags)
+        self._db.update_vault_entry(entry_id, encrypted_data=encrypted_new, tags=tags, meta_data=meta_new)
 
         self._events.publish(self._events.EntryUpdated, sync=True, entry_id=entry_id)
         return self.get_entry(entry_id)
 
+    def update_entries(self, updates: List[Tuple[int, Dict[str, Any]]]) -> List[int]:
+        # пакетное обновление: [(entry_id, data_dict), ...]; одна транзакция UPDATE
+        existing = {int(r[0]): r for r in self._db.get_vault_entries_by_ids([eid for eid, _ in updates])}
+        rows = []
+        for entry_id, data_dict in updates:
+            row = existing.get(int(entry_id))
+            if not row:
+                raise ValueError("Entry not found")
+            _, _, created_at, _, tags_old = row
+            created_at_use = created_at or self._crypto.now_timestamp()
+            payload = self._crypto.build_payload_for_encrypt(data_dict, created_at=created_at_use)
+            tags = data_dict.get("tags") or data_dict.get("category") or tags_old or ""
+            rows.append((int(entry_id), payload, tags))
+        if not rows:
+            return []
+        encrypted = self._crypto.encrypt_many(p for _, p, _ in rows)
+        metas = self._crypto.encrypt_many(_build_list_meta(p) for _, p, _ in rows)
+        prepared = [(eid, e.encrypted_blob, tags, m.encrypted_blob) for e, m, (eid, _, tags) in zip(encrypted, metas, rows)]
+
+        self._db.update_vault_entries_bulk(prepared)
+        entry_ids = [p[0] for p in prepared]
+        self._events.publish(self._events.EntriesUpdated, sync=True, entry_ids=entry_ids)
+        return entry_ids
+
+    def delete_entries(self, entry_ids: List[int]) -> int:
+        entry_ids = [int(i) for i in entry_ids]
+        if not entry_ids:
+            return 0
+        count = self._db.delete_vault_entries_bulk(entry_ids)
+        self._events.publish(self._events.EntriesDeleted, sync=True, entry_ids=entry_ids)
+        return count
+
     def delete_entry(self, entry_id: int, soft_delete: bool = True):
         # soft_delete по ТЗ указан как Should — здесь реализуем только hard delete,
         # но парамет оставляем, чтобы API соответствовал требованиям.
@@ -0,0 +1,150 @@
+# кэш расшифрованных метаданных списка на время сессии (таблица главного окна)
+# - первая загрузка: EntryManager.get_all_entries (O(N) decrypt meta_data)
+# - дальше CRUD-события патчат только затронутую строку (O(1) на изменение)
+# - при clear_cached_key / UserLoggedOut кэш очищается, расшифрованные строки не живут дольше ключа
+# - поисковый индекс (search_index) строится из тех же строк и патчится вместе с ними
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from core import events as default_events
+from core.crypto import key_storage
+from core.vault.search_index import VaultSearchIndex
+
+
+class VaultIndexCache:
+    def __init__(self, entry_manager, event_module=None, search_index: Optional[VaultSearchIndex] = None):
+        self._entry_manager = entry_manager
+        self._events = event_module or default_events
+        self._lock = threading.RLock()
+        # entry_id -> строка списка; порядок вставки совпадает с ORDER BY id
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self.search_index = search_index or VaultSearchIndex()
+        self._loaded = False
+        self._attached = False
+        self.hits = 0
+        self.misses = 0
+        self.patches = 0
+
+    def attach(self):
+        # подписка на события CRUD и сброс вместе с ключом
+        if self._attached:
+            return
+        self._events.subscribe(self._events.EntryCreated, self._on_entry_changed)
+        self._events.subscribe(self._events.EntryUpdated, self._on_entry_changed)
+        self._events.subscribe(self._events.EntryDeleted, self._on_entry_deleted)
+        self._events.subscribe(self._events.EntriesCreated, self._on_entries_changed)
+        self._events.subscribe(self._events.EntriesUpdated, self._on_entries_changed)
+        self._events.subscribe(self._events.EntriesDeleted, self._on_entries_deleted)
+        self._events.subscribe(self._events.UserLoggedOut, self._on_logged_out)
+        key_storage.add_clear_listener(self.clear)
+        self._attached = True
+
+    def detach(self):
+        if not self._attached:
+            return
+        self._events.unsubscribe(self._events.EntryCreated, self._on_entry_changed)
+        self._events.unsubscribe(self._events.EntryUpdated, self._on_entry_changed)
+        self._events.unsubscribe(self._events.EntryDeleted, self._on_entry_deleted)
+        self._events.unsubscribe(self._events.EntriesCreated, self._on_entries_changed)
+        self._events.unsubscribe(self._events.EntriesUpdated, self._on_entries_changed)
+        self._events.unsubscribe(self._events.EntriesDeleted, self._on_entries_deleted)
+        self._events.unsubscribe(self._events.UserLoggedOut, self._on_logged_out)
+        key_storage.remove_clear_listener(self.clear)
+        self._attached = False
+        self.clear()
+
+    def get_all(self) -> List[Dict[str, Any]]:
+        # строки для таблицы; при промахе — полная загрузка (один раз за сессию)
+        with self._lock:
+            if self._loaded:
+                self.hits += 1
+                return list(self._rows.values())
+            self.misses += 1
+            rows = self._entry_manager.get_all_entries()
+            self._rows = {int(r["id"]): r for r in rows}
+            self.search_index.rebuild(rows)
+            self._loaded = True
+            return list(self._rows.values())
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        # строки под запрос через индекс (SEARCH-1), лучшие совпадения первыми; пустой запрос — все строки
+        with self._lock:
+            if not self._loaded:
+                self.get_all()
+            rows = self._rows
+            return [rows[i] for i in self.search_index.search(query) if i in rows]
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._rows.get(int(entry_id))
+
+    def invalidate(self):
+        # следующий get_all перечитает всё (например, после импорта или замены хранилища)
+        self.clear()
+
+    def clear(self):
+        # ссылки на расшифрованные строки отпускаются сразу (str в Python не обнулить — только не держать)
+        with self._lock:
+            self._rows.clear()
+            self.search_index.clear()
+            self._loaded = False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "patches": self.patches,
+                "size": len(self._rows),
+                "loaded": int(self._loaded),
+            }
+
+    def _on_entry_changed(self, entry_id=None, **_):
+        if entry_id is None:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            try:
+                row = self._entry_manager.get_list_entry(int(entry_id))
+            except Exception:
+                # не смогли расшифровать одну строку — честнее перечитать всё при следующем get_all
+                self.clear()
+                return
+            # dict сохраняет позицию существующего ключа, новые id добавляются в конец
+            self._rows[int(entry_id)] = row
+            self.search_index.update(row)
+            self.patches += 1
+
+    def _on_entry_deleted(self, entry_id=None, **_):
+        if entry_id is None:
+            return
+        with self._lock:
+            if self._rows.pop(int(entry_id), None) is not None:
+                self.search_index.remove(int(entry_id))
+                self.patches += 1
+
+    def _on_entries_changed(self, entry_ids=None, **_):
+        # пакет: одна выборка на все id, затем патч строк
+        if not entry_ids:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            try:
+                rows = self._entry_manager.get_list_entries([int(i) for i in entry_ids])
+            except Exception:
+                self.clear()
+                return
+            for row in rows:
+                self._rows[int(row["id"])] = row
+                self.search_index.update(row)
+            self.patches += len(rows)
+
+    def _on_entries_deleted(self, entry_ids=None, **_):
+        for entry_id in entry_ids or []:
+            self._on_entry_deleted(entry_id=entry_id)
+
+    def _on_logged_out(self, **_):
+        self.clear()
@@ -0,0 +1,143 @@
+# перешифровка хранилища новым ключом данных (ротация DEK; смена пароля только переобёртывает DEK —
+# см. core.key_manager)
+# - записи читаются страницами по id, каждая страница расшифровывается старым ключом
+#   и шифруется новым в пуле потоков (AESGCM из cryptography отпускает GIL)
+# - результат пишется в теневую таблицу; живая vault_entries не трогается до конца
+# - подмена таблицы и новые значения key_store — одна транзакция (db.swap_vault_shadow):
+#   сбой или отмена на любом шаге оставляют старое состояние, после COMMIT — новое
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .encryption_service import EncryptionServiceAESGCM
+
+_TAG_LEN = 16
+
+
+class RekeyCancelled(Exception):
+    pass
+
+
+def _aesgcm(key: bytes):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except Exception as e:
+        raise RuntimeError(
+            "Зависимость 'cryptography' не установлена, AES-256-GCM недоступен (спринт3)."
+        ) from e
+    if not key:
+        raise ValueError("Ключ недоступен")
+    return AESGCM(key)
+
+
+def _reencrypt_blob(old_aead, new_aead, blob: Optional[bytes]) -> Optional[bytes]:
+    # nonce || ciphertext || tag; plaintext (JSON payload) переносится байт в байт, без разбора
+    if blob is None:
+        return None
+    n = EncryptionServiceAESGCM.NONCE_LEN
+    if len(blob) < n + _TAG_LEN:
+        raise ValueError("Повреждённый зашифрованный формат")
+    view = memoryview(blob)
+    plaintext = old_aead.decrypt(view[:n], view[n:], None)
+    nonce = os.urandom(n)
+    return nonce + new_aead.encrypt(nonce, plaintext, None)
+
+
+class VaultRekeyer:
+    def __init__(
+        self,
+        db_module,
+        old_key: bytes,
+        new_key: bytes,
+        key_store_items: List[Tuple[str, bytes, int]],
+        batch_size: int = 1000,
+        workers: Optional[int] = None,
+    ):
+        # key_store_items — новые значения key_store (обёрнутый новый DEK), записываются в транзакции подмены
+        self._db = db_module
+        self._old_key = old_key
+        self._new_key = new_key
+        self._key_store_items = list(key_store_items)
+        self._batch_size = max(1, int(batch_size))
+        self._workers = workers or min(8, (os.cpu_count() or 1) + 1)
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        # отмена действует до подмены таблицы; после COMMIT действует новый ключ
+        self._cancel.set()
+
+    def _reencrypt_rows(self, rows) -> List[tuple]:
+        # AESGCM на каждый кусок: объекты не делятся между потоками
+        old_aead = _aesgcm(self._old_key)
+        new_aead = _aesgcm(self._new_key)
+        return [
+            (eid, _reencrypt_blob(old_aead, new_aead, enc), created_at, updated_at, tags,
+             _reencrypt_blob(old_aead, new_aead, meta))
+            for eid, enc, created_at, updated_at, tags, meta in rows
+        ]
+
+    def _split(self, rows: List[tuple]) -> List[List[tuple]]:
+        step = max(1, -(-len(rows) // self._workers))
+        return [rows[i:i + step] for i in range(0, len(rows), step)]
+
+    def run(self, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        # on_progress(done, total); результат: ok, cancelled, entries, seconds, error
+        started = time.perf_counter()
+        generation = self._db.get_vault_generation()
+        total = self._db.count_vault_entries()
+        done = 0
+        try:
+            self._db.create_vault_shadow()
+            batch: List[tuple] = []
+            with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="rekey") as pool:
+
+                def flush():
+                    nonlocal done
+                    if self._cancel.is_set():
+                        raise RekeyCancelled()
+                    out: List[tuple] = []
+                    for part in pool.map(self._reencrypt_rows, self._split(batch)):
+                        out.extend(part)
+                    self._db.insert_vault_shadow_rows(out)
+                    done += len(out)
+                    batch.clear()
+                    if on_progress is not None:
+                        on_progress(done, total)
+
+                for row in self._db.iter_vault_entries_full(batch_size=self._batch_size):
+                    batch.append(row)
+                    if len(batch) >= self._batch_size:
+                        flush()
+                if batch:
+                    flush()
+            if self._cancel.is_set():
+                raise RekeyCancelled()
+            self._db.swap_vault_shadow(generation, self._key_store_items)
+        except RekeyCancelled:
+            self._drop_shadow()
+            return {"ok": False, "cancelled": True, "entries": done, "seconds": time.perf_counter() - started, "error": None}
+        except Exception as exc:
+            self._drop_shadow()
+            return {"ok": False, "cancelled": False, "entries": done, "seconds": time.perf_counter() - started, "error": exc}
+        return {"ok": True, "cancelled": False, "entries": done, "seconds": time.perf_counter() - started, "error": None}
+
+    def _drop_shadow(self):
+        try:
+            self._db.drop_vault_shadow()
+        except Exception:
+            # тень без подмены ничего не меняет; init_db уберёт её при следующем запуске
+            pass
+
+    def start(self, on_progress=None, on_done=None) -> threading.Thread:
+        # фоновый запуск из GUI: on_done(result) вызывается из фонового потока
+        def target():
+            result = self.run(on_progress)
+            if on_done is not None:
+                on_done(result)
+
+        thread = threading.Thread(target=target, name="vault-rekey", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,262 @@
+# поисковый индекс списка (SEARCH-1/2) вместо прохода difflib по всем строкам на каждое нажатие
+# - строится из строк VaultIndexCache при разблокировке и патчится теми же CRUD-событиями
+# - два уровня: слово -> id записей (отдельно для title / username / домена / заметок)
+#   и триграммы -> слова словаря; нечёткое сравнение идёт по словарю (тысячи слов), а не по записям
+# - слово запроса совпадает со словом записи: началом или подстрокой (ранг 1.0) либо по доле общих
+#   триграмм не ниже SIMILARITY_THRESHOLD (опечатки); записи собираются объединением множеств id
+# - хранится только то, что уже есть в строке списка (username замаскирован, заметки — полный текст)
+
+import math
+import re
+import threading
+from collections import Counter
+from itertools import chain
+from typing import Any, Dict, List, Set, Tuple
+
+SEARCH_FIELDS = ("title", "username_masked", "url_domain", "notes")
+# префиксы запроса field:"value" -> поле строки списка
+FIELD_ALIASES = {"title": "title", "username": "username_masked", "url": "url_domain", "notes": "notes"}
+# та же граница, что у прежнего fuzzy-фильтра на difflib
+SIMILARITY_THRESHOLD = 0.6
+# у слова короче опечатка почти не отличается от другого префикса — только точное начало / подстрока
+_FUZZY_MIN_LEN = 4
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def parse_query(query: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+    # токены через пробел, двойные кавычки объединяют: title:"my bank" work
+    tokens: List[str] = []
+    buff = ""
+    in_quotes = False
+    for ch in query or "":
+        if ch == '"':
+            in_quotes = not in_quotes
+            continue
+        if ch.isspace() and not in_quotes:
+            if buff:
+                tokens.append(buff)
+                buff = ""
+            continue
+        buff += ch
+    if buff:
+        tokens.append(buff)
+
+    terms: List[str] = []
+    field_filters: List[Tuple[str, str]] = []
+    for tok in tokens:
+        if ":" in tok:
+            k, v = tok.split(":", 1)
+            field = FIELD_ALIASES.get(k.strip().lower())
+            if field is not None:
+                if v.strip():
+                    field_filters.append((field, v.strip()))
+                continue
+        terms.append(tok)
+    return terms, field_filters
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower())) if text else set()
+
+
+def _word_grams(word: str, closed: bool = True) -> Set[str]:
+    # "  g", " go", "goo", ..., "le " — начало слова выделено, поэтому префикс совпадает целиком
+    # closed=False — слово запроса, которое ещё набирают: без завершающей триграммы
+    padded = "  " + word + (" " if closed else "")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VaultSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # поле -> слово -> id записей
+        self._postings: Dict[str, Dict[str, Set[int]]] = {f: {} for f in SEARCH_FIELDS}
+        # словарь: слово -> в скольких полях-списках оно есть; триграмма -> слова
+        self._vocab: Dict[str, int] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        # id -> проиндексированные слова полей (для удаления / переиндексации)
+        self._docs: Dict[int, Tuple[Set[str], ...]] = {}
+        # (начало из 1-2 символов, поля) -> id: "g" подходит к тысячам слов, поэтому объединение их
+        # списков считается один раз и живёт до следующего изменения индекса
+        self._short: Dict[Tuple[str, Tuple[str, ...]], Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def clear(self):
+        with self._lock:
+            self._postings = {f: {} for f in SEARCH_FIELDS}
+            self._vocab = {}
+            self._grams = {}
+            self._docs = {}
+            self._short = {}
+
+    def rebuild(self, rows: List[Dict[str, Any]]):
+        with self._lock:
+            self.clear()
+            for row in rows:
+                self._add(row)
+
+    def update(self, row: Dict[str, Any]):
+        # новая или изменённая строка списка
+        with self._lock:
+            entry_id = int(row["id"])
+            self._remove(entry_id)
+            self._add(row)
+
+    def remove(self, entry_id: int):
+        with self._lock:
+            self._remove(int(entry_id))
+
+    def _add(self, row: Dict[str, Any]):
+        entry_id = int(row["id"])
+        fields = tuple(_words(str(row.get(f, "") or "")) for f in SEARCH_FIELDS)
+        for field, words in zip(SEARCH_FIELDS, fields):
+            postings = self._postings[field]
+            for word in words:
+                ids = postings.get(word)
+                if ids is None:
+                    postings[word] = {entry_id}
+                    self._vocab_add(word)
+                else:
+                    ids.add(entry_id)
+        self._docs[entry_id] = fields
+        self._short.clear()
+
+    def _remove(self, entry_id: int):
+        fields = self._docs.pop(entry_id, None)
+        if fields is None:
+            return
+        for field, words in zip(SEARCH_FIELDS, fields):
+            postings = self._postings[field]
+            for word in words:
+                ids = postings.get(word)
+                if ids is None:
+                    continue
+                ids.discard(entry_id)
+                if not ids:
+                    del postings[word]
+                    self._vocab_discard(word)
+        self._short.clear()
+
+    def _vocab_add(self, word: str):
+        count = self._vocab.get(word, 0)
+        self._vocab[word] = count + 1
+        if count == 0:
+            for gram in _word_grams(word):
+                self._grams.setdefault(gram, set()).add(word)
+
+    def _vocab_discard(self, word: str):
+        count = self._vocab.get(word, 0) - 1
+        if count > 0:
+            self._vocab[word] = count
+            return
+        self._vocab.pop(word, None)
+        for gram in _word_grams(word):
+            words = self._grams.get(gram)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._grams[gram]
+
+    def _match_words(self, qword: str) -> Dict[str, float]:
+        # слова словаря, похожие на слово запроса: начало / подстрока — 1.0, опечатка — доля общих триграмм
+        grams = _word_grams(qword, closed=False)
+        lists = sorted((self._grams.get(g, ()) for g in grams), key=len)
+        if not lists[0]:
+            matched: Dict[str, float] = {}
+        else:
+            matched = dict.fromkeys((w for w in set(lists[0]).intersection(*lists[1:]) if w.startswith(qword)), 1.0)
+        k = len(grams)
+        need = max(1, math.ceil(k * SIMILARITY_THRESHOLD))
+        if need < k and len(qword) >= _FUZZY_MIN_LEN:
+            # слово с need триграммами обязано встретиться хотя бы в одном из (k - need + 1) самых коротких списков
+            seeds = set().union(*lists[: k - need + 1])
+            if seeds:
+                counts = Counter(chain.from_iterable(lists))
+                for w in seeds:
+                    if counts[w] >= need and w not in matched:
+                        matched[w] = counts[w] / k
+        if len(qword) >= 3:
+            # подстрока в середине слова: все внутренние триграммы есть у слова
+            inner = sorted((self._grams.get(qword[i:i + 3], ()) for i in range(len(qword) - 2)), key=len)
+            if inner[0]:
+                for w in set(inner[0]).intersection(*inner[1:]):
+                    if qword in w:
+                        matched[w] = 1.0
+        return matched
+
+    def _short_prefix(self, qword: str, fields: Tuple[str, ...]) -> Set[int]:
+        key = (qword, fields)
+        ids = self._short.get(key)
+        if ids is None:
+            # триграмма "  g" / " go" — это ровно слова словаря, начинающиеся с qword
+            words = self._grams.get(("  " + qword)[-3:], ())
+            ids = set().union(*(self._postings[f][w] for w in words for f in fields if w in self._postings[f]))
+            self._short[key] = ids
+        return ids
+
+    def _word_tiers(self, qword: str, fields) -> List[Tuple[float, Set[int]]]:
+        # ступени (ранг, id записей) для одного слова запроса по убыванию ранга; id не повторяются
+        if len(qword) <= 2:
+            # короткое начало слова: только префикс, опечаток в нём не ищем
+            ids = self._short_prefix(qword, tuple(fields))
+            return [(1.0, ids)] if ids else []
+        by_score: Dict[float, List[Set[int]]] = {}
+        for word, score in self._match_words(qword).items():
+            for field in fields:
+                ids = self._postings[field].get(word)
+                if ids:
+                    by_score.setdefault(score, []).append(ids)
+        tiers: List[Tuple[float, Set[int]]] = []
+        seen: Set[int] = set()
+        for score in sorted(by_score, reverse=True):
+            ids = set().union(*by_score[score]) - seen
+            if ids:
+                tiers.append((score, ids))
+                seen |= ids
+        return tiers
+
+    def _clause(self, text: str, fields) -> List[Tuple[float, Set[int]]]:
+        # терм из нескольких слов (title:"my bank") — все слова в указанных полях
+        tiers: List[Tuple[float, Set[int]]] = []
+        for qword in _words(text):
+            word_tiers = self._word_tiers(qword, fields)
+            tiers = word_tiers if not tiers else _combine(tiers, word_tiers)
+            if not tiers:
+                return []
+        return tiers
+
+    def search(self, query: str) -> List[int]:
+        # id записей, подходящих под все термы и фильтры полей; сначала лучшие совпадения,
+        # при равном ранге — в порядке списка (по id)
+        terms, field_filters = parse_query(query)
+        with self._lock:
+            clauses = [(t, SEARCH_FIELDS) for t in terms] + [(v, (f,)) for f, v in field_filters]
+            clauses = [c for c in clauses if _words(c[0])]
+            if not clauses:
+                # пустой запрос или терм без букв/цифр ничего не ограничивает
+                return sorted(self._docs)
+            tiers: List[Tuple[float, Set[int]]] = []
+            for text, fields in clauses:
+                clause_tiers = self._clause(text, fields)
+                tiers = clause_tiers if not tiers else _combine(tiers, clause_tiers)
+                if not tiers:
+                    return []
+            out: List[int] = []
+            for _score, ids in tiers:
+                out.extend(sorted(ids))
+            return out
+
+
+def _combine(a: List[Tuple[float, Set[int]]], b: List[Tuple[float, Set[int]]]) -> List[Tuple[float, Set[int]]]:
+    # пересечение двух наборов ступеней: ранг записи — сумма рангов; ступени почти всегда две-три,
+    # поэтому пары перебираются целиком, а id сливаются операциями над множествами
+    merged: Dict[float, List[Set[int]]] = {}
+    for score_a, ids_a in a:
+        for score_b, ids_b in b:
+            common = ids_a & ids_b
+            if common:
+                merged.setdefault(score_a + score_b, []).append(common)
+    return [(score, set().union(*merged[score])) for score in sorted(merged, reverse=True)]
@@ -0,0 +1,110 @@
+# фоновый поиск для таблицы главного окна (SEARCH-2): сопоставление идёт не в GUI-потоке
+# - один поток и одна ячейка «следующий запрос»: новый запрос вытесняет ещё не начатый,
+#   поэтому быстрый набор не копит очередь полных поисков
+# - у каждого запроса номер поколения; результат устаревшего запроса не доставляется
+# - результат отдаётся страницами: первая маленькая (лучшие совпадения видны сразу), дальше крупнее
+# on_page вызывается из фонового потока (GUI пересылает страницы сигналом Qt, см. gui/search_controller)
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+SEARCH_FIRST_PAGE = 50
+SEARCH_PAGE_SIZE = 500
+
+
+class SearchPage:
+    def __init__(self, generation: int, query: str, rows: List[Dict[str, Any]], offset: int, done: bool,
+                 total: int = 0, error=None):
+        # offset == 0 — первая страница (таблица заполняется заново), done — последняя
+        self.generation = generation
+        self.query = query
+        self.rows = rows
+        self.offset = offset
+        self.done = done
+        self.total = total
+        self.error = error
+
+
+class SearchWorker:
+    def __init__(self, search_fn: Callable[[str], List[Dict[str, Any]]], first_page: int = SEARCH_FIRST_PAGE,
+                 page_size: int = SEARCH_PAGE_SIZE):
+        # search_fn(query) -> строки в порядке ранга (например, VaultIndexCache.search)
+        self._search = search_fn
+        self._first_page = max(1, int(first_page))
+        self._page_size = max(1, int(page_size))
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._pending: Optional[tuple] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def submit(self, query: str, on_page: Callable[[SearchPage], None]) -> int:
+        # запрос на место ожидающего; возвращает его поколение
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, query, on_page)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="vault-search", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return self._generation
+
+    def cancel(self):
+        # ожидающий запрос снимается, страницы выполняемого больше не доставляются
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._generation += 1
+            self._pending = None
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                generation, query, on_page = self._pending
+                self._pending = None
+            try:
+                rows = self._search(query)
+            except Exception as exc:
+                if self.is_current(generation):
+                    self._deliver(on_page, SearchPage(generation, query, [], 0, True, error=exc))
+                continue
+            self._deliver_pages(generation, query, rows, on_page)
+
+    def _deliver_pages(self, generation: int, query: str, rows: List[Dict[str, Any]], on_page):
+        total = len(rows)
+        offset = 0
+        size = self._first_page
+        while True:
+            # между страницами: пришёл новый запрос — остаток старого не нужен
+            if not self.is_current(generation):
+                return
+            page = rows[offset:offset + size]
+            done = offset + len(page) >= total
+            self._deliver(on_page, SearchPage(generation, query, page, offset, done, total=total))
+            if done:
+                return
+            offset += len(page)
+            size = self._page_size
+
+    @staticmethod
+    def _deliver(on_page, page: SearchPage):
+        try:
+            on_page(page)
+        except Exception:
+            pass
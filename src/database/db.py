@@ -12,6 +12,9 @@ from . import models
 
 # путь к vault.db задаётся снаружи из конфига; по умолчанию — рядом с проектом
 _db_path = None
+# счётчик изменений vault_entries в этом процессе (меняется под _lock): перешифровка сверяет его
+# перед подменой таблицы — правка, сделанная во время перешифровки, не теряется молча
+_vault_generation = 0
 # один поток в момент работает с бд — иначе sqlite может ругаться при одновременной записи
 _lock = threading.Lock()
 
@@ -22,6 +25,29 @@ _pool_total = 0
 _pool_path = None
 _pool_lock = threading.Lock()
 
+# режим пула: "serial" — всё через один коннект под _lock (как раньше);
+# "wal" — журнал WAL, один писатель под _lock и отдельный пул читателей без глобальной блокировки
+POOL_MODE_SERIAL = "serial"
+POOL_MODE_WAL = "wal"
+_pool_mode = POOL_MODE_SERIAL
+_READER_POOL_SIZE = 4
+_reader_queue = queue.Queue()
+_reader_total = 0
+# поколение пула читателей: коннект, взятый до смены пути/режима, при возврате закрывается
+_reader_generation = 0
+# единственный писатель режима WAL (доступ только под _lock) и путь, для которого он открыт
+_writer_conn = None
+_writer_path = None
+
+# настройки коннектов в режиме WAL (писатель и читатели)
+_WAL_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=%d" % (64 * 1024 * 1024),
+    "PRAGMA cache_size=-16384",  # в KiB: ~16 MB страничного кэша на коннект
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+)
+
 
 def _normalize_db_path(path):
     if not path:
@@ -37,24 +63,55 @@ def _ensure_parent_dir(file_path):
         os.makedirs(parent, exist_ok=True)
 
 
+def _drain_queue(q):
+    # закрываются все свободные коннекты из очереди
+    try:
+        while True:
+            c = q.get_nowait()
+            try:
+                c.close()
+            except Exception:
+                pass
+    except Exception:
+        pass
+
+
+def _reset_pools():
+    # вызывается под _lock: пулы пересоздаются при смене пути к БД или режима
+    global _pool_total, _pool_path, _reader_total, _reader_generation
+    _pool_total = 0
+    _pool_path = None
+    _drain_queue(_pool_queue)
+    _close_writer_connection()
+    with _pool_lock:
+        _reader_total = 0
+        _reader_generation += 1
+        _drain_queue(_reader_queue)
+
+
 def set_db_path(path):
     # задаётся путь к vault.db (при открытии или создании хранилища)
-    global _db_path, _pool_total, _pool_path
+    global _db_path
     with _lock:
         _db_path = _normalize_db_path(path)
         # пул пересоздаётся при смене пути к БД (тесты используют разные временные файлы)
-        _pool_total = 0
-        _pool_path = None
-        # очистка очереди доступных коннектов
-        try:
-            while True:
-                c = _pool_queue.get_nowait()
-                try:
-                    c.close()
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        _reset_pools()
+
+
+def set_pool_mode(mode, readers=None):
+    # режим пула задаётся из конфига при старте (main.py); readers — размер пула читателей для WAL
+    global _pool_mode, _READER_POOL_SIZE
+    if mode not in (POOL_MODE_SERIAL, POOL_MODE_WAL):
+        raise ValueError("mode должен быть serial или wal")
+    with _lock:
+        _pool_mode = mode
+        if readers:
+            _READER_POOL_SIZE = max(1, int(readers))
+        _reset_pools()
+
+
+def get_pool_mode():
+    return _pool_mode
 
 
 def _path():
@@ -65,6 +122,11 @@ def _path():
     return os.path.join(base, "vault.db")
 
 
+def get_db_path():
+    # текущий путь к бд (для кэшей, привязанных к конкретному файлу)
+    return _path()
+
+
 def get_connection():
     # открывается соединение с sqlite; после использования его нужно закрыть
     path = _normalize_db_path(_path()) or _path()
@@ -72,6 +134,20 @@ def get_connection():
     return sqlite3.connect(path)
 
 
+def _open_pooled_connection(path, read_only=False):
+    # check_same_thread=False: пул может обслуживать разные потоки GUI
+    conn = sqlite3.connect(path, check_same_thread=False)
+    if _pool_mode == POOL_MODE_WAL:
+        if not read_only:
+            # journal_mode сохраняется в файле БД — достаточно выставить его писателем
+            conn.execute("PRAGMA journal_mode=WAL")
+        for sql in _WAL_PRAGMAS:
+            conn.execute(sql)
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+    return conn
+
+
 def _get_pooled_connection():
     # возвращает sqlite connection из пула или создаёт новый (до _POOL_SIZE)
     global _pool_total, _pool_path
@@ -95,8 +171,7 @@ def _get_pooled_connection():
         except queue.Empty:
             if _pool_total < _POOL_SIZE:
                 _pool_total += 1
-                # check_same_thread=False: пул может обслуживать разные потоки GUI
-                return sqlite3.connect(path, check_same_thread=False)
+                return _open_pooled_connection(path)
 
     # если пул пуст и лимит достигнут — ждём свободный connection
     return _pool_queue.get()
@@ -113,9 +188,44 @@ def _return_pooled_connection(conn):
             pass
 
 
+def _close_writer_connection():
+    # вызывается под _lock
+    global _writer_conn, _writer_path
+    if _writer_conn is not None:
+        try:
+            _writer_conn.close()
+        except Exception:
+            pass
+    _writer_conn = None
+    _writer_path = None
+
+
+def _get_writer_connection():
+    # режим WAL: все записи идут через один выделенный коннект под _lock — писатель в sqlite всё равно один
+    global _writer_conn, _writer_path
+
+    path = _normalize_db_path(_path()) or _path()
+    _ensure_parent_dir(path)
+    if _writer_conn is None or _writer_path != path:
+        _close_writer_connection()
+        _writer_conn = _open_pooled_connection(path)
+        _writer_path = path
+    return _writer_conn
+
+
 def _with_connection(operation):
-    # одна точка входа: блокировка, взятие conn из пула, вызов operation(conn)
+    # одна точка входа: блокировка, взятие conn (писатель WAL или коннект из пула), вызов operation(conn)
     with _lock:
+        if _pool_mode == POOL_MODE_WAL:
+            conn = _get_writer_connection()
+            try:
+                return operation(conn)
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
         conn = _get_pooled_connection()
         try:
             result = operation(conn)
@@ -131,6 +241,48 @@ def _with_connection(operation):
             _return_pooled_connection(conn)
 
 
+def _get_reader_connection():
+    # читатель для режима WAL: свой пул, без глобального _lock; возвращается (поколение, conn)
+    global _reader_total
+
+    path = _normalize_db_path(_path()) or _path()
+    _ensure_parent_dir(path)
+
+    with _pool_lock:
+        generation = _reader_generation
+        try:
+            return generation, _reader_queue.get_nowait()
+        except queue.Empty:
+            if _reader_total < _READER_POOL_SIZE:
+                _reader_total += 1
+                return generation, _open_pooled_connection(path, read_only=True)
+
+    # все читатели заняты — ждём освободившийся
+    return generation, _reader_queue.get()
+
+
+def _return_reader_connection(generation, conn):
+    with _pool_lock:
+        if generation == _reader_generation:
+            _reader_queue.put_nowait(conn)
+            return
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _with_read_connection(operation):
+    # только чтение: в режиме WAL идёт параллельно с другими читателями и с писателем
+    if _pool_mode != POOL_MODE_WAL:
+        return _with_connection(operation)
+    generation, conn = _get_reader_connection()
+    try:
+        return operation(conn)
+    finally:
+        _return_reader_connection(generation, conn)
+
+
 def _ensure_audit_log_columns(cur):
     # спринт 5: дополняем audit_log, если база создана старой миграцией без новых полей
     cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='audit_log'")
@@ -148,6 +300,16 @@ def _ensure_audit_log_columns(cur):
     cur.execute("UPDATE audit_log SET sequence_number = id WHERE sequence_number IS NULL")
 
 
+def _ensure_vault_meta_column(cur):
+    # версия 5: колонка meta_data для списка записей; заполняется при первой разблокировке (нужен ключ)
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='vault_entries'")
+    if not cur.fetchone():
+        return
+    cols = {r[1] for r in cur.execute("PRAGMA table_info(vault_entries)").fetchall()}
+    if "meta_data" not in cols:
+        cur.execute("ALTER TABLE vault_entries ADD COLUMN meta_data BLOB")
+
+
 def init_db():
     # таблицы создаются, если их ещё нет; user_version хранит версию схемы для миграций (спринт 2: миграция key_store)
     def apply(conn):
@@ -223,28 +385,65 @@ def init_db():
             _ensure_audit_log_columns(cur)
             cur.execute("PRAGMA user_version = 4")
 
+        elif ver == 4:
+            _ensure_vault_meta_column(cur)
+            cur.execute("PRAGMA user_version = 5")
+            ver = 5
+
+        # 5 -> 6 выполняется и сразу после 4 -> 5 (обе миграции только добавляют таблицы/колонки)
+        if ver == 5:
+            cur.execute(models.AUDIT_CHECKPOINTS_DDL)
+            cur.execute("PRAGMA user_version = 6")
+            ver = 6
+
+        if ver == 6:
+            cur.execute(models.AUDIT_SEGMENTS_DDL)
+            cur.execute("PRAGMA user_version = 7")
+
         _ensure_audit_log_columns(cur)
+        _ensure_vault_meta_column(cur)
+        # перешифровка прервалась до подмены таблицы — действует старое состояние, тень не нужна
+        cur.execute("DROP TABLE IF EXISTS %s" % models.VAULT_SHADOW_TABLE)
+        cur.execute(models.AUDIT_CHECKPOINTS_DDL)
+        cur.execute(models.AUDIT_SEGMENTS_DDL)
         conn.commit()
 
     _with_connection(apply)
 
 
+def _chunks(seq, size=500):
+    # sqlite ограничивает число параметров в одном запросе (SQLITE_MAX_VARIABLE_NUMBER)
+    for i in range(0, len(seq), size):
+        yield seq[i : i + size]
+
+
 def _timestamp():
     # единый формат даты в БД: YYYY-MM-DD (спринт4/полировка UI)
     # Хранение времени отдельно не требуется для текущих задач проекта.
     return datetime.now().strftime("%Y-%m-%d")
 
 
-def insert_vault_entry(encrypted_data, tags=None):
+def _bump_vault_generation():
+    global _vault_generation
+    _vault_generation += 1
+
+
+def get_vault_generation():
+    return _vault_generation
+
+
+def insert_vault_entry(encrypted_data, tags=None, meta_data=None):
     # в хранилище добавляется одна запись; encrypted_data уже зашифрован (nonce||ciphertext||tag)
+    # meta_data — зашифрованная запись для списка (может быть None, тогда заполнится позже)
     def apply(conn):
         cur = conn.cursor()
+        _bump_vault_generation()
         now = _timestamp()
         cur.execute(
             """INSERT INTO vault_entries
-               (encrypted_data, created_at, updated_at, tags)
-               VALUES (?, ?, ?, ?)""",
-            (encrypted_data, now, now, tags or ""),
+               (encrypted_data, created_at, updated_at, tags, meta_data)
+               VALUES (?, ?, ?, ?, ?)""",
+            (encrypted_data, now, now, tags or "", meta_data),
         )
         conn.commit()
         return cur.lastrowid
@@ -261,7 +460,116 @@ def get_all_vault_entries():
         )
         return cur.fetchall()
 
-    return _with_connection(apply)
+    return _with_read_connection(apply)
+
+
+def get_all_vault_entries_meta():
+    # список для таблицы: (id, meta_data, encrypted_data, created_at, updated_at, tags)
+    # encrypted_data читается только для строк без meta_data (старые записи до версии 5)
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT id, meta_data, CASE WHEN meta_data IS NULL THEN encrypted_data END,
+                      created_at, updated_at, tags
+               FROM vault_entries ORDER BY id"""
+        )
+        return cur.fetchall()
+
+    return _with_read_connection(apply)
+
+
+def _page(sql, params):
+    # одна страница keyset-выборки; коннект берётся и возвращается на каждую страницу,
+    # поэтому длинный обход не держит блокировку/читателя всё время
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    return _with_read_connection(apply)
+
+
+def iter_vault_entries(batch_size=500):
+    # потоковый обход vault_entries по id (keyset): (id, encrypted_data, created_at, updated_at, tags)
+    last_id = 0
+    while True:
+        page = _page(
+            """SELECT id, encrypted_data, created_at, updated_at, tags
+               FROM vault_entries WHERE id > ? ORDER BY id LIMIT ?""",
+            (last_id, int(batch_size)),
+        )
+        yield from page
+        if len(page) < batch_size:
+            return
+        last_id = page[-1][0]
+
+
+def iter_vault_entries_meta(batch_size=500):
+    # то же для списка: строки в формате get_all_vault_entries_meta
+    last_id = 0
+    while True:
+        page = _page(
+            """SELECT id, meta_data, CASE WHEN meta_data IS NULL THEN encrypted_data END,
+                      created_at, updated_at, tags
+               FROM vault_entries WHERE id > ? ORDER BY id LIMIT ?""",
+            (last_id, int(batch_size)),
+        )
+        yield from page
+        if len(page) < batch_size:
+            return
+        last_id = page[-1][0]
+
+
+def get_vault_entry_meta(entry_id):
+    # одна строка в формате get_all_vault_entries_meta или None
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT id, meta_data, CASE WHEN meta_data IS NULL THEN encrypted_data END,
+                      created_at, updated_at, tags
+               FROM vault_entries WHERE id=?""",
+            (entry_id,),
+        )
+        return cur.fetchone()
+
+    return _with_read_connection(apply)
+
+
+def get_vault_entries_meta_by_ids(entry_ids):
+    # строки в формате get_all_vault_entries_meta для набора id (пакетные события кэша списка)
+    entry_ids = [int(i) for i in entry_ids]
+
+    def apply(conn):
+        cur = conn.cursor()
+        out = []
+        for part in _chunks(entry_ids):
+            cur.execute(
+                """SELECT id, meta_data, CASE WHEN meta_data IS NULL THEN encrypted_data END,
+                          created_at, updated_at, tags
+                   FROM vault_entries WHERE id IN (%s) ORDER BY id"""
+                % ",".join("?" * len(part)),
+                part,
+            )
+            out.extend(cur.fetchall())
+        return out
+
+    if not entry_ids:
+        return []
+    return _with_read_connection(apply)
+
+
+def set_vault_entries_meta(items):
+    # items: [(entry_id, meta_data), ...]; одна транзакция на весь набор (backfill после миграции)
+    def apply(conn):
+        cur = conn.cursor()
+        cur.executemany(
+            "UPDATE vault_entries SET meta_data=? WHERE id=?",
+            [(meta, entry_id) for entry_id, meta in items],
+        )
+        conn.commit()
+
+    if items:
+        _with_connection(apply)
 
 
 def get_vault_entry(entry_id):
@@ -274,17 +582,19 @@ def get_vault_entry(entry_id):
         )
         return cur.fetchone()
 
-    return _with_connection(apply)
+    return _with_read_connection(apply)
 
 
-def update_vault_entry(entry_id, encrypted_data, tags=None):
+def update_vault_entry(entry_id, encrypted_data, tags=None, meta_data=None):
     # запись с указанным id обновляется; encrypted_data передаётся уже зашифрованным
+    # без meta_data старая запись списка сбрасывается (NULL) и будет пересобрана при загрузке
     def apply(conn):
         cur = conn.cursor()
+        _bump_vault_generation()
         now = _timestamp()
         cur.execute(
-            """UPDATE vault_entries SET encrypted_data=?, updated_at=?, tags=? WHERE id=?""",
-            (encrypted_data, now, tags or "", entry_id),
+            """UPDATE vault_entries SET encrypted_data=?, updated_at=?, tags=?, meta_data=? WHERE id=?""",
+            (encrypted_data, now, tags or "", meta_data, entry_id),
         )
         conn.commit()
 
@@ -295,12 +605,193 @@ def delete_vault_entry(entry_id):
     # запись с указанным id удаляется из хранилища
     def apply(conn):
         cur = conn.cursor()
+        _bump_vault_generation()
         cur.execute("DELETE FROM vault_entries WHERE id=?", (entry_id,))
         conn.commit()
 
     _with_connection(apply)
 
 
+def insert_vault_entries_bulk(items):
+    # items: [(encrypted_data, tags, meta_data), ...]; одна транзакция и один commit на весь набор
+    # возвращаются id новых записей в порядке items
+    items = list(items)
+
+    def apply(conn):
+        cur = conn.cursor()
+        _bump_vault_generation()
+        now = _timestamp()
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM vault_entries")
+        before = int(cur.fetchone()[0])
+        cur.executemany(
+            """INSERT INTO vault_entries
+               (encrypted_data, created_at, updated_at, tags, meta_data)
+               VALUES (?, ?, ?, ?, ?)""",
+            [(enc, now, now, tags or "", meta) for enc, tags, meta in items],
+        )
+        # под _lock других писателей нет: новые id — всё, что больше прежнего максимума (AUTOINCREMENT)
+        cur.execute("SELECT id FROM vault_entries WHERE id > ? ORDER BY id", (before,))
+        ids = [int(r[0]) for r in cur.fetchall()]
+        conn.commit()
+        return ids
+
+    if not items:
+        return []
+    return _with_connection(apply)
+
+
+def get_vault_entries_by_ids(entry_ids):
+    # строки (id, encrypted_data, created_at, updated_at, tags) для набора id
+    entry_ids = [int(i) for i in entry_ids]
+
+    def apply(conn):
+        cur = conn.cursor()
+        out = []
+        for part in _chunks(entry_ids):
+            cur.execute(
+                "SELECT id, encrypted_data, created_at, updated_at, tags FROM vault_entries WHERE id IN (%s)"
+                % ",".join("?" * len(part)),
+                part,
+            )
+            out.extend(cur.fetchall())
+        return out
+
+    if not entry_ids:
+        return []
+    return _with_read_connection(apply)
+
+
+def update_vault_entries_bulk(items):
+    # items: [(entry_id, encrypted_data, tags, meta_data), ...]; одна транзакция, возвращается число строк
+    items = list(items)
+
+    def apply(conn):
+        cur = conn.cursor()
+        _bump_vault_generation()
+        now = _timestamp()
+        cur.executemany(
+            """UPDATE vault_entries SET encrypted_data=?, updated_at=?, tags=?, meta_data=? WHERE id=?""",
+            [(enc, now, tags or "", meta, entry_id) for entry_id, enc, tags, meta in items],
+        )
+        count = cur.rowcount
+        conn.commit()
+        return count
+
+    if not items:
+        return 0
+    return _with_connection(apply)
+
+
+def delete_vault_entries_bulk(entry_ids):
+    # удаление набора записей одной транзакцией; возвращается число удалённых строк
+    entry_ids = [int(i) for i in entry_ids]
+
+    def apply(conn):
+        cur = conn.cursor()
+        _bump_vault_generation()
+        cur.executemany("DELETE FROM vault_entries WHERE id=?", [(i,) for i in entry_ids])
+        count = cur.rowcount
+        conn.commit()
+        return count
+
+    if not entry_ids:
+        return 0
+    return _with_connection(apply)
+
+
+def iter_vault_entries_full(batch_size=500):
+    # все колонки строки для перешифровки: (id, encrypted_data, created_at, updated_at, tags, meta_data)
+    last_id = 0
+    while True:
+        page = _page(
+            """SELECT id, encrypted_data, created_at, updated_at, tags, meta_data
+               FROM vault_entries WHERE id > ? ORDER BY id LIMIT ?""",
+            (last_id, int(batch_size)),
+        )
+        yield from page
+        if len(page) < batch_size:
+            return
+        last_id = page[-1][0]
+
+
+def count_vault_entries():
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM vault_entries")
+        return int(cur.fetchone()[0])
+
+    return _with_read_connection(apply)
+
+
+def create_vault_shadow():
+    # пустая теневая таблица со схемой vault_entries (остатки прошлой попытки удаляются)
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS %s" % models.VAULT_SHADOW_TABLE)
+        cur.execute(models.VAULT_ENTRIES_DDL % models.VAULT_SHADOW_TABLE)
+        conn.commit()
+
+    _with_connection(apply)
+
+
+def insert_vault_shadow_rows(rows):
+    # rows: [(id, encrypted_data, created_at, updated_at, tags, meta_data), ...] — id и даты сохраняются
+    rows = list(rows)
+
+    def apply(conn):
+        cur = conn.cursor()
+        cur.executemany(
+            """INSERT INTO %s (id, encrypted_data, created_at, updated_at, tags, meta_data)
+               VALUES (?, ?, ?, ?, ?, ?)""" % models.VAULT_SHADOW_TABLE,
+            rows,
+        )
+        conn.commit()
+
+    if rows:
+        _with_connection(apply)
+
+
+def drop_vault_shadow():
+    def apply(conn):
+        conn.cursor().execute("DROP TABLE IF EXISTS %s" % models.VAULT_SHADOW_TABLE)
+        conn.commit()
+
+    _with_connection(apply)
+
+
+def swap_vault_shadow(expected_generation, key_store_items):
+    # одна транзакция: тень становится vault_entries, key_store получает новые значения
+    # (wrapped_dek, audit_anchor — core.key_manager.migrate_vault_key);
+    # при сбое до COMMIT остаётся старая таблица со старыми ключами
+    # key_store_items: [(key_type, key_data, version), ...]
+    def apply(conn):
+        if _vault_generation != expected_generation:
+            raise RuntimeError("Записи хранилища изменились во время перешифровки")
+        cur = conn.cursor()
+        if conn.in_transaction:
+            conn.commit()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'vault_entries'")
+        row = cur.fetchone()
+        old_seq = int(row[0]) if row else 0
+        cur.execute("DROP TABLE vault_entries")
+        cur.execute("ALTER TABLE %s RENAME TO vault_entries" % models.VAULT_SHADOW_TABLE)
+        for sql in models.VAULT_ENTRIES_INDEX_DDL:
+            cur.execute(sql)
+        # AUTOINCREMENT: id удалённых записей не выдаются повторно и после подмены
+        # пустая тень не заводит строку в sqlite_sequence — UPDATE ничего бы не сделал, поэтому REPLACE
+        cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'vault_entries'")
+        row = cur.fetchone()
+        new_seq = max(old_seq, int(row[0]) if row else 0)
+        cur.execute("DELETE FROM sqlite_sequence WHERE name = 'vault_entries'")
+        cur.execute("INSERT INTO sqlite_sequence(name, seq) VALUES ('vault_entries', ?)", (new_seq,))
+        _write_key_store_items(cur, key_store_items)
+        conn.commit()
+        _bump_vault_generation()
+
+    _with_connection(apply)
+
+
 def get_audit_tail():
     # последняя строка audit_log для цепочки подписи (спринт 5)
     def apply(conn):
@@ -321,7 +812,25 @@ def get_audit_tail():
             "entry_data": row[5],
         }
 
-    return _with_connection(apply)
+    return _with_read_connection(apply)
+
+
+_AUDIT_COLUMNS = """id, action, timestamp, entry_id, details, signature,
+                          sequence_number, previous_hash, entry_data"""
+
+
+def _audit_row_dict(r):
+    return {
+        "id": r[0],
+        "action": r[1],
+        "timestamp": r[2],
+        "entry_id": r[3],
+        "details": r[4],
+        "signature": r[5],
+        "sequence_number": r[6],
+        "previous_hash": r[7],
+        "entry_data": r[8],
+    }
 
 
 def list_audit_logs(limit: int = 500, offset: int = 0, event_type: Optional[str] = None):
@@ -329,38 +838,45 @@ def list_audit_logs(limit: int = 500, offset: int = 0, event_type: Optional[str]
         cur = conn.cursor()
         if event_type:
             cur.execute(
-                """SELECT id, action, timestamp, entry_id, details, signature,
-                          sequence_number, previous_hash, entry_data
+                """SELECT %s
                    FROM audit_log WHERE action = ?
-                   ORDER BY COALESCE(sequence_number, id) DESC LIMIT ? OFFSET ?""",
+                   ORDER BY COALESCE(sequence_number, id) DESC LIMIT ? OFFSET ?""" % _AUDIT_COLUMNS,
                 (event_type, limit, offset),
             )
         else:
             cur.execute(
-                """SELECT id, action, timestamp, entry_id, details, signature,
-                          sequence_number, previous_hash, entry_data
-                   FROM audit_log ORDER BY COALESCE(sequence_number, id) DESC LIMIT ? OFFSET ?""",
+                """SELECT %s
+                   FROM audit_log ORDER BY COALESCE(sequence_number, id) DESC LIMIT ? OFFSET ?""" % _AUDIT_COLUMNS,
                 (limit, offset),
             )
-        rows = cur.fetchall()
-        out = []
-        for r in rows:
-            out.append(
-                {
-                    "id": r[0],
-                    "action": r[1],
-                    "timestamp": r[2],
-                    "entry_id": r[3],
-                    "details": r[4],
-                    "signature": r[5],
-                    "sequence_number": r[6],
-                    "previous_hash": r[7],
-                    "entry_data": r[8],
-                }
-            )
-        return out
+        return [_audit_row_dict(r) for r in cur.fetchall()]
 
-    return _with_connection(apply)
+    return _with_read_connection(apply)
+
+
+def iter_audit_logs(batch_size: int = 1000, after_sequence: int = 0, event_type: Optional[str] = None):
+    # потоковый обход журнала по возрастанию sequence_number (keyset, индекс idx_audit_sequence)
+    # after_sequence — начать со следующей строки (например, после проверенного окна)
+    last_seq = int(after_sequence or 0)
+    while True:
+        if event_type:
+            page = _page(
+                """SELECT %s FROM audit_log
+                   WHERE sequence_number > ? AND action = ?
+                   ORDER BY sequence_number LIMIT ?""" % _AUDIT_COLUMNS,
+                (last_seq, event_type, int(batch_size)),
+            )
+        else:
+            page = _page(
+                """SELECT %s FROM audit_log
+                   WHERE sequence_number > ? ORDER BY sequence_number LIMIT ?""" % _AUDIT_COLUMNS,
+                (last_seq, int(batch_size)),
+            )
+        for r in page:
+            yield _audit_row_dict(r)
+        if len(page) < batch_size:
+            return
+        last_seq = int(page[-1][6])
 
 
 def count_audit_logs():
@@ -369,29 +885,177 @@ def count_audit_logs():
         cur.execute("SELECT COUNT(*) FROM audit_log")
         return int(cur.fetchone()[0])
 
-    return _with_connection(apply)
+    return _with_read_connection(apply)
 
 
 def prune_audit_logs(max_entries: int):
+    # без COUNT(*): граница — id строки, после которой остаётся max_entries строк
     def apply(conn):
         cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM audit_log")
-        total = int(cur.fetchone()[0])
-        if total <= max_entries:
+        cur.execute("SELECT id FROM audit_log ORDER BY id DESC LIMIT 1 OFFSET ?", (int(max_entries),))
+        row = cur.fetchone()
+        if not row:
             return 0
-        to_remove = total - max_entries
+        cur.execute("DELETE FROM audit_log WHERE id <= ?", (row[0],))
+        removed = cur.rowcount
+        # сегменты, строки которых удалены, больше не проверить
         cur.execute(
-            """DELETE FROM audit_log WHERE id IN (
-                SELECT id FROM audit_log ORDER BY id ASC LIMIT ?
-            )""",
-            (to_remove,),
+            """DELETE FROM audit_segments
+               WHERE first_sequence < (SELECT COALESCE(MIN(sequence_number), 0) FROM audit_log)"""
         )
         conn.commit()
-        return to_remove
+        return removed
 
     return _with_connection(apply)
 
 
+def get_audit_sequence_bounds():
+    # (min, max) sequence_number по индексу — без полного COUNT(*); None для пустого журнала
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute("SELECT MIN(sequence_number), MAX(sequence_number) FROM audit_log")
+        lo, hi = cur.fetchone()
+        return None if hi is None else (int(lo), int(hi))
+
+    return _with_read_connection(apply)
+
+
+def get_audit_log_by_sequence(sequence_number):
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT %s FROM audit_log WHERE sequence_number = ? ORDER BY id DESC LIMIT 1" % _AUDIT_COLUMNS,
+            (int(sequence_number),),
+        )
+        row = cur.fetchone()
+        return _audit_row_dict(row) if row else None
+
+    return _with_read_connection(apply)
+
+
+def list_audit_logs_by_sequence(first_sequence, last_sequence):
+    # строки журнала с first..last по возрастанию (сегмент Меркла)
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT %s FROM audit_log WHERE sequence_number BETWEEN ? AND ?
+               ORDER BY sequence_number""" % _AUDIT_COLUMNS,
+            (int(first_sequence), int(last_sequence)),
+        )
+        return [_audit_row_dict(r) for r in cur.fetchall()]
+
+    return _with_read_connection(apply)
+
+
+def _audit_segment_dict(r):
+    return {
+        "segment_index": r[0],
+        "first_sequence": r[1],
+        "last_sequence": r[2],
+        "merkle_root": r[3],
+        "signature": r[4],
+    }
+
+
+def get_audit_segment(segment_index):
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT segment_index, first_sequence, last_sequence, merkle_root, signature
+               FROM audit_segments WHERE segment_index = ?""",
+            (int(segment_index),),
+        )
+        row = cur.fetchone()
+        return _audit_segment_dict(row) if row else None
+
+    return _with_read_connection(apply)
+
+
+def list_audit_segments():
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT segment_index, first_sequence, last_sequence, merkle_root, signature
+               FROM audit_segments ORDER BY segment_index"""
+        )
+        return [_audit_segment_dict(r) for r in cur.fetchall()]
+
+    return _with_read_connection(apply)
+
+
+def list_audit_segment_indices(first_index, last_index):
+    # номера уже закрытых сегментов в диапазоне — без корней и подписей
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT segment_index FROM audit_segments WHERE segment_index BETWEEN ? AND ?",
+            (int(first_index), int(last_index)),
+        )
+        return {int(r[0]) for r in cur.fetchall()}
+
+    return _with_read_connection(apply)
+
+
+def insert_audit_segment(segment_index, first_sequence, last_sequence, merkle_root, signature):
+    def apply(conn):
+        conn.execute(
+            """INSERT OR REPLACE INTO audit_segments
+               (segment_index, first_sequence, last_sequence, merkle_root, signature, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (int(segment_index), int(first_sequence), int(last_sequence), merkle_root, signature, _timestamp()),
+        )
+        conn.commit()
+
+    _with_connection(apply)
+
+
+def delete_audit_segments():
+    def apply(conn):
+        conn.execute("DELETE FROM audit_segments")
+        conn.commit()
+
+    _with_connection(apply)
+
+
+def get_audit_checkpoint():
+    # последняя контрольная точка проверки журнала или None
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT sequence_number, chain_hash, signature, created_at
+               FROM audit_checkpoints ORDER BY id DESC LIMIT 1"""
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {"sequence_number": row[0], "chain_hash": row[1], "signature": row[2], "created_at": row[3]}
+
+    return _with_read_connection(apply)
+
+
+def set_audit_checkpoint(sequence_number, chain_hash, signature):
+    # хранится только последняя точка: новая запись заменяет предыдущие в одной транзакции
+    def apply(conn):
+        cur = conn.cursor()
+        cur.execute("DELETE FROM audit_checkpoints")
+        cur.execute(
+            """INSERT INTO audit_checkpoints (sequence_number, chain_hash, signature, created_at)
+               VALUES (?, ?, ?, ?)""",
+            (int(sequence_number), chain_hash, signature, _timestamp()),
+        )
+        conn.commit()
+
+    _with_connection(apply)
+
+
+def clear_audit_checkpoints():
+    def apply(conn):
+        conn.execute("DELETE FROM audit_checkpoints")
+        conn.commit()
+
+    _with_connection(apply)
+
+
 def insert_audit_log(
     action,
     entry_id=None,
@@ -434,6 +1098,27 @@ def insert_audit_log(
     _with_connection(apply)
 
 
+def insert_audit_logs_bulk(rows):
+    # пакет строк аудита одной транзакцией (асинхронный писатель журнала)
+    # rows: [(action, entry_id, details, signature, sequence_number, previous_hash, entry_data)]
+    if not rows:
+        return 0
+    ts = _timestamp()
+
+    def apply(conn):
+        cur = conn.cursor()
+        cur.executemany(
+            """INSERT INTO audit_log
+               (action, timestamp, entry_id, details, signature, sequence_number, previous_hash, entry_data)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(a, ts, eid, det or "", sig or "", sn, ph or "", data) for a, eid, det, sig, sn, ph, data in rows],
+        )
+        conn.commit()
+        return len(rows)
+
+    return _with_connection(apply)
+
+
 def backup():
     # заглушка: резервная копия бд (спринте 8)
     pass
@@ -452,7 +1137,30 @@ def get_key_store(key_type):
         row = cur.fetchone()
         return row[0] if row and row[0] is not None else None
 
-    return _with_connection(apply)
+    return _with_read_connection(apply)
+
+
+def _write_key_store_items(cur, items):
+    now = _timestamp()
+    for key_type, key_data, version in items:
+        cur.execute("DELETE FROM key_store WHERE key_type = ?", (key_type,))
+        cur.execute(
+            "INSERT INTO key_store (key_type, key_data, version, created_at) VALUES (?, ?, ?, ?)",
+            (key_type, key_data, version, now),
+        )
+
+
+def set_key_store_many(items):
+    # items: [(key_type, key_data, version), ...] — одной транзакцией (смена пароля: хеш, соль, параметры
+    # и обёрнутый ключ данных меняются вместе или не меняются вовсе)
+    items = list(items)
+
+    def apply(conn):
+        _write_key_store_items(conn.cursor(), items)
+        conn.commit()
+
+    if items:
+        _with_connection(apply)
 
 
 def set_key_store(key_type, key_data, version=1):
@@ -1,18 +1,46 @@
 # описание схемы vault db: версия и список sql-команд для создания таблиц
 # таблицы создаются в db.init_db() при первом запуске
 
-SCHEMA_VERSION = 4
-DDL = [
-    """CREATE TABLE IF NOT EXISTS vault_entries (
+SCHEMA_VERSION = 7
+
+AUDIT_CHECKPOINTS_DDL = """CREATE TABLE IF NOT EXISTS audit_checkpoints (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sequence_number INTEGER NOT NULL,
+        chain_hash TEXT NOT NULL,
+        signature TEXT NOT NULL,
+        created_at TEXT
+    )"""
+
+AUDIT_SEGMENTS_DDL = """CREATE TABLE IF NOT EXISTS audit_segments (
+        segment_index INTEGER PRIMARY KEY,
+        first_sequence INTEGER NOT NULL,
+        last_sequence INTEGER NOT NULL,
+        merkle_root TEXT NOT NULL,
+        signature TEXT NOT NULL,
+        created_at TEXT
+    )"""
+# meta_data — компактная зашифрованная запись для списка (название, маска логина, домен),
+# чтобы таблица GUI не расшифровывала полный payload с паролем (версия схемы 5)
+# %s — имя таблицы: та же схема нужна теневой таблице перешифровки (core/vault/rekey.py)
+VAULT_ENTRIES_DDL = """CREATE TABLE IF NOT EXISTS %s (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         encrypted_data BLOB,
         created_at TEXT,
         updated_at TEXT,
-        tags TEXT
-    )""",
+        tags TEXT,
+        meta_data BLOB
+    )"""
+VAULT_ENTRIES_INDEX_DDL = [
     "CREATE INDEX IF NOT EXISTS idx_vault_created_at ON vault_entries(created_at)",
     "CREATE INDEX IF NOT EXISTS idx_vault_updated_at ON vault_entries(updated_at)",
     "CREATE INDEX IF NOT EXISTS idx_vault_tags ON vault_entries(tags)",
+]
+# теневая таблица смены мастер-пароля; после сбоя посреди перешифровки удаляется в init_db
+VAULT_SHADOW_TABLE = "vault_entries_rekey"
+
+DDL = [
+    VAULT_ENTRIES_DDL % "vault_entries",
+    *VAULT_ENTRIES_INDEX_DDL,
     """CREATE TABLE IF NOT EXISTS audit_log (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         action TEXT,
@@ -28,6 +56,11 @@ DDL = [
     "CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON audit_log(timestamp)",
     "CREATE INDEX IF NOT EXISTS idx_audit_sequence ON audit_log(sequence_number)",
     "CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log(action)",
+    # контрольная точка проверки журнала: до sequence_number цепочка уже проверена,
+    # chain_hash — хеш этой строки, signature — HMAC ключом подписи аудита (версия схемы 6)
+    AUDIT_CHECKPOINTS_DDL,
+    # сегменты журнала по SEGMENT_SIZE строк с подписанным корнем Меркла (версия схемы 7)
+    AUDIT_SEGMENTS_DDL,
     """CREATE TABLE IF NOT EXISTS settings (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         setting_key TEXT UNIQUE,
@@ -2,7 +2,6 @@
 
 import sys
 import os
-import json
 import secrets
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -10,11 +9,13 @@ from PyQt6.QtWidgets import QDialog, QVBoxLayout, QPushButton, QHBoxLayout, QMes
 from PyQt6.QtCore import Qt
 
 from core.input_validation import MAX_MASTER_PASSWORD_LEN
-from core.crypto.authentication import verify_password, validate_password_strength
-from core.crypto.key_derivation import hash_password_argon2, derive_key_pbkdf2
+from core.crypto.authentication import validate_password_strength
+from core.crypto import kdf_params
+from core.crypto.kdf_worker import get_kdf_worker
 from core.crypto import key_storage
 from database import db as database_db
-from core.vault.encryption_service import EncryptionServiceAESGCM
+from core.key_manager import wrapped_vault_key_item
+from .kdf_bridge import KdfBridge, make_progress_bar
 from .strings import t
 from .widgets.password_entry import PasswordEntry
 
@@ -36,11 +37,19 @@ class ChangePasswordDialog(QDialog):
         fl.addRow(t("new_password"), self._new)
         fl.addRow(t("confirm_password"), self._confirm)
         layout.addWidget(gr)
+        # проверка текущего пароля, хеш и ключ нового — в фоне (core.crypto.kdf_worker)
+        self._progress = make_progress_bar(self)
+        layout.addWidget(self._progress)
+        self._bridge = KdfBridge(self)
+        self._bridge.progress.connect(lambda _stage, fraction: self._progress.setValue(int(fraction * 100)))
+        self._bridge.finished.connect(self._on_kdf_finished)
+        self._pending = None
         btns = QHBoxLayout()
         btns.addStretch()
         ok_btn = QPushButton(t("ok"))
         ok_btn.setMinimumWidth(100)
         ok_btn.clicked.connect(self._on_ok)
+        self._ok_btn = ok_btn
         cancel_btn = QPushButton(t("cancel"))
         cancel_btn.setMinimumWidth(100)
         cancel_btn.clicked.connect(self.reject)
@@ -70,78 +79,59 @@ class ChangePasswordDialog(QDialog):
             QMessageBox.warning(self, t("change_password_title"), t("setup_first"))
             return
         stored_hash = auth_blob.decode("utf-8")
-        if not verify_password(stored_hash, current):
-            QMessageBox.warning(self, t("change_password_title"), t("wrong_password"))
+        if self._pending is not None:
             return
-        # спринт 2 CHANGE-2: новый ключ, перешифровка записей, обновление key_store; при ошибке откат (CHANGE-4)
-        old_key = key_storage.get_cached_key()
-        if not old_key:
+        # спринт 2 CHANGE-2: новый ключ из пароля, переобёртка ключа данных, обновление key_store
+        vault_key = key_storage.get_cached_key()
+        if not vault_key:
             QMessageBox.warning(self, t("change_password_title"), t("error_generic"))
             return
-        old_auth_blob = database_db.get_key_store("auth_hash")
-        old_salt_blob = database_db.get_key_store("enc_salt")
         new_salt = secrets.token_bytes(16)
-        params_blob = database_db.get_key_store("params")
-        iterations = None
-        if params_blob:
-            try:
-                params = json.loads(params_blob.decode("utf-8"))
-                iterations = params.get("pbkdf2_iterations")
-                if iterations is not None:
-                    iterations = int(iterations)
-            except Exception:
-                iterations = None
-        new_key = derive_key_pbkdf2(new_pwd, new_salt, iterations=iterations)
-        new_auth_hash = hash_password_argon2(new_pwd)
-        cipher_old = EncryptionServiceAESGCM(_FakeKeyManager(old_key))
-        cipher_new = EncryptionServiceAESGCM(_FakeKeyManager(new_key))
-        try:
-            rows = database_db.get_all_vault_entries()
-
-            # CHANGE-4: если перешифровка упадёт — восстанавливаем старые encrypted_data
-            old_payloads = {}
-            for r in rows:
-                eid, encrypted_data, created_at, updated_at, tags = r
-                old_payloads[int(eid)] = (encrypted_data, tags)
+        # (KEY-3) новый ключ — с откалиброванными итерациями, если калибровка их отложила до смены пароля
+        params = kdf_params.load_params()
+        params["pbkdf2_iterations"] = kdf_params.pbkdf2_iterations_for_new_key(params)
+        params.pop("pending_pbkdf2_iterations", None)
+        self._pending = (vault_key, new_salt, params)
+        self._set_busy(True)
+        get_kdf_worker().new_credentials(
+            new_pwd,
+            new_salt,
+            params["pbkdf2_iterations"],
+            current_password=current,
+            stored_hash=stored_hash,
+            params=params,
+            on_progress=self._bridge.on_progress,
+            on_done=self._bridge.on_done,
+        )
 
-            # перешифровка всех записей (Decrypt old -> Encrypt new)
-            for r in rows:
-                eid, encrypted_data, created_at, updated_at, tags = r
-                plain_payload = cipher_old.decrypt_entry_payload(encrypted_data)
-                created_at_use = created_at or plain_payload.get("created_at") or cipher_old.now_timestamp()
-                payload_new = EncryptionServiceAESGCM.build_payload_for_encrypt(plain_payload, created_at=created_at_use)
-                new_encrypted = cipher_new.encrypt_entry_payload(payload_new).encrypted_blob
-                database_db.update_vault_entry(int(eid), encrypted_data=new_encrypted, tags=tags)
+    def _set_busy(self, busy):
+        self._ok_btn.setEnabled(not busy)
+        self._progress.setValue(0)
+        self._progress.setVisible(busy)
 
-            database_db.set_key_store("auth_hash", new_auth_hash.encode("utf-8"))
-            database_db.set_key_store("enc_salt", new_salt)
-            key_storage.set_cached_key(new_key)
-            QMessageBox.information(self, t("change_password_title"), t("change_password_ok"))
-            self.accept()
+    def _on_kdf_finished(self, result):
+        pending, self._pending = self._pending, None
+        self._set_busy(False)
+        if pending is None or not self.isVisible():
+            return
+        if result.error is not None:
+            QMessageBox.warning(self, t("change_password_title"), t("error_generic"))
+            return
+        if not result.ok:
+            QMessageBox.warning(self, t("change_password_title"), t("wrong_password"))
+            return
+        vault_key, new_salt, params = pending
+        # CHANGE-2: записи зашифрованы ключом данных — он только переобёртывается новым ключом из пароля;
+        # CHANGE-4: хеш, соль, параметры и обёрнутый ключ пишутся одной транзакцией (всё или ничего)
+        try:
+            database_db.set_key_store_many([
+                ("auth_hash", result.auth_hash.encode("utf-8"), 1),
+                ("enc_salt", new_salt, 1),
+                ("params", kdf_params.encode_params(params), kdf_params.KDF_PARAMS_VERSION),
+                wrapped_vault_key_item(result.key, vault_key),
+            ])
         except Exception:
-            if old_auth_blob:
-                database_db.set_key_store("auth_hash", old_auth_blob)
-            if old_salt_blob:
-                database_db.set_key_store("enc_salt", old_salt_blob)
-            # откат изменений в vault_entries
-            try:
-                rows = database_db.get_all_vault_entries()
-                # восстановление делаем только если список старых значений доступен
-                # (old_payloads может быть не задан, если ошибка случилась очень рано)
-                if "old_payloads" in locals():
-                    for r in rows:
-                        eid = int(r[0])
-                        if eid in old_payloads:
-                            encrypted_data_old, tags_old = old_payloads[eid]
-                            database_db.update_vault_entry(eid, encrypted_data=encrypted_data_old, tags=tags_old)
-            except Exception:
-                pass
-            key_storage.set_cached_key(old_key)
             QMessageBox.warning(self, t("change_password_title"), t("error_generic"))
-
-
-class _FakeKeyManager:
-    def __init__(self, key):
-        self._key = key
-    def get_encryption_key(self):
-        return self._key
+            return
+        QMessageBox.information(self, t("change_password_title"), t("change_password_ok"))
+        self.accept()
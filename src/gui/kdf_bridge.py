@@ -0,0 +1,25 @@
+# мост между KdfWorker (фоновые потоки) и окнами: callback'и превращаются в сигналы Qt,
+# слоты выполняются в GUI-потоке (queued connection)
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtWidgets import QProgressBar
+
+
+class KdfBridge(QObject):
+    progress = pyqtSignal(str, float)
+    finished = pyqtSignal(object)
+
+    def on_progress(self, stage, fraction):
+        self.progress.emit(stage, float(fraction))
+
+    def on_done(self, result):
+        self.finished.emit(result)
+
+
+def make_progress_bar(parent=None) -> QProgressBar:
+    # полоса прогресса KDF: скрыта, пока задача не запущена
+    bar = QProgressBar(parent)
+    bar.setRange(0, 100)
+    bar.setTextVisible(False)
+    bar.setVisible(False)
+    return bar
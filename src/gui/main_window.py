@@ -5,24 +5,25 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QMenuBar, QStatusBar,
-    QLabel, QMessageBox, QFileDialog, QApplication, QTableWidgetItem,
-    QLineEdit, QHBoxLayout, QToolBar, QPushButton
+    QLabel, QMessageBox, QFileDialog, QApplication,
+    QLineEdit, QToolBar
 )
 from PyQt6.QtCore import QTimer, Qt, QEvent
 from PyQt6.QtGui import QAction
 
-import difflib
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 from core import config
 from core.state_manager import get_state_manager
 from core.key_manager import get_key_manager
 from core import events
 from database import db as database_db
 from core.vault.entry_manager import EntryManager
+from core.vault.index_cache import VaultIndexCache
 from core.clipboard.clipboard_service import ClipboardService
 from core.clipboard.clipboard_monitor import ClipboardMonitor
 from core.clipboard.platform_adapter import create_platform_adapter
 from .strings import t
+from .search_controller import SearchController
 from .widgets.secure_table import SecureTable
 
 
@@ -36,9 +37,11 @@ class MainWindow(QMainWindow):
         # (спринт3) контроллер vault: CRUD + AES-GCM шифрование/дешифрование
         km = get_key_manager()
         self._entry_manager = EntryManager(database_db, km, events)
+        # кэш строк списка: CRUD-события патчат одну строку вместо полной перезагрузки
+        self._index_cache = VaultIndexCache(self._entry_manager, events)
+        self._index_cache.attach()
         self._all_entries_cache: List[Dict] = []
-        self._password_revealed: Dict[int, str] = {}  # entry_id -> plaintext password
-        self._password_widgets: Dict[int, Tuple[QLabel, QPushButton]] = {}
+        # раскрытые пароли живут в модели таблицы (SecureTable), пока строка показана
         self._global_show_passwords = False
 
         # (спринт4) сервис буфера обмена; очистка по таймеру GUI — один раз, из главного потока
@@ -86,11 +89,14 @@ class MainWindow(QMainWindow):
         self._search.setPlaceholderText(t("search_placeholder"))
         self._search.textChanged.connect(self._on_search_changed)
         layout.addWidget(self._search)
+        self._search_controller = SearchController(self._index_cache.search, parent=self)
+        self._search_controller.page_ready.connect(self._on_search_page)
 
         self._table = SecureTable(self)
         # context menu (GUI-2 / GUI-3): правый клик по строке
         self._table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self._table.customContextMenuRequested.connect(self._on_context_menu)
+        self._table.eye_clicked.connect(self._on_eye_clicked)
         self._load_table()
         layout.addWidget(self._table)
 
@@ -175,6 +181,9 @@ class MainWindow(QMainWindow):
             self._clipboard_service.clear(reason="vault_lock")
         except Exception:
             pass
+        if hasattr(self, "_search_controller"):
+            # результаты поиска, посчитанные до блокировки, в таблицу уже не попадут
+            self._search_controller.cancel()
         clear_encryption_key()
         get_state_manager().set_locked(True)
         if hasattr(self, "_status_label"):
@@ -195,6 +204,8 @@ class MainWindow(QMainWindow):
         d = UnlockDialog(self)
         if d.exec():
             self.set_locked(False)
+            # кэш списка очищен при блокировке — перечитываем записи уже с новым ключом
+            self._load_table()
 
     def reset_buffer_timer(self):
         sm = get_state_manager()
@@ -206,15 +217,15 @@ class MainWindow(QMainWindow):
         self._status_label.setText(t("status_locked") if locked else t("status_unlocked"))
 
     def _get_selected_entry_id(self):
-        # возвращаем id выбранной записи (спринт3: пароль/eye кнопки не участвуют в item-data)
-        item = self._table.currentItem()
-        if item is None:
-            # если текущий item не выбран — берём первый выбранный
-            selected = self._table.selectedItems()
+        # возвращаем id выбранной записи (UserRole модели таблицы)
+        entry_id = self._table.current_entry_id()
+        if entry_id is None:
+            # если текущая строка не выбрана — берём первую выбранную
+            selected = self._table.selected_entry_ids()
             if not selected:
                 return None
-            item = selected[0]
-        return item.data(Qt.ItemDataRole.UserRole)
+            entry_id = selected[0]
+        return entry_id
 
     def _show_error(self):
         # показ общего сообщения об ошибке (без деталей, чтобы не светить реализацию)
@@ -261,216 +272,86 @@ class MainWindow(QMainWindow):
             pass
 
     def _fill_table(self, rows):
-        # таблица заполняется списком уже расшифрованных метаданных (пароль не держим)
-        self._table.setRowCount(len(rows))
-        self._password_widgets = {}
-        # если перерисовали таблицу — скрываем все ранее раскрытые пароли
-        self._password_revealed = {}
-
-        masked_password = "••••••••"
-        for i, row in enumerate(rows):
-            entry_id = int(row["id"])
-
-            t0 = QTableWidgetItem(str(row.get("title", "") or ""))
-            t0.setData(Qt.ItemDataRole.UserRole, entry_id)
-            self._table.setItem(i, 0, t0)
-
-            t1 = QTableWidgetItem(str(row.get("username_masked", "") or ""))
-            t1.setData(Qt.ItemDataRole.UserRole, entry_id)
-            self._table.setItem(i, 1, t1)
-
-            t2 = QTableWidgetItem(str(row.get("url_domain", "") or ""))
-            t2.setData(Qt.ItemDataRole.UserRole, entry_id)
-            self._table.setItem(i, 2, t2)
-
-            t3 = QTableWidgetItem(str(row.get("updated_at", "") or ""))
-            t3.setData(Qt.ItemDataRole.UserRole, entry_id)
-            self._table.setItem(i, 3, t3)
-
-            t4 = QTableWidgetItem(str(row.get("notes", "") or ""))
-            t4.setData(Qt.ItemDataRole.UserRole, entry_id)
-            self._table.setItem(i, 4, t4)
-
-            # GUI-3: (eye icon) — ячейка пароля
-            cell = QWidget()
-            hb = QHBoxLayout(cell)
-            hb.setContentsMargins(0, 0, 0, 0)
-            label = QLabel(masked_password)
-            btn = QPushButton(t("password_show"))
-            btn.setMinimumWidth(72)
-            hb.addWidget(label)
-            hb.addWidget(btn)
-
-            btn.setProperty("entry_id", entry_id)
-            btn.clicked.connect(self._on_eye_clicked)
-
-            self._table.setCellWidget(i, 5, cell)
-            self._password_widgets[entry_id] = (label, btn)
+        # таблица показывает строки кэша списка (уже расшифрованные метаданные, пароль не держим);
+        # модель берёт ссылки на строки, ячейки отрисовываются только для видимой области
+        # новый набор строк скрывает все ранее раскрытые пароли
+        self._table.set_rows(rows)
+
+    def _append_table_rows(self, rows):
+        # дописывает строки в конец таблицы (следующая страница результатов поиска)
+        self._table.append_rows(rows)
 
     def _load_table(self):
         try:
-            self._all_entries_cache = self._entry_manager.get_all_entries()
+            self._all_entries_cache = self._index_cache.get_all()
             self._apply_search_filter_and_fill()
         except Exception:
             self._show_error()
-            self._table.setRowCount(0)
+            self._table.set_rows([])
 
     def _apply_search_filter_and_fill(self):
         query = (self._search.text() or "").strip()
         if not query:
+            self._search_controller.cancel()
             self._fill_table(self._all_entries_cache)
             return
-        filtered = self._filter_entries(query, self._all_entries_cache)
-        self._fill_table(filtered)
+        # SEARCH-1: full-text по title/username/url/notes + fuzzy + field filters title:"..."
+        # индекс (core.vault.search_index) собран при загрузке списка и патчится CRUD-событиями
+        self._search_controller.run_now(query)
 
-    def _on_search_changed(self, _):
-        # SEARCH-2: realtime обновление результатов
-        try:
+    def _on_search_changed(self, text):
+        # SEARCH-2: realtime обновление результатов — после паузы в наборе и в фоновом потоке
+        query = (text or "").strip()
+        if not query:
             self._apply_search_filter_and_fill()
-        except Exception:
-            self._show_error()
+            return
+        self._search_controller.set_query(query)
 
-    def _similarity(self, a: str, b: str) -> float:
-        # fuzzy matching: опечатки → приблизительное совпадение
-        a = (a or "").lower()
-        b = (b or "").lower()
-        if not a or not b:
-            return 0.0
-        if b in a:
-            return 1.0
-        return difflib.SequenceMatcher(None, a, b).ratio()
-
-    def _filter_entries(self, query: str, rows: List[Dict]) -> List[Dict]:
-        # SEARCH-1: full-text по title/username/url/notes + fuzzy + field filters title:"..."
-        # поддержим поля: title, username, url, notes
-        terms: List[str] = []
-        field_filters: List[Tuple[str, str]] = []
-
-        # простой разбор токенов с поддержкой двойных кавычек: key:"value"
-        buff = ""
-        in_quotes = False
-        tokens: List[str] = []
-        for ch in query:
-            if ch == '"':
-                in_quotes = not in_quotes
-                continue
-            if ch.isspace() and not in_quotes:
-                if buff:
-                    tokens.append(buff)
-                    buff = ""
-                continue
-            buff += ch
-        if buff:
-            tokens.append(buff)
-
-        for tok in tokens:
-            if ":" in tok:
-                k, v = tok.split(":", 1)
-                k = k.strip().lower()
-                v = v.strip()
-                if k in ("title", "username", "url", "notes"):
-                    field_filters.append((k, v))
-                    continue
-            terms.append(tok)
-
-        out: List[Dict] = []
-        for r in rows:
-            title = r.get("title", "") or ""
-            username = r.get("username_masked", "") or ""
-            url_domain = r.get("url_domain", "") or ""
-            notes = r.get("notes", "") or ""
-
-            # для fuzzy используем тоже masked username; для "username:" фильтра этого достаточно
-            ok = True
-            for k, v in field_filters:
-                if k == "title":
-                    hay = title
-                elif k == "username":
-                    hay = username
-                elif k == "url":
-                    hay = url_domain
-                elif k == "notes":
-                    hay = notes
-                else:
-                    hay = ""
-                if self._similarity(hay, v) < 0.6:
-                    ok = False
-                    break
-            if not ok:
-                continue
-
-            # free-text: все термины должны хотя бы немного совпасть с каким-то полем
-            for term in terms:
-                best = max(
-                    self._similarity(title, term),
-                    self._similarity(username, term),
-                    self._similarity(url_domain, term),
-                    self._similarity(notes, term),
-                )
-                if best < 0.6:
-                    ok = False
-                    break
-            if ok:
-                out.append(r)
-        return out
+    def _on_search_page(self, page):
+        # страница устаревшего запроса (пользователь уже набрал следующий) отбрасывается
+        if not self._search_controller.is_current(page):
+            return
+        if page.error is not None:
+            self._show_error()
+            return
+        if page.offset == 0:
+            self._fill_table(page.rows)
+        else:
+            self._append_table_rows(page.rows)
 
     def _toggle_password_cell(self, entry_id: int, show: bool):
-        # обновляет UI-ячейку и держит plaintext только пока show=True
-        widget = self._password_widgets.get(entry_id)
-        if not widget:
-            return
-        label, btn = widget
+        # обновляет ячейку пароля и держит plaintext только пока show=True
+        model = self._table.vault_model()
         if not show:
-            label.setText("••••••••")
-            btn.setText(t("password_show"))
-            if entry_id in self._password_revealed:
-                # убираем ссылку на plaintext (SEC-1: не держим постоянно)
-                del self._password_revealed[entry_id]
+            # убираем ссылку на plaintext (SEC-1: не держим постоянно)
+            model.set_revealed(entry_id, None)
             return
 
         # show=True: расшифровываем пароль (требуется unlocked + PBKDF2 ключ в кэше)
         try:
             entry = self._entry_manager.get_entry(entry_id)
-            pwd = entry.get("password") or ""
-            self._password_revealed[entry_id] = pwd
-            label.setText(pwd)
-            btn.setText(t("password_hide"))
+            model.set_revealed(entry_id, entry.get("password") or "")
         except Exception:
             # без деталей (SEC-4)
             self._show_error()
 
-    def _on_eye_clicked(self):
-        # GUI-3: переключение видимости пароля через кнопку-глаз
-        btn = self.sender()
-        if not isinstance(btn, QPushButton):
-            return
-        entry_id = int(btn.property("entry_id"))
-        is_shown = entry_id in self._password_revealed
+    def _on_eye_clicked(self, entry_id: int):
+        # GUI-3: переключение видимости пароля через кнопку-глаз (рисует делегат колонки пароля)
+        is_shown = self._table.vault_model().is_revealed(entry_id)
         self._toggle_password_cell(entry_id, show=not is_shown)
 
     def _on_global_toggle_passwords(self, checked: bool):
         # GUI-3: глобальный toggle + Ctrl+Shift+P
         self._global_show_passwords = bool(checked)
-        # выделение по строкам (selectedItems не видит ячейку с виджетом пароля — только QTableWidgetItem)
-        selected_ids = set()
-        sm = self._table.selectionModel()
-        if sm is not None:
-            for idx in sm.selectedRows():
-                item = self._table.item(idx.row(), 0)
-                if item is not None:
-                    eid = item.data(Qt.ItemDataRole.UserRole)
-                    if eid is not None:
-                        selected_ids.add(int(eid))
-        cur_row = self._table.currentRow()
-        if cur_row >= 0:
-            item = self._table.item(cur_row, 0)
-            if item is not None:
-                eid = item.data(Qt.ItemDataRole.UserRole)
-                if eid is not None:
-                    selected_ids.add(int(eid))
-        # явный «показать всё» по тулбару: если строк не выделили — все видимые записи
+        model = self._table.vault_model()
+        # выделенные строки и текущая строка
+        selected_ids = set(self._table.selected_entry_ids())
+        current = self._table.current_entry_id()
+        if current is not None:
+            selected_ids.add(current)
+        # явный «показать всё» по тулбару: если строк не выделили — все записи таблицы
         if not selected_ids and checked:
-            selected_ids = set(self._password_widgets.keys())
+            selected_ids = set(model.entry_ids())
 
         if not selected_ids:
             if checked:
@@ -479,7 +360,7 @@ class MainWindow(QMainWindow):
                 self._act_toggle_passwords.blockSignals(False)
                 self._global_show_passwords = False
             else:
-                for eid in list(self._password_revealed.keys()):
+                for eid in model.revealed_ids():
                     self._toggle_password_cell(eid, show=False)
             return
 
@@ -487,7 +368,7 @@ class MainWindow(QMainWindow):
             self._toggle_password_cell(eid, show=self._global_show_passwords)
 
         if not self._global_show_passwords:
-            for eid in list(self._password_revealed.keys()):
+            for eid in model.revealed_ids():
                 self._toggle_password_cell(eid, show=False)
 
     def _on_context_menu(self, pos):
@@ -497,9 +378,7 @@ class MainWindow(QMainWindow):
             return
         row = idx.row()
         self._table.selectRow(row)
-        # берём id из ячейки "Название" (колонка 0)
-        item = self._table.item(row, 0)
-        entry_id = int(item.data(Qt.ItemDataRole.UserRole)) if item else None
+        entry_id = self._table.entry_id_at(row)
         if entry_id is None:
             return
 
@@ -681,9 +560,7 @@ class MainWindow(QMainWindow):
         sm = get_state_manager()
         self._status_label.setText(t("status_locked") if sm.is_locked() else t("status_unlocked"))
         self._buffer_label.setText(t("buffer_timer") % str(sm.get_clipboard_seconds_left()))
-        self._table.setHorizontalHeaderLabels(
-            [t("title"), t("login"), t("url"), t("last_modified"), t("notes"), t("password_field")]
-        )
+        self._table.set_header_labels()
 
     def _mask_preview(self, value: str) -> str:
         v = value or ""
@@ -710,6 +587,11 @@ class MainWindow(QMainWindow):
         self._clipboard_service.clear_if_active_data_replaced()
 
     def closeEvent(self, event):
+        try:
+            self._search_controller.shutdown()
+            self._index_cache.detach()
+        except Exception:
+            pass
         try:
             self._clipboard_monitor.stop()
             self._clipboard_service.clear(reason="app_close")
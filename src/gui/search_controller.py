@@ -0,0 +1,47 @@
+# поиск главного окна: нажатия клавиш копятся SEARCH_DEBOUNCE_MS, затем запрос уходит в SearchWorker
+# страницы результата приходят сигналом page_ready (queued connection — слот в GUI-потоке)
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from core.vault.search_worker import SearchPage, SearchWorker
+
+SEARCH_DEBOUNCE_MS = 150
+
+
+class SearchController(QObject):
+    page_ready = pyqtSignal(object)
+
+    def __init__(self, search_fn, debounce_ms: int = SEARCH_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self._worker = SearchWorker(search_fn)
+        self._query = ""
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(int(debounce_ms))
+        self._timer.timeout.connect(self._run)
+
+    def set_query(self, query: str):
+        # каждое нажатие перезапускает окно; страницы прежнего запроса с этого момента устарели
+        self._query = query
+        self._worker.cancel()
+        self._timer.start()
+
+    def run_now(self, query: str):
+        # без ожидания (перезагрузка списка с уже введённым запросом)
+        self._timer.stop()
+        self._query = query
+        self._worker.submit(query, self.page_ready.emit)
+
+    def cancel(self):
+        self._timer.stop()
+        self._worker.cancel()
+
+    def is_current(self, page: SearchPage) -> bool:
+        return self._worker.is_current(page.generation)
+
+    def shutdown(self):
+        self._timer.stop()
+        self._worker.shutdown()
+
+    def _run(self):
+        self._worker.submit(self._query, self.page_ready.emit)
@@ -11,6 +11,9 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 
 from core import config
+from core.crypto import kdf_params
+from core.crypto.kdf_worker import get_kdf_worker
+from .kdf_bridge import KdfBridge, make_progress_bar
 from .strings import t
 
 
@@ -74,8 +77,41 @@ class SettingsDialog(QDialog):
         w = QWidget()
         layout = QVBoxLayout(w)
         layout.addWidget(QLabel(t("backup_export")))
+        # (KEY-3) калибровка KDF по запросу: замер в фоне, результат сразу в key_store("params")
+        layout.addWidget(QLabel(t("encryption_settings")))
+        self._calibrate_btn = QPushButton(t("kdf_calibrate"))
+        self._calibrate_btn.clicked.connect(self._calibrate)
+        layout.addWidget(self._calibrate_btn)
+        self._kdf_progress = make_progress_bar(w)
+        layout.addWidget(self._kdf_progress)
+        self._kdf_label = QLabel()
+        self._kdf_label.setWordWrap(True)
+        layout.addWidget(self._kdf_label)
+        self._bridge = KdfBridge(self)
+        self._bridge.progress.connect(lambda _stage, fraction: self._kdf_progress.setValue(int(fraction * 100)))
+        self._bridge.finished.connect(self._on_calibrated)
+        layout.addStretch()
         return w
 
+    def _calibrate(self):
+        self._calibrate_btn.setEnabled(False)
+        self._kdf_progress.setValue(0)
+        self._kdf_progress.setVisible(True)
+        get_kdf_worker().calibrate(on_progress=self._bridge.on_progress, on_done=self._bridge.on_done)
+
+    def _on_calibrated(self, result):
+        self._calibrate_btn.setEnabled(True)
+        self._kdf_progress.setVisible(False)
+        if result.error is not None or result.params is None:
+            self._kdf_label.setText(t("error_generic"))
+            return
+        params = kdf_params.apply_calibration(result.params)
+        self._kdf_label.setText(t("kdf_calibrated") % (
+            params["argon2_time_cost"],
+            params["argon2_memory_mib"],
+            kdf_params.pbkdf2_iterations_for_new_key(params),
+        ))
+
     def _load(self):
         # при открытии диалога в поля подставляются текущие значения из config
         self._clipboard_spin.setValue(int(config.get(config.CLIPBOARD_TIMEOUT, "30") or "30"))
@@ -92,14 +128,16 @@ class SettingsDialog(QDialog):
         self._lang_combo.setCurrentIndex(0 if lang == "ru" else 1)
 
     def _apply(self):
-        # выбранные значения записываются в config, диалог закрывается
-        config.set(config.CLIPBOARD_TIMEOUT, str(self._clipboard_spin.value()))
-        config.set(config.CLIPBOARD_NOTIFICATIONS, "1" if self._notifications_checkbox.isChecked() else "0")
+        # выбранные значения записываются в config одной транзакцией, диалог закрывается
         level_map = {0: "basic", 1: "advanced", 2: "paranoid"}
-        config.set(config.CLIPBOARD_SECURITY_LEVEL, level_map[self._security_level.currentIndex()])
-        config.set(config.CLIPBOARD_APP_WHITELIST, (self._whitelist_edit.text() or "").strip())
-        config.set(config.AUTO_LOCK_MINUTES, str(self._autolock_spin.value()))
         theme_map = {0: "system", 1: "dark", 2: "light"}
-        config.set(config.THEME, theme_map[self._theme_combo.currentIndex()])
-        config.set(config.LANGUAGE, "ru" if self._lang_combo.currentIndex() == 0 else "en")
+        config.set_many({
+            config.CLIPBOARD_TIMEOUT: str(self._clipboard_spin.value()),
+            config.CLIPBOARD_NOTIFICATIONS: "1" if self._notifications_checkbox.isChecked() else "0",
+            config.CLIPBOARD_SECURITY_LEVEL: level_map[self._security_level.currentIndex()],
+            config.CLIPBOARD_APP_WHITELIST: (self._whitelist_edit.text() or "").strip(),
+            config.AUTO_LOCK_MINUTES: str(self._autolock_spin.value()),
+            config.THEME: theme_map[self._theme_combo.currentIndex()],
+            config.LANGUAGE: "ru" if self._lang_combo.currentIndex() == 0 else "en",
+        })
         self.accept()
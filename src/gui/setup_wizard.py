@@ -3,7 +3,6 @@
 
 import sys
 import os
-import json
 import secrets
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from PyQt6.QtWidgets import (
@@ -14,14 +13,13 @@ from PyQt6.QtCore import Qt
 
 from core import config
 from core.input_validation import MAX_MASTER_PASSWORD_LEN
-from core.crypto.key_derivation import (
-    hash_password_argon2,
-    PBKDF2_ITERATIONS,
-    PBKDF2_SALT_LEN,
-    PBKDF2_KEY_LEN,
-)
+from core.crypto import kdf_params
+from core.crypto.kdf_worker import get_kdf_worker
+from core.crypto.key_wrap import generate_dek
+from core.key_manager import wrapped_vault_key_item
 from core.crypto.authentication import validate_password_strength
 from database import db as database_db
+from .kdf_bridge import KdfBridge, make_progress_bar
 from .strings import t
 from .widgets.password_entry import PasswordEntry
 
@@ -49,21 +47,38 @@ class SetupWizard(QDialog):
         layout.addWidget(db_group)
         enc_group = QGroupBox(t("encryption_settings"))
         enc_layout = QVBoxLayout(enc_group)
-        enc_layout.addWidget(QLabel("Параметры ключа (заглушка):"))
+        # (KEY-3) параметры Argon2/PBKDF2 подбираются замером на этой машине под целевое время входа
+        self._target_ms = kdf_params.TARGET_UNLOCK_MS
+        self._target_label = QLabel()
+        enc_layout.addWidget(self._target_label)
         btn_row = QHBoxLayout()
-        for label in ["По умолчанию", "Высокая стойкость"]:
-            b = QPushButton(label)
-            b.clicked.connect(lambda checked, l=label: None)
+        for label, target_ms in [("kdf_target_default", kdf_params.TARGET_UNLOCK_MS), ("kdf_target_strong", 2 * kdf_params.TARGET_UNLOCK_MS)]:
+            b = QPushButton(t(label))
+            b.clicked.connect(lambda checked, ms=target_ms: self._set_target(ms))
             btn_row.addWidget(b)
         enc_layout.addLayout(btn_row)
+        self._set_target(self._target_ms)
         layout.addWidget(enc_group)
+        # хеш Argon2 считается в фоне (core.crypto.kdf_worker), окно не замирает
+        self._progress = make_progress_bar(self)
+        layout.addWidget(self._progress)
+        self._bridge = KdfBridge(self)
+        self._bridge.progress.connect(lambda _stage, fraction: self._progress.setValue(int(fraction * 100)))
+        self._bridge.finished.connect(self._on_kdf_finished)
+        self._pending_salt = None
+        self._pending_params = None
         btns = QHBoxLayout()
         btns.addStretch()
         ok_btn = QPushButton(t("ok"))
         ok_btn.clicked.connect(self._finish)
+        self._ok_btn = ok_btn
         btns.addWidget(ok_btn)
         layout.addLayout(btns)
 
+    def _set_target(self, target_ms):
+        self._target_ms = target_ms
+        self._target_label.setText(t("kdf_target_label") % target_ms)
+
     def _choose_db(self):
         # диалог «сохранить как» — пользователь выбирает путь к файлу vault.db, путь сохраняется в config
         path, _ = QFileDialog.getSaveFileName(self, t("db_location"), "", "Database (*.db)")
@@ -87,20 +102,52 @@ class SetupWizard(QDialog):
         if not ok:
             QMessageBox.warning(self, t("master_password"), msg)
             return
+        if self._pending_salt is not None:
+            return
         path = config.get(config.DB_PATH)
         database_db.set_db_path(path)
         database_db.init_db()
-        auth_hash = hash_password_argon2(pwd)
-        salt = secrets.token_bytes(16)
-        database_db.set_key_store("auth_hash", auth_hash.encode("utf-8"))
-        database_db.set_key_store("enc_salt", salt)
-        # (KEY-3, спринт2) параметры PBKDF2 храним в key_store с версионированием
-        pbkdf2_iterations = int(config.get("pbkdf2_iterations", PBKDF2_ITERATIONS))
-        params = {
-            "pbkdf2_iterations": pbkdf2_iterations,
-            "salt_len": PBKDF2_SALT_LEN,
-            "key_len": PBKDF2_KEY_LEN,
-            "version": 1,
-        }
-        database_db.set_key_store("params", json.dumps(params).encode("utf-8"))
+        self._pending_salt = secrets.token_bytes(16)
+        self._pending_params = None
+        self._ok_btn.setEnabled(False)
+        self._progress.setValue(0)
+        self._progress.setVisible(True)
+        # сначала замер KDF, затем хеш пароля уже с подобранными параметрами (_on_kdf_finished)
+        get_kdf_worker().calibrate(
+            self._target_ms,
+            on_progress=self._bridge.on_progress,
+            on_done=self._bridge.on_done,
+        )
+
+    def _on_kdf_finished(self, result):
+        if self._pending_salt is not None and self._pending_params is None and result.params is not None:
+            # калибровка готова: хеш пароля и ключ из пароля (им оборачивается новый ключ данных)
+            self._pending_params = result.params
+            self._progress.setValue(0)
+            get_kdf_worker().new_credentials(
+                self._pass.text().strip(),
+                self._pending_salt,
+                self._pending_params["pbkdf2_iterations"],
+                params=self._pending_params,
+                on_progress=self._bridge.on_progress,
+                on_done=self._bridge.on_done,
+            )
+            return
+        salt, self._pending_salt = self._pending_salt, None
+        params, self._pending_params = self._pending_params, None
+        self._ok_btn.setEnabled(True)
+        self._progress.setVisible(False)
+        if salt is None or not self.isVisible():
+            return
+        if result.error is not None or not result.auth_hash or not result.key or params is None:
+            QMessageBox.warning(self, t("master_password"), t("error_generic"))
+            return
+        # (KEY-3, спринт2) параметры KDF храним в key_store с версионированием (kdf_params, версия 2);
+        # записи будут шифроваться случайным ключом данных, обёрнутым ключом из пароля
+        database_db.set_key_store_many([
+            ("auth_hash", result.auth_hash.encode("utf-8"), 1),
+            ("enc_salt", salt, 1),
+            ("params", kdf_params.encode_params(params), kdf_params.KDF_PARAMS_VERSION),
+            wrapped_vault_key_item(result.key, generate_dek()),
+        ])
         self.accept()
@@ -20,6 +20,8 @@ STRINGS = {
         "theme": "Тема", "language": "Язык", "theme_system": "Системная", "theme_dark": "Тёмная", "theme_light": "Светлая",
         "master_password": "Мастер-пароль", "confirm_password": "Подтверждение",
         "db_location": "Расположение базы данных", "db_location_required": "Выберите расположение базы данных.", "encryption_settings": "Настройки шифрования",
+        "kdf_target_default": "По умолчанию", "kdf_target_strong": "Высокая стойкость", "kdf_target_label": "Параметры ключа подбираются под этот компьютер: вход ≈ %d мс",
+        "kdf_calibrate": "Подобрать параметры KDF", "kdf_calibrated": "Параметры подобраны: Argon2 t=%d, %d МиБ; PBKDF2 %d итераций. Новый хеш пароля — при следующем входе, новые итерации PBKDF2 — при смене пароля.",
         "backup_export": "Резервная копия и экспорт", "apply": "Применить", "cancel": "Отмена", "ok": "ОК",
         "about": "О программе", "about_text": "CryptoSafe Manager\nЛокальный менеджер паролей.", "enter_master_password": "Введите мастер-пароль:", "master_password_hint": "Мастер-пароль задаётся при первой настройке (мастер первого запуска), не путать с паролями записей в таблице.", "login_title": "Вход", "password_required": "Введите мастер-пароль. Поле не может быть пустым.", "setup_first": "Сначала выполните первичную настройку (мастер-пароль ещё не задан).", "wrong_password": "Неверный мастер-пароль.", "error_generic": "Произошла ошибка. Повторите действие.",
         "password_too_long": "Пароль слишком длинный.", "passwords_dont_match": "Пароли не совпадают.",
@@ -73,6 +75,7 @@ STRINGS = {
         "audit_integrity_fail": "Обнаружены нарушения: %s",
         "audit_integrity_error": "Не удалось проверить журнал",
         "audit_integrity_unknown": "Целостность: не проверялась",
+        "audit_integrity_checking": "Целостность: идёт проверка",
         "audit_col_time": "Время",
         "audit_col_event": "Событие",
         "audit_col_severity": "Уровень",
@@ -95,6 +98,8 @@ STRINGS = {
         "theme": "Theme", "language": "Language", "theme_system": "System", "theme_dark": "Dark", "theme_light": "Light",
         "master_password": "Master password", "confirm_password": "Confirm",
         "db_location": "Database location", "db_location_required": "Select database location.", "encryption_settings": "Encryption settings",
+        "kdf_target_default": "Default", "kdf_target_strong": "High strength", "kdf_target_label": "Key parameters are tuned for this computer: unlock ≈ %d ms",
+        "kdf_calibrate": "Calibrate KDF parameters", "kdf_calibrated": "Calibrated: Argon2 t=%d, %d MiB; PBKDF2 %d iterations. The password hash is updated at next login, PBKDF2 iterations at next password change.",
         "backup_export": "Backup and export", "apply": "Apply", "cancel": "Cancel", "ok": "OK",
         "about": "About", "about_text": "CryptoSafe Manager\nLocal password manager.", "enter_master_password": "Enter master password:", "master_password_hint": "Master password is set during first-run setup only; it is not the same as entry passwords in the table.", "login_title": "Login", "password_required": "Enter master password. The field cannot be empty.", "setup_first": "Complete initial setup first (master password not set).", "wrong_password": "Incorrect master password.", "error_generic": "An error occurred. Please try again.",
         "password_too_long": "Password is too long.", "passwords_dont_match": "Passwords do not match.",
@@ -148,6 +153,7 @@ STRINGS = {
         "audit_integrity_fail": "Violations found: %s",
         "audit_integrity_error": "Could not verify log",
         "audit_integrity_unknown": "Integrity: not checked",
+        "audit_integrity_checking": "Integrity: checking",
         "audit_col_time": "Time",
         "audit_col_event": "Event",
         "audit_col_severity": "Severity",
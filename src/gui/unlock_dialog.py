@@ -2,19 +2,22 @@
 
 import sys
 import os
-import time
-import json
+import threading
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QMessageBox
 from PyQt6.QtCore import Qt
 
 from core import config
 from core.input_validation import MAX_MASTER_PASSWORD_LEN
-from core.crypto.authentication import verify_password, record_login_success, record_login_failure, get_failed_attempt_count
-from core.crypto.key_derivation import derive_key_pbkdf2
+from core.crypto.authentication import record_login_success, record_login_failure, get_failed_attempt_count
+from core.crypto import kdf_params
+from core.crypto.kdf_worker import KdfResult, get_kdf_worker
+from core.crypto.key_derivation import argon2_needs_rehash
 from core.crypto import key_storage
+from core.key_manager import get_key_manager
 from core import events
 from database import db as database_db
+from .kdf_bridge import KdfBridge, make_progress_bar
 from .strings import t
 from .widgets.password_entry import PasswordEntry
 
@@ -30,11 +33,24 @@ class UnlockDialog(QDialog):
         layout.addWidget(QLabel(t("enter_master_password")))
         self._password = PasswordEntry(self)
         layout.addWidget(self._password)
+        # Argon2 + PBKDF2 идут в фоне (core.crypto.kdf_worker), окно остаётся отзывчивым
+        self._progress = make_progress_bar(self)
+        layout.addWidget(self._progress)
+        self._bridge = KdfBridge(self)
+        self._bridge.progress.connect(self._on_kdf_progress)
+        self._bridge.finished.connect(self._on_kdf_finished)
+        # перевод старого хранилища на ключ данных (перешифровка записей) — тоже в фоне
+        self._migrate_bridge = KdfBridge(self)
+        self._migrate_bridge.progress.connect(self._on_kdf_progress)
+        self._migrate_bridge.finished.connect(self._on_migrate_finished)
+        self._job = None
+        self._params = None
         btns = QHBoxLayout()
         btns.addStretch()
         ok_btn = QPushButton(t("ok"))
         ok_btn.setMinimumWidth(100)
         ok_btn.clicked.connect(self._on_ok)
+        self._ok_btn = ok_btn
         cancel_btn = QPushButton(t("cancel"))
         cancel_btn.setMinimumWidth(100)
         cancel_btn.clicked.connect(self.reject)
@@ -50,45 +66,119 @@ class UnlockDialog(QDialog):
         if len(pwd) > MAX_MASTER_PASSWORD_LEN:
             QMessageBox.warning(self, t("login_title"), t("password_too_long"))
             return
+        if self._job is not None:
+            return
         # спринт 2: экспоненциальная задержка при неудачных попытках (1–2: 1 сек, 3–4: 5 сек, 5+: 30 сек)
         n = get_failed_attempt_count()
-        if n >= 5:
-            time.sleep(30)
-        elif n >= 3:
-            time.sleep(5)
-        elif n >= 1:
-            time.sleep(1)
+        delay = 30 if n >= 5 else 5 if n >= 3 else 1 if n >= 1 else 0
         auth_blob = database_db.get_key_store("auth_hash")
         if not auth_blob:
             QMessageBox.warning(self, t("login_title"), t("setup_first"))
             return
         stored_hash = auth_blob.decode("utf-8")
-        if not verify_password(stored_hash, pwd):
-            record_login_failure()
-            QMessageBox.warning(self, t("login_title"), t("wrong_password"))
-            return
         salt_blob = database_db.get_key_store("enc_salt")
         if not salt_blob:
             QMessageBox.warning(self, t("login_title"), t("setup_first"))
             return
 
-        # (KEY-3, спринт2) итерации PBKDF2 читаем из key_store.params (если есть)
-        params_blob = database_db.get_key_store("params")
-        iterations = None
-        if params_blob:
+        # (KEY-3, спринт2) итерации PBKDF2 читаем из key_store.params (версия 1 дополняется дефолтами)
+        params = kdf_params.load_params()
+        self._params = params
+
+        self._set_busy(True)
+        self._job = get_kdf_worker().unlock(
+            pwd,
+            stored_hash,
+            salt_blob,
+            params["pbkdf2_iterations"],
+            delay=delay,
+            on_progress=self._bridge.on_progress,
+            on_done=self._bridge.on_done,
+        )
+
+    def _set_busy(self, busy):
+        self._ok_btn.setEnabled(not busy)
+        self._password.setEnabled(not busy)
+        self._progress.setValue(0)
+        self._progress.setVisible(busy)
+
+    def _on_kdf_progress(self, _stage, fraction):
+        self._progress.setValue(int(fraction * 100))
+
+    def _on_kdf_finished(self, result):
+        self._job = None
+        self._set_busy(False)
+        if not self.isVisible():
+            # окно закрыли, пока шёл вывод ключа — вход отменён
+            return
+        if result.error is not None:
+            QMessageBox.warning(self, t("login_title"), t("error_generic"))
+            return
+        if not result.ok:
+            record_login_failure()
+            QMessageBox.warning(self, t("login_title"), t("wrong_password"))
+            return
+        # ключ из пароля разворачивает ключ данных; в сессии живёт только он
+        if get_key_manager().needs_vault_key_migration():
+            self._start_migration(result.key)
+            return
+        try:
+            vault_key = get_key_manager().unwrap_vault_key(result.key)
+        except ValueError:
+            QMessageBox.warning(self, t("login_title"), t("error_generic"))
+            return
+        self._complete_login(vault_key)
+
+    def _start_migration(self, kek):
+        # один раз на хранилище: новый ключ данных и перешифровка всех записей (core.key_manager.migrate_vault_key)
+        bridge = self._migrate_bridge
+
+        def run():
             try:
-                params = json.loads(params_blob.decode("utf-8"))
-                iterations = params.get("pbkdf2_iterations")
-                if iterations is not None:
-                    iterations = int(iterations)
-            except Exception:
-                iterations = None
-
-        key = derive_key_pbkdf2(pwd, salt_blob, iterations=iterations)
-        key_storage.set_cached_key(key)
+                key = get_key_manager().unwrap_vault_key(
+                    kek, on_progress=lambda done, total: bridge.on_progress("rekey", done / total if total else 1.0)
+                )
+                out = KdfResult(ok=True, key=key)
+            except Exception as exc:
+                out = KdfResult(ok=False, error=exc)
+            bridge.on_done(out)
+
+        self._job = "migrate"
+        self._set_busy(True)
+        threading.Thread(target=run, name="vault-migrate", daemon=True).start()
+
+    def _on_migrate_finished(self, result):
+        self._job = None
+        self._set_busy(False)
+        if not self.isVisible():
+            return
+        if not result.ok:
+            QMessageBox.warning(self, t("login_title"), t("error_generic"))
+            return
+        self._complete_login(result.key)
+
+    def _complete_login(self, vault_key):
+        key_storage.set_cached_key(vault_key)
         record_login_success()
+        self._rehash_if_calibrated()
         events.publish(events.UserLoggedIn, sync=True)
         self.accept()
 
+    def _rehash_if_calibrated(self):
+        # после калибровки хеш Argon2 пересчитывается с новыми параметрами — пароль уже проверен,
+        # работа идёт в фоне и окно не задерживает
+        auth_blob = database_db.get_key_store("auth_hash")
+        if not auth_blob or not argon2_needs_rehash(auth_blob.decode("utf-8"), self._params):
+            return
+
+        def store(result):
+            # пароль могли успеть сменить — тогда старый хеш уже не наш
+            if result.ok and result.auth_hash and database_db.get_key_store("auth_hash") == auth_blob:
+                database_db.set_key_store("auth_hash", result.auth_hash.encode("utf-8"))
+
+        get_kdf_worker().new_credentials(
+            self._password.text().strip(), b"", derive_key=False, params=self._params, on_done=store
+        )
+
     def get_password(self):
         return self._password.text()
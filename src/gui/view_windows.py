@@ -3,6 +3,7 @@
 import json
 import sys
 import os
+import threading
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -13,10 +14,12 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import QTimer, Qt
 
 from core.state_manager import get_state_manager
-from core.audit.integrity import verify_integrity
+from core.audit import flush as flush_audit
+from core.audit.integrity import verify_events, verify_integrity
 from core.audit.log_formatters import format_csv, format_json_lines
 from core.audit.log_verifier import summarize_entry
 from database import db
+from .kdf_bridge import KdfBridge, make_progress_bar
 from .strings import t
 
 
@@ -72,14 +75,21 @@ class AuditLogViewer(QWidget):
         self._filter.currentIndexChanged.connect(self._reload)
         bar.addWidget(QLabel(t("audit_filter_label")))
         bar.addWidget(self._filter)
-        btn_verify = QPushButton(t("audit_verify"))
-        btn_verify.clicked.connect(self._on_verify)
-        bar.addWidget(btn_verify)
+        self._btn_verify = QPushButton(t("audit_verify"))
+        # кнопка — выделенные строки по доказательствам Меркла, без выделения — полная перепроверка
+        # (в фоне, с прогрессом); при открытии окна — только новые строки
+        self._btn_verify.clicked.connect(self._on_verify_clicked)
+        bar.addWidget(self._btn_verify)
         btn_export = QPushButton(t("audit_export_json"))
         btn_export.clicked.connect(self._on_export)
         bar.addWidget(btn_export)
         bar.addStretch()
         layout.addLayout(bar)
+        self._progress = make_progress_bar(self)
+        layout.addWidget(self._progress)
+        self._verify_bridge = KdfBridge(self)
+        self._verify_bridge.progress.connect(self._on_verify_progress)
+        self._verify_bridge.finished.connect(self._on_full_verify_finished)
 
         self._table = QTableWidget(0, 5)
         self._table.setHorizontalHeaderLabels(
@@ -95,21 +105,71 @@ class AuditLogViewer(QWidget):
         self._on_verify()
 
     def _reload(self):
+        # события из очереди писателя дописываются, чтобы журнал показывал последние действия
+        flush_audit()
         event_type = self._filter.currentData()
         rows = db.list_audit_logs(limit=500, event_type=event_type or None)
         self._table.setRowCount(len(rows))
         for i, row in enumerate(rows):
             summary = summarize_entry(row)
-            self._table.setItem(i, 0, QTableWidgetItem(summary["timestamp"]))
+            ts_item = QTableWidgetItem(summary["timestamp"])
+            ts_item.setData(Qt.ItemDataRole.UserRole, row.get("sequence_number"))
+            self._table.setItem(i, 0, ts_item)
             self._table.setItem(i, 1, QTableWidgetItem(summary["event_type"]))
             self._table.setItem(i, 2, QTableWidgetItem(summary["severity"]))
             self._table.setItem(i, 3, QTableWidgetItem(summary["details"]))
             eid = row.get("entry_id")
             self._table.setItem(i, 4, QTableWidgetItem("" if eid is None else str(eid)))
 
-    def _on_verify(self):
+    def _on_verify_clicked(self):
+        sequences = set()
+        for index in self._table.selectionModel().selectedRows(0):
+            seq = self._table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole)
+            if seq is not None:
+                sequences.add(int(seq))
+        if not sequences:
+            self._start_full_verify()
+            return
+        self._show_result(lambda: verify_events(sequences))
+
+    def _on_verify(self, full=False):
+        self._show_result(lambda: verify_integrity(sample_limit=1000, full=full))
+
+    def _start_full_verify(self):
+        # полная перепроверка идёт по всему журналу — в фоновом потоке, окно не замирает
+        bridge = self._verify_bridge
+
+        def run():
+            try:
+                result = verify_integrity(
+                    full=True,
+                    parallel=True,
+                    on_progress=lambda done, total: bridge.on_progress("verify", done / total if total else 1.0),
+                )
+            except Exception:
+                result = None
+            bridge.on_done(result)
+
+        self._set_verifying(True)
+        threading.Thread(target=run, name="audit-verify", daemon=True).start()
+
+    def _set_verifying(self, busy):
+        self._btn_verify.setEnabled(not busy)
+        self._progress.setValue(0)
+        self._progress.setVisible(busy)
+        if busy:
+            self._integrity_label.setText(t("audit_integrity_checking"))
+
+    def _on_verify_progress(self, _stage, fraction):
+        self._progress.setValue(int(min(fraction, 1.0) * 100))
+
+    def _on_full_verify_finished(self, result):
+        self._set_verifying(False)
+        self._show_result(lambda: result)
+
+    def _show_result(self, check):
         try:
-            result = verify_integrity(sample_limit=1000)
+            result = check()
             if result.get("verified"):
                 self._integrity_label.setText(
                     t("audit_integrity_ok") % (result.get("valid_entries", 0), result.get("checked", 0))
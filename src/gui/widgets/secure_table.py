@@ -1,35 +1,242 @@
-# таблица записей хранилища: колонки название, логин, url, заметки (пароль в таблице не показывается)
+# таблица записей хранилища: колонки название, логин, url, изменено, заметки, пароль (маска / раскрытый)
 # выбор по строкам, редактирование через диалог добавления/редактирования
+# model/view: модель держит ссылки на строки кэша списка (VaultIndexCache) и отдаёт текст ячейки
+# только по запросу видимой строки; на строку не создаётся ни одного Qt-объекта, кнопка «глаз»
+# рисуется делегатом — память и время заполнения не зависят от размера хранилища
+
+from typing import Any, Dict, List, Optional
+
+from PyQt6.QtCore import QAbstractTableModel, QEvent, QModelIndex, QRect, Qt, pyqtSignal
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QApplication, QHeaderView, QStyle, QStyledItemDelegate, QStyleOptionButton, QStyleOptionViewItem,
+    QTableView,
+)
 
-from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
-from PyQt6.QtCore import Qt
 from ..strings import t
 
+MASKED_PASSWORD = "••••••••"
+PASSWORD_COLUMN = 5
+# ключи строки списка по колонкам; колонка пароля берётся из раскрытых паролей модели,
+# заметки — превью (полный текст строки нужен только поиску)
+COLUMN_KEYS = ("title", "username_masked", "url_domain", "updated_at", "notes_preview", None)
+EYE_BUTTON_WIDTH = 72
+
 
-class SecureTable(QTableWidget):
+def _header_labels() -> List[str]:
+    return [t("title"), t("login"), t("url"), t("last_modified"), t("notes"), t("password_field")]
+
+
+class VaultTableModel(QAbstractTableModel):
     def __init__(self, parent=None):
         super().__init__(parent)
-        # (спринт3) таблица: название, логин (маска), URL/domain, last modified, заметки, пароль
-        self.setColumnCount(6)
-        self.setHorizontalHeaderLabels(
-            [t("title"), t("login"), t("url"), t("last_modified"), t("notes"), t("password_field")]
+        self._rows: List[Dict[str, Any]] = []
+        self._headers = _header_labels()
+        # entry_id -> plaintext пароля, пока он раскрыт (SEC-1: только на время показа)
+        self._revealed: Dict[int, str] = {}
+        # entry_id -> номер строки; строится по требованию (раскрытие пароля), сбрасывается при смене строк
+        self._row_by_id: Optional[Dict[int, int]] = None
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMN_KEYS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return int(row["id"])
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            key = COLUMN_KEYS[index.column()]
+            if key is None:
+                return self._revealed.get(int(row["id"]), MASKED_PASSWORD)
+            return str(row.get(key, "") or "")
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self._headers[section] if 0 <= section < len(self._headers) else None
+        return super().headerData(section, orientation, role)
+
+    def set_header_labels(self, labels: List[str]):
+        self._headers = list(labels)
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self._headers) - 1)
+
+    def set_rows(self, rows: List[Dict[str, Any]]):
+        # новый набор строк: раскрытые пароли скрываются (как при перерисовке прежней таблицы)
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._revealed = {}
+        self._row_by_id = None
+        self._sort_rows()
+        self.endResetModel()
+
+    def append_rows(self, rows: List[Dict[str, Any]]):
+        # следующая страница результатов поиска
+        if not rows:
+            return
+        if self._sort_column >= 0:
+            self.layoutAboutToBeChanged.emit()
+            self._rows.extend(rows)
+            self._row_by_id = None
+            self._sort_rows()
+            self.layoutChanged.emit()
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        if self._row_by_id is not None:
+            self._row_by_id.update((int(r["id"]), i) for i, r in enumerate(rows, start))
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        # (GUI-1) сортировка по колонке; -1 — порядок списка / ранг поиска
+        if column == PASSWORD_COLUMN:
+            return
+        self.layoutAboutToBeChanged.emit()
+        self._sort_column = column
+        self._sort_order = order
+        self._sort_rows()
+        self._row_by_id = None
+        self.layoutChanged.emit()
+
+    def _sort_rows(self):
+        if not 0 <= self._sort_column < len(COLUMN_KEYS) or COLUMN_KEYS[self._sort_column] is None:
+            return
+        key = COLUMN_KEYS[self._sort_column]
+        self._rows.sort(
+            key=lambda r: str(r.get(key, "") or "").lower(),
+            reverse=self._sort_order == Qt.SortOrder.DescendingOrder,
         )
+
+    def entry_id_at(self, row: int) -> Optional[int]:
+        if 0 <= row < len(self._rows):
+            return int(self._rows[row]["id"])
+        return None
+
+    def entry_ids(self) -> List[int]:
+        return [int(r["id"]) for r in self._rows]
+
+    def row_of(self, entry_id: int) -> int:
+        if self._row_by_id is None:
+            self._row_by_id = {int(r["id"]): i for i, r in enumerate(self._rows)}
+        return self._row_by_id.get(int(entry_id), -1)
+
+    def revealed_ids(self) -> List[int]:
+        return list(self._revealed)
+
+    def is_revealed(self, entry_id: int) -> bool:
+        return int(entry_id) in self._revealed
+
+    def set_revealed(self, entry_id: int, password: Optional[str]):
+        # password=None — скрыть: ссылка на plaintext отпускается сразу
+        entry_id = int(entry_id)
+        if password is None:
+            self._revealed.pop(entry_id, None)
+        else:
+            self._revealed[entry_id] = password
+        row = self.row_of(entry_id)
+        if row >= 0:
+            idx = self.index(row, PASSWORD_COLUMN)
+            self.dataChanged.emit(idx, idx)
+
+
+class EyeDelegate(QStyledItemDelegate):
+    # GUI-3: ячейка пароля — текст (маска или пароль) и кнопка-глаз, нарисованная стилем
+    clicked = pyqtSignal(int)
+
+    def _button_rect(self, rect: QRect) -> QRect:
+        width = min(EYE_BUTTON_WIDTH, rect.width())
+        return QRect(rect.right() - width + 1, rect.top() + 1, width, rect.height() - 2)
+
+    def paint(self, painter, option, index):
+        button = self._button_rect(option.rect)
+        text_option = QStyleOptionViewItem(option)
+        self.initStyleOption(text_option, index)
+        text_option.rect = QRect(option.rect.left(), option.rect.top(), option.rect.width() - button.width(),
+                                 option.rect.height())
+        widget = option.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, text_option, painter, widget)
+
+        revealed = index.model().is_revealed(index.data(Qt.ItemDataRole.UserRole))
+        opt = QStyleOptionButton()
+        opt.rect = button
+        opt.text = t("password_hide") if revealed else t("password_show")
+        opt.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+        style.drawControl(QStyle.ControlElement.CE_PushButton, opt, painter, widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            if self._button_rect(option.rect).contains(event.position().toPoint()):
+                self.clicked.emit(int(index.data(Qt.ItemDataRole.UserRole)))
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+class SecureTable(QTableView):
+    eye_clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # (спринт3) таблица: название, логин (маска), URL/domain, last modified, заметки, пароль
+        self._model = VaultTableModel(self)
+        self.setModel(self._model)
+        self._eye = EyeDelegate(self)
+        self._eye.clicked.connect(self.eye_clicked)
+        self.setItemDelegateForColumn(PASSWORD_COLUMN, self._eye)
         self.horizontalHeader().setStretchLastSection(True)
         self.horizontalHeader().setSectionsMovable(True)  # (GUI-2)
         self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)  # (GUI-2)
+        # строки одной высоты: видимая область считается без опроса каждой строки
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        # без индикатора сортировки строки идут в порядке списка / ранга поиска
+        self.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
         self.setSortingEnabled(True)  # (GUI-1)
-        self.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)  # (GUI-2)
-        self.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+
+    def vault_model(self) -> VaultTableModel:
+        return self._model
+
+    def set_rows(self, rows: List[Dict[str, Any]]):
+        self._model.set_rows(rows)
+
+    def append_rows(self, rows: List[Dict[str, Any]]):
+        self._model.append_rows(rows)
+
+    def rowCount(self) -> int:
+        return self._model.rowCount()
+
+    def entry_id_at(self, row: int) -> Optional[int]:
+        return self._model.entry_id_at(row)
+
+    def current_entry_id(self) -> Optional[int]:
+        idx = self.currentIndex()
+        return self._model.entry_id_at(idx.row()) if idx.isValid() else None
+
+    def selected_entry_ids(self) -> List[int]:
+        sm = self.selectionModel()
+        if sm is None:
+            return []
+        return [eid for eid in (self._model.entry_id_at(i.row()) for i in sm.selectedRows()) if eid is not None]
+
+    def set_header_labels(self, labels: Optional[List[str]] = None):
+        self._model.set_header_labels(labels or _header_labels())
 
     def set_placeholder_data(self, rows=None):
         # таблица заполняется тестовыми строками (для демо или когда записей ещё нет)
         if rows is None:
             rows = [
-                ("Пример 1", "user1", "example.com", "—", "Заметка", "••••••••"),
-                ("Пример 2", "user2", "site.ru", "—", "", "••••••••"),
+                ("Пример 1", "user1", "example.com", "—", "Заметка", MASKED_PASSWORD),
+                ("Пример 2", "user2", "site.ru", "—", "", MASKED_PASSWORD),
             ]
-        self.setRowCount(len(rows))
-        for i, row in enumerate(rows):
-            for j, cell in enumerate(row):
-                self.setItem(i, j, QTableWidgetItem(str(cell)))
+        self._model.set_rows([
+            dict(zip(COLUMN_KEYS[:5], row[:5]), id=-(i + 1))
+            for i, row in enumerate(rows)
+        ])
@@ -1,8 +1,10 @@
 # точка входа: создаётся приложение, применяется тема, инициализируются бд и аудит
 # при первом запуске показывается мастер настройки, затем окно ввода пароля, затем главное окно
 
+import logging
 import sys
 import os
+import threading
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -11,18 +13,40 @@ from PyQt6.QtWidgets import QApplication, QMessageBox
 from core import config
 from core import events
 from core.audit import register as register_audit
+from core.audit import shutdown as shutdown_audit
 from core.audit import verify_integrity
 from database import db as database_db
+from gui.kdf_bridge import KdfBridge
 from gui.theme import apply_theme
 from gui.main_window import MainWindow
 from gui.setup_wizard import SetupWizard
 from gui.unlock_dialog import UnlockDialog
 
+_log = logging.getLogger(__name__)
+
+
+def _first_full_audit_check(bridge):
+    try:
+        result = verify_integrity()
+    except Exception:
+        _log.warning("Первая полная проверка журнала аудита не выполнена", exc_info=True)
+        return
+    bridge.on_done(result)
+
 
 def main():
     app = QApplication(sys.argv)
     app.setApplicationName("CryptoSafe Manager")
     apply_theme(app)
+    # WAL + пул читателей: чтения не ждут записи; "serial" — прежний режим с одним коннектом
+    pool_mode = config.get(config.DB_POOL_MODE, database_db.POOL_MODE_WAL) or database_db.POOL_MODE_WAL
+    readers = config.get(config.DB_READER_POOL_SIZE, "4") or "4"
+    try:
+        database_db.set_pool_mode(pool_mode, readers=int(readers))
+    except ValueError:
+        # опечатка в конфиге не должна мешать запуску — берётся режим по умолчанию
+        _log.warning("неверные настройки пула бд (%r, readers=%r), используется wal", pool_mode, readers)
+        database_db.set_pool_mode(database_db.POOL_MODE_WAL)
     database_db.set_db_path(config.get(config.DB_PATH))
     database_db.init_db()
     register_audit()
@@ -42,15 +66,26 @@ def main():
 
     # UserLoggedIn уже публикуется в unlock_dialog после успешного входа (спринт 2)
 
-    try:
-        audit_check = verify_integrity(sample_limit=1000)
-        if not audit_check.get("verified") and "pytest" not in sys.modules:
+    def warn_if_tampered(audit_check):
+        if audit_check is not None and not audit_check.get("verified") and "pytest" not in sys.modules:
             from gui.strings import t
             QMessageBox.warning(
                 None,
                 t("audit_tamper_title"),
                 t("audit_tamper_message"),
             )
+
+    audit_bridge = KdfBridge(app)
+    audit_bridge.finished.connect(warn_if_tampered)
+    try:
+        # инкрементально от подписанной контрольной точки: стоимость зависит от числа новых событий;
+        # пока точки нет — окно последних 1000 строк, главное окно не ждёт проверки всего журнала
+        audit_check = verify_integrity(sample_limit=1000)
+        warn_if_tampered(audit_check)
+        if audit_check.get("verified") and audit_check.get("mode") == "sample":
+            # первая полная проверка идёт в фоне и создаёт точку; разрыв показывается тем же предупреждением
+            threading.Thread(target=_first_full_audit_check, args=(audit_bridge,), name="audit-first-check",
+                             daemon=True).start()
     except Exception:
         pass
 
@@ -62,6 +97,8 @@ def main():
         from core.key_manager import clear_encryption_key
         clear_encryption_key()
         events.publish(events.UserLoggedOut, sync=True)
+        # очередь аудита дописывается до выхода — цепочка не теряется
+        shutdown_audit()
         events.shutdown()
     app.aboutToQuit.connect(on_quit)
 
@@ -1,6 +1,11 @@
 # тесты конфига
 
+import os
+import sqlite3
+import tempfile
 import unittest
+from unittest.mock import patch
+
 from core import config
 
 
@@ -12,3 +17,41 @@ class TestConfig(unittest.TestCase):
     def test_unknown_key_none(self):
         # если ключа нет и default=None, возвращается None (чтобы отличать «нет значения» от пустой строки)
         self.assertIsNone(config.get("_nonexistent_", None))
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        fd, self._path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self._patch = patch("core.config._config_path", return_value=self._path)
+        self._patch.start()
+        config.refresh()
+
+    def tearDown(self):
+        self._patch.stop()
+        config.refresh()
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+
+    def test_set_many_write_through(self):
+        # set_many — одна транзакция; чтения идут из словаря и видят запись сразу
+        config.set_many({config.THEME: "dark", config.AUTO_LOCK_MINUTES: 5})
+        self.assertEqual(config.get(config.THEME), "dark")
+        self.assertEqual(config.get(config.AUTO_LOCK_MINUTES), "5")
+        with patch("core.config._connect", side_effect=AssertionError("get не должен открывать файл")):
+            for _ in range(100):
+                config.get(config.THEME)
+        conn = sqlite3.connect(self._path)
+        rows = dict(conn.execute("SELECT key, value FROM settings").fetchall())
+        conn.close()
+        self.assertEqual(rows[config.THEME], "dark")
+
+    def test_external_change_detected(self):
+        # запись другим соединением замечается по PRAGMA data_version
+        config.set(config.THEME, "light")
+        conn = sqlite3.connect(self._path)
+        conn.execute("UPDATE settings SET value = 'dark' WHERE key = ?", (config.THEME,))
+        conn.commit()
+        conn.close()
+        with patch("core.config._EXTERNAL_CHECK_INTERVAL", 0.0):
+            self.assertEqual(config.get(config.THEME), "dark")
@@ -2,6 +2,7 @@
 
 import os
 import tempfile
+import threading
 import unittest
 import database.db as db
 import database.models as models
@@ -77,6 +78,34 @@ class TestDatabase(unittest.TestCase):
         db.delete_vault_entry(row_id)
         self.assertIsNone(db.get_vault_entry(row_id))
 
+    def test_bulk_insert_update_delete(self):
+        # пакетные операции: одна транзакция, insert возвращает id в порядке входных данных
+        ids = db.insert_vault_entries_bulk([(b"b%d" % i, "t", None) for i in range(1200)])
+        self.assertEqual(len(ids), 1200)
+        self.assertEqual(db.get_vault_entry(ids[5])[1], b"b5")
+        updated = db.update_vault_entries_bulk([(ids[0], b"new0", "t2", b"meta"), (ids[1], b"new1", "", None)])
+        self.assertEqual(updated, 2)
+        self.assertEqual(db.get_vault_entry(ids[0])[1], b"new0")
+        self.assertEqual(len(db.get_vault_entries_by_ids(ids)), 1200)
+        self.assertEqual(db.delete_vault_entries_bulk(ids[:1000]), 1000)
+        self.assertEqual(len(db.get_all_vault_entries()), 200)
+        self.assertEqual(db.insert_vault_entries_bulk([]), [])
+
+    def test_iter_vault_and_audit_pages(self):
+        # keyset-обход отдаёт все строки по порядку, в том числе через границу страниц и после удаления
+        ids = db.insert_vault_entries_bulk([(b"i%d" % i, "", None) for i in range(25)])
+        db.delete_vault_entries_bulk(ids[10:12])
+        rows = list(db.iter_vault_entries(batch_size=10))
+        self.assertEqual([r[0] for r in rows], [i for i in ids if i not in ids[10:12]])
+        self.assertEqual(len(list(db.iter_vault_entries_meta(batch_size=7))), 23)
+        for i in range(12):
+            db.insert_audit_log("Act" if i % 3 else "Other", entry_id=i)
+        seqs = [r["sequence_number"] for r in db.iter_audit_logs(batch_size=5)]
+        self.assertEqual(seqs, sorted(seqs))
+        self.assertEqual(len(seqs), 12)
+        self.assertEqual(len(list(db.iter_audit_logs(batch_size=2, event_type="Other"))), 4)
+        self.assertEqual(len(list(db.iter_audit_logs(after_sequence=seqs[8]))), 3)
+
     def test_audit_log(self):
         # insert_audit_log пишет в таблицу audit_log; действие и details читаются обратно
         db.insert_audit_log("Act", entry_id=1, details="d")
@@ -87,3 +116,91 @@ class TestDatabase(unittest.TestCase):
         conn.close()
         self.assertEqual(row[0], "Act")
         self.assertEqual(row[1], "d")
+
+
+    def test_migration_v4_adds_meta_column(self):
+        # база версии 4 (без meta_data) после init_db получает колонку и актуальную версию схемы
+        conn = db.get_connection()
+        cur = conn.cursor()
+        cur.execute("DROP TABLE vault_entries")
+        cur.execute(
+            "CREATE TABLE vault_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, encrypted_data BLOB, "
+            "created_at TEXT, updated_at TEXT, tags TEXT)"
+        )
+        cur.execute("INSERT INTO vault_entries (encrypted_data, tags) VALUES (?, ?)", (b"legacy", ""))
+        cur.execute("PRAGMA user_version = 4")
+        conn.commit()
+        conn.close()
+        db.set_db_path(self._db_path)
+        db.init_db()
+        rows = db.get_all_vault_entries_meta()
+        self.assertEqual(len(rows), 1)
+        self.assertIsNone(rows[0][1])
+        self.assertEqual(rows[0][2], b"legacy")
+        conn = db.get_connection()
+        cur = conn.cursor()
+        cur.execute("PRAGMA user_version")
+        self.assertEqual(cur.fetchone()[0], models.SCHEMA_VERSION)
+        conn.close()
+
+
+class TestDatabaseWalPool(unittest.TestCase):
+    def setUp(self):
+        fd, self._db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        db.set_pool_mode(db.POOL_MODE_WAL, readers=3)
+        db.set_db_path(self._db_path)
+        db.init_db()
+
+    def tearDown(self):
+        db.set_db_path(None)
+        db.set_pool_mode(db.POOL_MODE_SERIAL)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self._db_path + suffix):
+                try:
+                    os.unlink(self._db_path + suffix)
+                except OSError:
+                    pass
+
+    def test_wal_pragmas(self):
+        conn = db.get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0].lower(), "wal")
+        conn.close()
+        self.assertEqual(db.get_pool_mode(), db.POOL_MODE_WAL)
+        with self.assertRaises(ValueError):
+            db.set_pool_mode("parallel")
+
+    def test_crud_in_wal_mode(self):
+        row_id = db.insert_vault_entry(b"w1", tags="t")
+        self.assertEqual(db.get_vault_entry(row_id)[1], b"w1")
+        db.update_vault_entry(row_id, encrypted_data=b"w2", tags="t")
+        self.assertEqual(db.get_all_vault_entries()[0][1], b"w2")
+        db.delete_vault_entry(row_id)
+        self.assertIsNone(db.get_vault_entry(row_id))
+
+    def test_writes_share_one_writer_connection(self):
+        # в WAL писатель один: все записи идут через выделенный коннект, пул писателей не растёт
+        db.insert_vault_entry(b"a", tags="")
+        writer = db._writer_conn
+        self.assertIsNotNone(writer)
+        db.insert_vault_entries_bulk([(b"b", "", None), (b"c", "", None)])
+        db.delete_vault_entry(1)
+        self.assertIs(db._writer_conn, writer)
+        self.assertEqual(db._pool_total, 0)
+        db.set_db_path(self._db_path)
+        self.assertIsNone(db._writer_conn)
+
+    def test_reads_do_not_wait_for_writer_lock(self):
+        # пока писатель держит _lock, чтение из пула читателей всё равно выполняется
+        row_id = db.insert_vault_entry(b"r", tags="")
+        done = threading.Event()
+
+        def reader():
+            db.get_vault_entry(row_id)
+            done.set()
+
+        with db._lock:
+            t = threading.Thread(target=reader)
+            t.start()
+            self.assertTrue(done.wait(5.0), "чтение заблокировано писателем")
+        t.join()
@@ -45,6 +45,34 @@ class TestGUI(unittest.TestCase):
         self.assertGreater(height, 0)
         win.close()
 
+    def test_secure_table_model(self):
+        # таблица — model/view: строки кэша не копируются в Qt-объекты, пароль раскрывается в одной ячейке
+        app = QApplication.instance() or QApplication(sys.argv)
+        from PyQt6.QtCore import Qt
+        from gui.widgets.secure_table import MASKED_PASSWORD, PASSWORD_COLUMN, SecureTable
+        table = SecureTable()
+        rows = [{"id": i, "title": f"T{i}", "username_masked": "u••••", "url_domain": "a.org", "notes_preview": ""}
+                for i in range(1, 20001)]
+        table.set_rows(rows)
+        model = table.vault_model()
+        self.assertEqual(table.rowCount(), 20000)
+        self.assertEqual(model.index(19999, 0).data(), "T20000")
+        self.assertEqual(model.index(5, 0).data(Qt.ItemDataRole.UserRole), 6)
+        self.assertEqual(model.index(5, PASSWORD_COLUMN).data(), MASKED_PASSWORD)
+
+        changed = []
+        model.dataChanged.connect(lambda a, b: changed.append((a.row(), a.column())))
+        model.set_revealed(6, "secret")
+        self.assertEqual(model.index(5, PASSWORD_COLUMN).data(), "secret")
+        self.assertEqual(changed, [(5, PASSWORD_COLUMN)])
+        # новая выборка скрывает раскрытые пароли; следующая страница дописывается в конец
+        table.set_rows(rows[:10])
+        self.assertEqual(model.revealed_ids(), [])
+        table.append_rows(rows[10:15])
+        self.assertEqual(model.entry_ids(), list(range(1, 16)))
+        table.sortByColumn(0, Qt.SortOrder.DescendingOrder)
+        self.assertEqual(table.entry_id_at(0), 9)
+
     def test_setup_wizard(self):
         # диалог первого запуска создаётся и закрывается без падения (проверка что форма открывается)
         app = QApplication.instance() or QApplication(sys.argv)
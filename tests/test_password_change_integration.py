@@ -3,13 +3,19 @@
 
 import os
 import secrets
+import sqlite3
 import tempfile
 import unittest
+from unittest.mock import patch
 
 import database.db as db
+from core.audit import audit_logger, merkle
+from core.audit.integrity import verify_event, verify_integrity
 from core.crypto.key_derivation import hash_password_argon2, derive_key_pbkdf2
-from core.crypto import key_storage
+from core.crypto import key_storage, key_wrap
+from core.key_manager import unwrap_vault_key, wrapped_vault_key_item
 from core.vault.encryption_service import EncryptionServiceAESGCM
+from core.vault.rekey import VaultRekeyer
 
 
 try:
@@ -96,3 +102,135 @@ class TestPasswordChangeIntegration(unittest.TestCase):
             enc_blob = r[1]
             dec = cipher_b.decrypt_entry_payload(enc_blob)
             self.assertEqual(dec.get("password"), plain_passwords[idx])
+
+    def _fill(self, key, count):
+        cipher = EncryptionServiceAESGCM(_FakeKeyManager(key))
+        items = []
+        for i in range(count):
+            payload = {"title": "T%d" % i, "password": "secret_%d" % i, "version": 1}
+            meta = cipher.encrypt_entry_payload({"title": "T%d" % i}).encrypted_blob
+            items.append((cipher.encrypt_entry_payload(payload).encrypted_blob, "tag%d" % i, meta))
+        return db.insert_vault_entries_bulk(items)
+
+    def test_rekey_engine_swaps_table_and_key_store(self):
+        key_a, key_b = secrets.token_bytes(32), secrets.token_bytes(32)
+        db.set_key_store("enc_salt", b"old-salt")
+        ids = self._fill(key_a, 25)
+        db.delete_vault_entry(ids[-1])
+        progress = []
+        result = VaultRekeyer(
+            db, key_a, key_b, [("enc_salt", b"new-salt", 1), ("auth_hash", b"new-hash", 1)], batch_size=10, workers=3
+        ).run(on_progress=lambda done, total: progress.append((done, total)))
+        self.assertTrue(result["ok"], result)
+        self.assertEqual(progress[-1], (24, 24))
+        self.assertEqual(db.get_key_store("enc_salt"), b"new-salt")
+        self.assertEqual(db.get_key_store("auth_hash"), b"new-hash")
+
+        cipher_b = EncryptionServiceAESGCM(_FakeKeyManager(key_b))
+        rows = db.get_all_vault_entries()
+        self.assertEqual([r[0] for r in rows], ids[:-1])
+        for i, r in enumerate(rows):
+            self.assertEqual(cipher_b.decrypt_entry_payload(r[1])["password"], "secret_%d" % i)
+            self.assertEqual(r[4], "tag%d" % i)
+        self.assertEqual(cipher_b.decrypt_entry_payload(db.get_vault_entry_meta(ids[0])[1])["title"], "T0")
+        # id удалённой записи не выдаётся повторно и после подмены таблицы
+        self.assertGreater(db.insert_vault_entry(b"x" * 40), ids[-1])
+
+    def test_rekey_empty_vault_keeps_autoincrement(self):
+        # все записи удалены: тень пустая, в её sqlite_sequence строки нет — счётчик id переносится явно
+        key_a, key_b = secrets.token_bytes(32), secrets.token_bytes(32)
+        ids = self._fill(key_a, 3)
+        for eid in ids:
+            db.delete_vault_entry(eid)
+        result = VaultRekeyer(db, key_a, key_b, [("enc_salt", b"new-salt", 1)]).run()
+        self.assertTrue(result["ok"], result)
+        self.assertGreater(db.insert_vault_entry(b"x" * 40), ids[-1])
+
+    def test_rekey_cancel_or_concurrent_write_keeps_old_state(self):
+        key_a, key_b = secrets.token_bytes(32), secrets.token_bytes(32)
+        db.set_key_store("enc_salt", b"old-salt")
+        self._fill(key_a, 5)
+        before = db.get_all_vault_entries()
+
+        rekeyer = VaultRekeyer(db, key_a, key_b, [("enc_salt", b"new-salt", 1)])
+        rekeyer.cancel()
+        self.assertTrue(rekeyer.run()["cancelled"])
+
+        # запись, изменённая во время перешифровки, не должна пропасть при подмене
+        result = VaultRekeyer(db, key_a, key_b, [("enc_salt", b"new-salt", 1)], batch_size=2).run(
+            on_progress=lambda done, total: done == 2 and db.update_vault_entry(before[0][0], before[0][1])
+        )
+        self.assertFalse(result["ok"])
+        self.assertIsNotNone(result["error"])
+        self.assertEqual(db.get_key_store("enc_salt"), b"old-salt")
+        self.assertEqual([r[1] for r in db.get_all_vault_entries()], [r[1] for r in before])
+
+    def test_dek_password_change_is_rewrap_only(self):
+        # ключ данных переживает смену пароля: записи не перезаписываются, меняется только wrapped_dek
+        kek_a, kek_b = secrets.token_bytes(32), secrets.token_bytes(32)
+        dek = key_wrap.generate_dek()
+        db.set_key_store_many([wrapped_vault_key_item(kek_a, dek)])
+        self.assertEqual(unwrap_vault_key(kek_a), dek)
+        self._fill(dek, 5)
+        before = db.get_all_vault_entries()
+
+        db.set_key_store_many([("enc_salt", b"new-salt", 1), wrapped_vault_key_item(kek_b, unwrap_vault_key(kek_a))])
+        self.assertEqual(db.get_all_vault_entries(), before)
+        self.assertEqual(unwrap_vault_key(kek_b), dek)
+        with self.assertRaises(ValueError):
+            unwrap_vault_key(kek_a)
+
+    def test_legacy_vault_migrates_to_random_dek(self):
+        # хранилище до DEK: записи зашифрованы прямо ключом из пароля — переводятся на новый случайный DEK,
+        # старый ключ из пароля записи больше не открывает
+        kek = secrets.token_bytes(32)
+        ids = self._fill(kek, 3)
+        self.assertIsNone(db.get_key_store(key_wrap.WRAPPED_DEK_KEY_TYPE))
+        progress = []
+        dek = unwrap_vault_key(kek, on_progress=lambda done, total: progress.append((done, total)))
+        self.assertNotEqual(dek, kek)
+        self.assertEqual(progress[-1], (3, 3))
+        blob = db.get_key_store(key_wrap.WRAPPED_DEK_KEY_TYPE)
+        self.assertEqual(key_wrap.unwrap_dek(kek, blob), dek)
+        rows = db.get_all_vault_entries()
+        self.assertEqual([r[0] for r in rows], ids)
+        cipher = EncryptionServiceAESGCM(_FakeKeyManager(dek))
+        self.assertEqual(cipher.decrypt_entry_payload(rows[0][1])["password"], "secret_0")
+        with self.assertRaises(Exception):
+            EncryptionServiceAESGCM(_FakeKeyManager(kek)).decrypt_entry_payload(rows[0][1])
+        # повторный вход — только разворачивание, без перешифровки
+        self.assertEqual(unwrap_vault_key(kek), dek)
+        self.assertEqual(db.get_all_vault_entries(), rows)
+
+    def test_legacy_migration_keeps_audit_log_verifiable(self):
+        # подпись журнала выводится из ключа данных: строки под старым ключом закрываются якорем
+        kek = secrets.token_bytes(32)
+        self._fill(kek, 2)
+        with patch("core.config.get", return_value="10000"):
+            key_storage.set_cached_key(kek)
+            for i in range(merkle.SEGMENT_SIZE + 5):
+                audit_logger._log_event("ClipboardCopied", entry_id=i, details="n=%d" % i)
+            self.assertTrue(verify_integrity(full=True)["verified"])
+            key_storage.clear_cached_key()
+
+            dek = unwrap_vault_key(kek)
+            key_storage.set_cached_key(dek)
+            audit_logger._log_event("ClipboardCopied", entry_id=0, details="after")
+            result = verify_integrity(full=True)
+            self.assertTrue(result["verified"], result["breaks"])
+            self.assertEqual(result["anchored_before"], merkle.SEGMENT_SIZE + 6)
+            self.assertEqual(result["total_entries"], 1)
+            self.assertTrue(verify_integrity(sample_limit=100)["verified"])
+            # сегмент под старым ключом пересобран новым
+            self.assertTrue(verify_event(5))
+
+            # подмена строки до якоря ломает якорь — старые строки снова проверяются и не сходятся
+            conn = sqlite3.connect(self._db_path)
+            try:
+                conn.execute(
+                    "UPDATE audit_log SET signature = 'tampered' WHERE sequence_number = ?", (merkle.SEGMENT_SIZE + 5,)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+            self.assertFalse(verify_integrity(full=True)["verified"])
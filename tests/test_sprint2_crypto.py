@@ -1,5 +1,8 @@
 # тесты спринта 2: argon2, вывод ключа, постоянное время, обнуление памяти
 
+import json
+import os
+import tempfile
 import unittest
 import secrets
 from core.crypto.key_derivation import (
@@ -13,6 +16,10 @@ from core.crypto.key_derivation import (
 )
 from core.crypto.authentication import validate_password_strength
 from core.crypto import key_storage
+from core.crypto import kdf_params
+from core.crypto.kdf_worker import KdfWorker
+from core.crypto.key_derivation import argon2_needs_rehash
+from database import db
 
 
 class TestArgon2Params(unittest.TestCase):
@@ -42,6 +49,89 @@ class TestKeyDerivationConsistency(unittest.TestCase):
             self.assertEqual(keys[0], k)
 
 
+class TestKdfWorker(unittest.TestCase):
+    # вход в фоне: Argon2 и PBKDF2 параллельно, прогресс по этапам, ключ только при верном пароле
+    def setUp(self):
+        self.worker = KdfWorker()
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def test_unlock_overlaps_and_reports_progress(self):
+        pwd = "TestPassword123!"
+        salt = b"1234567890123456"
+        stored = hash_password_argon2(pwd)
+        stages = []
+        job = self.worker.unlock(pwd, stored, salt, on_progress=lambda s, f: stages.append((s, f)))
+        result = job.wait(30)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.key, derive_key_pbkdf2(pwd, salt))
+        self.assertEqual(sorted(s for s, _ in stages), ["derive", "verify"])
+        self.assertEqual(stages[-1][1], 1.0)
+
+        bad = self.worker.unlock("WrongPassword123!", stored, salt).wait(30)
+        self.assertFalse(bad.ok)
+        self.assertIsNone(bad.key)
+
+    def test_new_credentials_checks_current_password(self):
+        stored = hash_password_argon2("OldPassword123!")
+        salt = b"1234567890123456"
+        done = []
+        job = self.worker.new_credentials(
+            "NewPassword123!", salt, current_password="OldPassword123!", stored_hash=stored, on_done=done.append
+        )
+        result = job.wait(30)
+        self.assertTrue(result.ok)
+        self.assertTrue(verify_password_argon2(result.auth_hash, "NewPassword123!"))
+        self.assertEqual(result.key, derive_key_pbkdf2("NewPassword123!", salt))
+        self.assertIs(done[0], result)
+        wrong = self.worker.new_credentials("NewPassword123!", salt, current_password="x", stored_hash=stored).wait(30)
+        self.assertFalse(wrong.ok)
+
+
+class TestKdfCalibration(unittest.TestCase):
+    # KEY-3: параметры подбираются замером, хранятся в key_store("params") версии 2
+    def setUp(self):
+        fd, self._db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        db.set_db_path(self._db_path)
+        db.init_db()
+
+    def tearDown(self):
+        db.set_db_path(None)
+        try:
+            os.unlink(self._db_path)
+        except OSError:
+            pass
+
+    def test_calibrate_within_bounds_and_hash_uses_params(self):
+        params = kdf_params.calibrate(target_ms=100)
+        self.assertEqual(params["version"], kdf_params.KDF_PARAMS_VERSION)
+        self.assertGreaterEqual(params["pbkdf2_iterations"], kdf_params.PBKDF2_MIN_ITERATIONS)
+        self.assertTrue(kdf_params.ARGON2_MIN_TIME_COST <= params["argon2_time_cost"] <= kdf_params.ARGON2_MAX_TIME_COST)
+        self.assertTrue(kdf_params.ARGON2_MIN_MEMORY_MIB <= params["argon2_memory_mib"] <= kdf_params.ARGON2_MAX_MEMORY_MIB)
+
+        h = hash_password_argon2("TestPassword123!", params)
+        self.assertIn("m=%d,t=%d" % (params["argon2_memory_mib"] * 1024, params["argon2_time_cost"]), h)
+        self.assertTrue(verify_password_argon2(h, "TestPassword123!"))
+        self.assertFalse(argon2_needs_rehash(h, params))
+
+    def test_v1_record_upgraded_and_pbkdf2_deferred(self):
+        db.set_key_store("params", json.dumps({"pbkdf2_iterations": 150000, "salt_len": 16, "key_len": 32, "version": 1}).encode("utf-8"))
+        params = kdf_params.load_params()
+        self.assertEqual(params["pbkdf2_iterations"], 150000)
+        self.assertEqual(params["argon2_time_cost"], DEFAULT_TIME_COST)
+
+        calibrated = dict(params, pbkdf2_iterations=300000, argon2_time_cost=4, target_ms=500, calibrated_at="now")
+        kdf_params.apply_calibration(calibrated)
+        stored = kdf_params.load_params()
+        # ключ хранилища выведен со старыми итерациями — новые ждут смены пароля
+        self.assertEqual(stored["pbkdf2_iterations"], 150000)
+        self.assertEqual(kdf_params.pbkdf2_iterations_for_new_key(stored), 300000)
+        self.assertEqual(stored["argon2_time_cost"], 4)
+        self.assertEqual(json.loads(db.get_key_store("params").decode("utf-8"))["version"], 2)
+
+
 class TestConstantTime(unittest.TestCase):
     # TEST-3 спринт 2: верификация при неверном пароле не должна сразу выходить (constant-time)
     def test_verify_returns_bool(self):
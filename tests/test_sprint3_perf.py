@@ -1,12 +1,19 @@
-import difflib
+import json
+import logging
 import os
 import tempfile
+import threading
 import time
 import tracemalloc
 import unittest
 
 import database.db as db
 from core.vault.encryption_service import EncryptionServiceAESGCM
+from core.vault.rekey import VaultRekeyer
+from core.vault.search_index import VaultSearchIndex
+
+# замеры бенчмарков — в лог (pytest -o log_cli=true --log-cli-level=INFO), сами проверки — assert
+_log = logging.getLogger(__name__)
 
 
 class _FakeKeyManager:
@@ -17,89 +24,6 @@ class _FakeKeyManager:
         return self._key
 
 
-def _similarity(a: str, b: str) -> float:
-    a = (a or "").lower()
-    b = (b or "").lower()
-    if not a or not b:
-        return 0.0
-    if b in a:
-        return 1.0
-    return difflib.SequenceMatcher(None, a, b).ratio()
-
-
-def _filter_entries_perf(query: str, rows):
-    # тест повторяет логику GUI-фильтра (MainWindow._filter_entries),
-    # чтобы проверить PERFs по скорости обработки.
-    terms = []
-    field_filters = []
-
-    buff = ""
-    in_quotes = False
-    tokens = []
-    for ch in query:
-        if ch == '"':
-            in_quotes = not in_quotes
-            continue
-        if ch.isspace() and not in_quotes:
-            if buff:
-                tokens.append(buff)
-                buff = ""
-            continue
-        buff += ch
-    if buff:
-        tokens.append(buff)
-
-    for tok in tokens:
-        if ":" in tok:
-            k, v = tok.split(":", 1)
-            k = k.strip().lower()
-            v = v.strip()
-            if k in ("title", "username", "url", "notes"):
-                field_filters.append((k, v))
-                continue
-        terms.append(tok)
-
-    out = []
-    for r in rows:
-        title = r.get("title", "") or ""
-        username = r.get("username_masked", "") or ""
-        url_domain = r.get("url_domain", "") or ""
-        notes = r.get("notes", "") or ""
-
-        ok = True
-        for k, v in field_filters:
-            if k == "title":
-                hay = title
-            elif k == "username":
-                hay = username
-            elif k == "url":
-                hay = url_domain
-            elif k == "notes":
-                hay = notes
-            else:
-                hay = ""
-
-            if _similarity(hay, v) < 0.6:
-                ok = False
-                break
-        if not ok:
-            continue
-
-        for term in terms:
-            best = max(
-                _similarity(title, term),
-                _similarity(username, term),
-                _similarity(url_domain, term),
-                _similarity(notes, term),
-            )
-            if best < 0.6:
-                ok = False
-                break
-        if ok:
-            out.append(r)
-    return out
-
-
 class TestSprint3Performance(unittest.TestCase):
     def setUp(self):
         fd, self._db_path = tempfile.mkstemp(suffix=".db")
@@ -195,7 +119,9 @@ class TestSprint3Performance(unittest.TestCase):
         # фиксируем query: field filter + немного free-text
         query = 'title:"Title9" work'
         t1 = time.perf_counter()
-        res = _filter_entries_perf(query, rows)
+        index = VaultSearchIndex()
+        index.rebuild(rows)
+        res = index.search(query)
         t_search = time.perf_counter() - t1
 
         self.assertLess(
@@ -205,3 +131,157 @@ class TestSprint3Performance(unittest.TestCase):
         )
         self.assertGreaterEqual(len(res), 1)
 
+    def test_perf_search_index_keystrokes(self):
+        # PERF-6: поиск на каждое нажатие — по индексу, без прохода по строкам; < 16 мс на нажатие
+        import random
+        import string
+
+        rnd = random.Random(7)
+
+        def word(n):
+            return "".join(rnd.choice(string.ascii_lowercase) for _ in range(n))
+
+        services = [word(rnd.randint(4, 10)) for _ in range(1500)]
+        vocab = [word(rnd.randint(3, 9)) for _ in range(1000)]
+        rows = []
+        for i in range(20000):
+            service = rnd.choice(services)
+            rows.append({
+                "id": i + 1,
+                "title": service.title() + rnd.choice([" work", " home", ""]),
+                "username_masked": word(4) + "••••",
+                "url_domain": service + ".com",
+                "notes": " ".join(rnd.choice(vocab) for _ in range(rnd.randint(0, 10))),
+            })
+        index = VaultSearchIndex()
+        t0 = time.perf_counter()
+        index.rebuild(rows)
+        t_build = time.perf_counter() - t0
+
+        target = services[11]
+        typo = target[:2] + target[3] + target[2] + target[4:]
+        keystrokes = [target[:n] for n in range(1, len(target) + 1)] + [typo, target + " work", "com", 'url:"%s"' % target]
+        worst = 0.0
+        for query in keystrokes:
+            t1 = time.perf_counter()
+            ids = index.search(query)
+            worst = max(worst, time.perf_counter() - t1)
+            if query in (target, typo):
+                self.assertIn(target, rows[ids[0] - 1]["url_domain"])
+        _log.info("PERF-6 build 20000: %.2f s, worst keystroke: %.2f ms", t_build, worst * 1000)
+        self.assertLess(worst, 0.016)
+
+    def test_perf_cipher_context_and_batches(self):
+        # PERF-5: записей/сек — прежний путь (новый AESGCM и срезы bytes на каждую запись)
+        # против контекста сессии и encrypt_many/decrypt_many; ключ — через key_storage, как в приложении
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from core.crypto import key_storage
+        from core.key_manager import get_key_manager
+
+        key_storage.set_cached_key(os.urandom(32))
+        self.addCleanup(key_storage.clear_cached_key)
+        crypto = EncryptionServiceAESGCM(get_key_manager())
+        payloads = [
+            {"title": "T%d" % i, "username": "user%d" % i, "password": "p" * 20, "notes": "n" * 200}
+            for i in range(5000)
+        ]
+
+        def legacy_decrypt(blob):
+            aesgcm = AESGCM(get_key_manager().get_encryption_key())
+            return json.loads(aesgcm.decrypt(blob[:12], blob[12:], None).decode("utf-8"))
+
+        def rate(fn):
+            t0 = time.perf_counter()
+            fn()
+            return len(payloads) / (time.perf_counter() - t0)
+
+        blobs = [e.encrypted_blob for e in crypto.encrypt_many(payloads)]
+        rates = {
+            "encrypt, по одной": rate(lambda: [crypto.encrypt_entry_payload(p) for p in payloads]),
+            "encrypt_many": rate(lambda: crypto.encrypt_many(payloads)),
+            "decrypt, прежний путь": rate(lambda: [legacy_decrypt(b) for b in blobs]),
+            "decrypt, по одной": rate(lambda: [crypto.decrypt_entry_payload(b) for b in blobs]),
+            "decrypt_many": rate(lambda: crypto.decrypt_many(blobs)),
+        }
+        _log.info("записей/сек: %s", ", ".join("%s %.0f" % kv for kv in rates.items()))
+        self.assertEqual(crypto.decrypt_many(blobs[:3]), payloads[:3])
+        # AESGCM собран один раз на сессию и переживает все вызовы выше
+        aesgcm = crypto._ctx[1]
+        crypto.decrypt_many(blobs[:10])
+        self.assertIs(crypto._ctx[1], aesgcm)
+        self.assertGreater(rates["decrypt_many"], 10000)
+
+    def test_perf_rekey_20000(self):
+        # PERF-4: перешифровка новым ключом данных — 20000 записей (payload + meta) за секунды
+        old_key, new_key = os.urandom(32), os.urandom(32)
+        crypto = EncryptionServiceAESGCM(_FakeKeyManager(old_key))
+        n = 20000
+        db.insert_vault_entries_bulk([
+            (
+                crypto.encrypt_entry_payload({"title": "T%d" % i, "password": "p" * 20, "notes": "n" * 100}).encrypted_blob,
+                "",
+                crypto.encrypt_entry_payload({"title": "T%d" % i}).encrypted_blob,
+            )
+            for i in range(n)
+        ])
+        result = VaultRekeyer(db, old_key, new_key, [("enc_salt", b"salt", 1)]).run()
+        _log.info("PERF-4 перешифровка %d записей: %.2f сек (cpu=%s)", n, result["seconds"], os.cpu_count())
+        self.assertTrue(result["ok"], result)
+        self.assertEqual(result["entries"], n)
+        self.assertLess(result["seconds"], 10.0, "PERF-4 нарушен: %.2f сек" % result["seconds"])
+
+
+class TestDatabaseReadScaling(unittest.TestCase):
+    # бенчмарк: пропускная способность параллельного чтения в режимах serial и wal (1/2/4 потока)
+    READS_PER_THREAD = 300
+
+    def setUp(self):
+        fd, self._db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    def tearDown(self):
+        db.set_db_path(None)
+        db.set_pool_mode(db.POOL_MODE_SERIAL)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self._db_path + suffix):
+                try:
+                    os.unlink(self._db_path + suffix)
+                except OSError:
+                    pass
+
+    def _reads_per_sec(self, threads: int) -> float:
+        ids = self._ids
+
+        def worker():
+            for i in range(self.READS_PER_THREAD):
+                db.get_vault_entry(ids[i % len(ids)])
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        t0 = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return threads * self.READS_PER_THREAD / (time.perf_counter() - t0)
+
+    def test_concurrent_read_throughput(self):
+        results = {}
+        for mode in (db.POOL_MODE_SERIAL, db.POOL_MODE_WAL):
+            db.set_pool_mode(mode, readers=4)
+            db.set_db_path(self._db_path)
+            db.init_db()
+            if mode == db.POOL_MODE_SERIAL:
+                db.insert_vault_entries_bulk([(os.urandom(256), "", None) for _ in range(500)])
+            self._ids = [r[0] for r in db.get_all_vault_entries()]
+            results[mode] = {n: self._reads_per_sec(n) for n in (1, 2, 4)}
+
+        _log.info("чтений/сек по числу потоков (cpu=%s): %s", os.cpu_count(), "; ".join(
+            "%s %s" % (mode, ", ".join("%d: %.0f" % kv for kv in by_threads.items())) for mode, by_threads in results.items()
+        ))
+        wal = results[db.POOL_MODE_WAL]
+        # на одном ядре роста нет, но с ростом числа потоков пропускная способность WAL не падает
+        # (допуск 30% — шум планировщика на маленьком замере)
+        self.assertGreater(wal[2], wal[1] * 0.7)
+        self.assertGreater(wal[4], wal[2] * 0.7)
+        # и WAL-читатели не должны быть заметно медленнее прежнего режима
+        self.assertGreater(wal[4], results[db.POOL_MODE_SERIAL][4] * 0.5)
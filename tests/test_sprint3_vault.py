@@ -7,7 +7,10 @@ import string      # ✅ Добавлен импорт
 import secrets
 
 import database.db as db
+from core.crypto import key_storage
 from core.vault.entry_manager import EntryManager
+from core.vault.index_cache import VaultIndexCache
+from core.vault.search_worker import SearchWorker
 
 try:
     import cryptography
@@ -29,6 +32,9 @@ class _FakeEvents:
     EntryCreated = "EntryCreated"
     EntryUpdated = "EntryUpdated"
     EntryDeleted = "EntryDeleted"
+    EntriesCreated = "EntriesCreated"
+    EntriesUpdated = "EntriesUpdated"
+    EntriesDeleted = "EntriesDeleted"
 
     def __init__(self):
         self.published = []
@@ -178,6 +184,85 @@ class TestSprint3Vault(unittest.TestCase):
         self.assertEqual(errors, [], "Concurrency вызвала ошибки БД")
         self.assertGreaterEqual(len(self.manager.get_all_entries()), 20, "Часть записей потерялась при конкурентной записи")
 
+    # === Список записей читает только meta_data (версия схемы 5) ===
+    def test_list_view_uses_meta_and_backfills_legacy_rows(self):
+        entry = self.manager.create_entry({
+            "title": "Meta", "username": "someone@example.com", "password": "Pwd_meta_1!",
+            "url": "https://meta.example.com/login", "notes": "x" * 500, "category": "Work",
+        })
+        # запись «до миграции»: только полный payload, meta_data пустая
+        crypto = self.manager._crypto
+        legacy_payload = crypto.build_payload_for_encrypt(
+            {"title": "Legacy", "username": "old_user", "password": "p", "url": "old.example.org"},
+            created_at=crypto.now_timestamp(),
+        )
+        legacy_id = db.insert_vault_entry(crypto.encrypt_entry_payload(legacy_payload).encrypted_blob, tags="")
+
+        rows = {r["id"]: r for r in self.manager.get_all_entries()}
+        self.assertEqual(rows[entry["id"]]["url_domain"], "meta.example.com")
+        self.assertEqual(rows[entry["id"]]["username_masked"], "some••••")
+        self.assertEqual(len(rows[entry["id"]]["notes_preview"]), 120)
+        self.assertEqual(rows[entry["id"]]["notes"], "x" * 500)
+        self.assertNotIn("password", rows[entry["id"]])
+        self.assertEqual(rows[legacy_id]["title"], "Legacy")
+
+        # после первой загрузки meta_data заполнена, повторная загрузка не трогает полный payload
+        meta_rows = {r[0]: r for r in db.get_all_vault_entries_meta()}
+        self.assertIsNotNone(meta_rows[legacy_id][1])
+        self.assertIsNone(meta_rows[legacy_id][2])
+        calls = []
+        original = crypto._decrypt_with
+
+        def spy(aesgcm, blob):
+            calls.append(len(blob))
+            return original(aesgcm, blob)
+
+        crypto._decrypt_with = spy
+        try:
+            self.manager.get_all_entries()
+        finally:
+            crypto._decrypt_with = original
+        self.assertEqual(len(calls), 2)
+        full_blob = db.get_vault_entry(entry["id"])[1]
+        self.assertTrue(all(n < len(full_blob) for n in calls))
+
+    def test_update_without_meta_is_rebuilt(self):
+        entry = self.manager.create_entry({"title": "Before", "username": "u", "password": "p"})
+        crypto = self.manager._crypto
+        payload = crypto.build_payload_for_encrypt({"title": "After", "password": "p"}, created_at="1")
+        # db.update_vault_entry без meta_data (как при смене мастер-пароля) сбрасывает запись списка
+        db.update_vault_entry(entry["id"], crypto.encrypt_entry_payload(payload).encrypted_blob, tags="")
+        self.assertEqual(self.manager.get_all_entries()[0]["title"], "After")
+
+    # === PERF-6: пакетная расшифровка на всех ядрах, повреждённая запись не прерывает загрузку ===
+    def test_parallel_decrypt_reports_corrupt_rows(self):
+        from core.import_export.exporter import VaultExporter
+
+        entries = self.manager.create_entries([
+            {"title": f"t{i}", "username": "u", "password": f"p{i}"} for i in range(600)
+        ])
+        crypto = self.manager._crypto
+        blobs = [db.get_vault_entry(e["id"])[1] for e in entries]
+        blobs[300] = blobs[300][:-1] + bytes([blobs[300][-1] ^ 1])
+        results = crypto.decrypt_many_parallel(blobs, workers=4)
+        self.assertEqual([r.payload["title"] for r in results if r.ok], [f"t{i}" for i in range(600) if i != 300])
+        self.assertFalse(results[300].ok)
+
+        broken_id = entries[300]["id"]
+        db.update_vault_entry(broken_id, blobs[300], tags="")
+        errors = []
+        rows = self.manager.get_all_entries(errors=errors)
+        self.assertEqual(len(rows), 599)
+        self.assertEqual([e["id"] for e in errors], [broken_id])
+        with self.assertRaises(Exception):
+            self.manager.get_all_entries()
+
+        exporter = VaultExporter(self.manager.iter_entries)
+        text = exporter.export_csv()
+        self.assertEqual([e["id"] for e in exporter.skipped_entries], [broken_id])
+        self.assertIn("t599", text)
+        self.assertNotIn("t300,", text)
+
     # === TEST-4: Генератор 10k паролей, проверка уникальности и наборов символов ===
     def test_test4_password_generator_compliance(self):
         # ✅ Исправлено: гарантируем наличие всех типов символов
@@ -212,5 +297,193 @@ class TestSprint3Vault(unittest.TestCase):
         self.assertTrue(all(16 == len(pw) for pw in pws), "Нарушена длина пароля")
 
 
+class _DispatchEvents(_FakeEvents):
+    # как core.events, но локально: publish сразу вызывает подписчиков
+    UserLoggedOut = "UserLoggedOut"
+
+    def __init__(self):
+        super().__init__()
+        self._subs = {}
+
+    def subscribe(self, event_type, callback):
+        self._subs.setdefault(event_type, []).append(callback)
+
+    def unsubscribe(self, event_type, callback):
+        if callback in self._subs.get(event_type, []):
+            self._subs[event_type].remove(callback)
+
+    def publish(self, event_type, sync=True, **kwargs):
+        super().publish(event_type, sync=sync, **kwargs)
+        for cb in list(self._subs.get(event_type, [])):
+            cb(**kwargs)
+
+
+@unittest.skipUnless(_HAS_CRYPTO, "Пакет 'cryptography' не установлен — AES-GCM тесты пропускаются")
+class TestVaultIndexCache(unittest.TestCase):
+    def setUp(self):
+        fd, self._db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        db.set_db_path(self._db_path)
+        db.init_db()
+        self.events = _DispatchEvents()
+        self.manager = EntryManager(db, _FakeKeyManager(b"x" * 32), self.events)
+        self.cache = VaultIndexCache(self.manager, self.events)
+        self.cache.attach()
+
+    def tearDown(self):
+        self.cache.detach()
+        db.set_db_path(None)
+        if os.path.exists(self._db_path):
+            try:
+                os.unlink(self._db_path)
+            except OSError:
+                pass
+
+    def test_events_patch_single_rows(self):
+        ids = [self.manager.create_entry({"title": f"T{i}", "username": "u", "password": "p"})["id"] for i in range(5)]
+        self.assertEqual(len(self.cache.get_all()), 5)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+        calls = []
+        original = self.manager.get_all_entries
+        self.manager.get_all_entries = lambda: calls.append(1) or original()
+        try:
+            new = self.manager.create_entry({"title": "New", "username": "u", "password": "p"})
+            self.manager.update_entry(ids[0], {"title": "T0-upd", "username": "u", "password": "p"})
+            self.manager.delete_entry(ids[1])
+            rows = self.cache.get_all()
+        finally:
+            self.manager.get_all_entries = original
+
+        # ни одной полной перезагрузки: только точечные патчи
+        self.assertEqual(calls, [])
+        titles = [r["title"] for r in rows]
+        self.assertEqual(titles, ["T0-upd", "T2", "T3", "T4", "New"])
+        self.assertEqual(rows[-1]["id"], new["id"])
+        stats = self.cache.stats()
+        self.assertEqual(stats["patches"], 3)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_bulk_create_update_delete(self):
+        self.cache.get_all()
+        created = self.manager.create_entries(
+            [{"title": f"B{i}", "username": f"user{i}", "password": f"p{i}"} for i in range(50)]
+        )
+        self.assertEqual(len(created), 50)
+        self.assertEqual(created[3]["password"], "p3")
+        self.assertEqual(self.manager.get_entry(created[3]["id"])["title"], "B3")
+
+        ids = [c["id"] for c in created]
+        self.manager.update_entries([(ids[0], {"title": "B0-upd", "password": "x"})])
+        self.assertEqual(self.manager.get_entry(ids[0])["password"], "x")
+        self.assertEqual(self.manager.delete_entries(ids[10:]), 40)
+
+        # одно событие на пакет, кэш списка пропатчен без полной загрузки
+        batch = [e for e, _ in self.events.published if e.startswith("Entries")]
+        self.assertEqual(batch, ["EntriesCreated", "EntriesUpdated", "EntriesDeleted"])
+        rows = self.cache.get_all()
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0]["title"], "B0-upd")
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_search_index_follows_events(self):
+        self.manager.create_entries([
+            {"title": "Google Mail", "username": "alice", "password": "p", "url": "https://mail.google.com"},
+            {"title": "Bank", "username": "bob", "password": "p", "notes": "pin at home"},
+            {"title": "Gogs", "username": "carol", "password": "p", "url": "https://git.example.org"},
+        ])
+        self.cache.get_all()
+        self.assertEqual([r["title"] for r in self.cache.search("goo")], ["Google Mail"])
+        # опечатка и префиксы: точное совпадение выше нечёткого
+        self.assertEqual([r["title"] for r in self.cache.search("gogle")], ["Google Mail", "Gogs"])
+        self.assertEqual([r["title"] for r in self.cache.search("go")], ["Google Mail", "Gogs"])
+        self.assertEqual([r["title"] for r in self.cache.search('notes:home')], ["Bank"])
+        self.assertEqual([r["title"] for r in self.cache.search("url:example title:gogs")], ["Gogs"])
+        self.assertEqual(self.cache.search("url:bank"), [])
+
+        bank = self.cache.search("bank")[0]
+        self.manager.update_entry(bank["id"], {"title": "Savings", "username": "bob", "password": "p"})
+        self.assertEqual(self.cache.search("bank"), [])
+        self.assertEqual([r["id"] for r in self.cache.search("savings")], [bank["id"]])
+        self.manager.delete_entry(bank["id"])
+        self.assertEqual(self.cache.search("savings"), [])
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_search_finds_notes_past_preview(self):
+        # превью — только для колонки таблицы: слово после 120-го символа заметки находится поиском
+        entry = self.manager.create_entry({
+            "title": "Long", "username": "dave", "password": "p", "notes": "x" * 200 + " recovery phrase",
+        })
+        self.cache.get_all()
+        self.assertEqual([r["title"] for r in self.cache.search("recovery")], ["Long"])
+        self.assertEqual([r["title"] for r in self.cache.search('notes:"recovery phrase"')], ["Long"])
+        # meta_data версии 1 (заметки обрезаны) пересобирается из полного payload
+        crypto = self.manager._crypto
+        legacy_meta = {"title": "Long", "notes": "x" * 120, "version": 1}
+        db.set_vault_entries_meta([(entry["id"], crypto.encrypt_entry_payload(legacy_meta).encrypted_blob)])
+        row = self.manager.get_list_entry(entry["id"])
+        self.assertTrue(row["notes"].endswith("recovery phrase"))
+        self.assertEqual(crypto.decrypt_entry_payload(db.get_vault_entry_meta(entry["id"])[1])["version"], 2)
+
+    def test_cleared_on_key_clear_and_logout(self):
+        self.manager.create_entry({"title": "A", "username": "u", "password": "p"})
+        self.cache.get_all()
+        key_storage.clear_cached_key()
+        self.assertEqual(self.cache.stats()["size"], 0)
+        self.assertFalse(self.cache.stats()["loaded"])
+
+        self.cache.get_all()
+        self.events.publish(self.events.UserLoggedOut, sync=True)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+
+class TestSearchWorker(unittest.TestCase):
+    # SEARCH-2: быстрый набор не копит очередь поисков, устаревшие результаты не доставляются
+    def test_coalesces_and_drops_stale_results(self):
+        started = threading.Event()
+        release = threading.Event()
+        searched = []
+
+        def search(query):
+            searched.append(query)
+            if query == "a":
+                started.set()
+                release.wait(5)
+            return [{"id": i, "query": query} for i in range(120)]
+
+        worker = SearchWorker(search, first_page=50, page_size=500)
+        self.addCleanup(worker.shutdown)
+        pages = []
+        finished = threading.Event()
+
+        def on_page(page):
+            pages.append(page)
+            if page.done:
+                finished.set()
+
+        worker.submit("a", on_page)
+        self.assertTrue(started.wait(5))
+        worker.submit("ab", on_page)
+        last = worker.submit("abc", on_page)
+        release.set()
+        self.assertTrue(finished.wait(5))
+
+        # "ab" вытеснен, не начавшись; страницы "a" устарели до доставки
+        self.assertEqual(searched, ["a", "abc"])
+        self.assertEqual({p.generation for p in pages}, {last})
+        self.assertEqual([(p.offset, len(p.rows), p.done) for p in pages], [(0, 50, False), (50, 70, True)])
+        self.assertEqual(pages[0].rows[0]["query"], "abc")
+
+    def test_error_is_reported_as_page(self):
+        worker = SearchWorker(lambda q: 1 / 0)
+        self.addCleanup(worker.shutdown)
+        got = []
+        done = threading.Event()
+        worker.submit("x", lambda p: got.append(p) or done.set())
+        self.assertTrue(done.wait(5))
+        self.assertIsInstance(got[0].error, ZeroDivisionError)
+        self.assertTrue(got[0].done)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
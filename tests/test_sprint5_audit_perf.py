@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import logging
 import os
+import pickle
 import tempfile
 import time
 import tracemalloc
@@ -12,8 +14,12 @@ from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption,
 
 import database.db as db_module
 
-from core.audit.log_verifier import verify_audit_chain
-from core.audit import audit_logger
+from core.audit.log_verifier import chain_hash_of, verify_audit_chain, verify_audit_chain_parallel
+from core.audit import audit_logger, signer_cache
+from core.audit.log_signer import AuditLogSigner, derive_audit_signing_key
+
+# замеры бенчмарков — в лог (pytest -o log_cli=true --log-cli-level=INFO), сами проверки — assert
+_log = logging.getLogger(__name__)
 
 
 class TestSprint5AuditPerformance(unittest.TestCase):
@@ -152,6 +158,61 @@ class TestSprint5AuditPerformance(unittest.TestCase):
         self.assertLess(dt_ms, 10.0)
         self.assertGreaterEqual(len(rows), 1)
 
+    def test_perf6_session_signer_cost(self) -> None:
+        """PERF-6: подпись события — HKDF на каждое событие против подписчика сессии"""
+        ek = os.urandom(32)
+        n = 2000
+        data = b"0" * 64 + b"|" + b'{"event_type": "ClipboardCopied", "details": "source=perf"}'
+
+        t0 = time.perf_counter()
+        for _ in range(n):
+            per_event = AuditLogSigner(derive_audit_signing_key(ek)).sign(data)
+        before_us = (time.perf_counter() - t0) / n * 1e6
+
+        signer_cache.open_session(ek)
+        try:
+            t1 = time.perf_counter()
+            for _ in range(n):
+                cached = signer_cache.get_session_signer(ek).sign(data)
+            after_us = (time.perf_counter() - t1) / n * 1e6
+        finally:
+            signer_cache.close_session()
+
+        _log.info("PERF-6 sign per event: HKDF each %.1f us, session %.1f us", before_us, after_us)
+        self.assertEqual(per_event, cached)
+        self.assertLess(after_us, before_us)
+        self.assertIsNone(signer_cache.get_session_signer(ek))
+
+    def test_perf7_parallel_verify_matches_sequential(self) -> None:
+        """PERF-7: параллельная проверка даёт те же разрывы, что и последовательная; строк/с — в лог"""
+        signer = AuditLogSigner(self.seed)
+        rows = []
+        prev = "0" * 64
+        for seq in range(1, 20001):
+            payload = b'{"event_type": "ClipboardCopied", "sequence_number": %d}' % seq
+            sig = signer.sign(prev.encode("utf-8") + b"|" + payload)
+            rows.append({"sequence_number": seq, "previous_hash": prev, "entry_data": payload, "signature": sig})
+            prev = chain_hash_of(rows[-1])
+        rows[7000]["signature"] = "0" * 64
+        rows[15000]["entry_data"] = b"changed"
+
+        expected = verify_audit_chain(rows, signer, presorted=True)
+        # копия без сырого ключа (clone) в процессы не передаётся — проверка идёт потоками
+        clone = signer.clone()
+        self.assertEqual(clone.export_key(), bytearray())
+        with self.assertRaises(TypeError):
+            pickle.dumps(signer)
+        for candidate, use_processes in ((signer, False), (signer, True), (clone, True)):
+            res = verify_audit_chain_parallel(rows, candidate, workers=2, chunk_size=3000, use_processes=use_processes)
+            _log.info("PERF-7 processes=%s, key=%s: %.0f rows/s", use_processes, candidate is signer, res["rows_per_second"])
+            self.assertEqual(res["breaks"], expected["breaks"])
+            self.assertEqual(res["valid_entries"], expected["valid_entries"])
+            self.assertEqual(res["last_hash"], expected["last_hash"])
+        # подмена даёт bad_signature у самой строки и previous_hash_mismatch у следующей
+        self.assertEqual(len(expected["breaks"]), 4)
+        # процессы получают копию ключа: ключ самого подписчика после проверки цел
+        self.assertEqual(signer.export_key(), bytearray(self.seed))
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -11,7 +11,8 @@ from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption,
 
 import database.db as db_module
 from core.audit.integrity import verify_integrity
-from core.audit import audit_logger
+from core.audit import audit_logger, signer_cache
+from core.audit.audit_writer import AuditWriter
 from core.audit.log_verifier import verify_audit_chain
 from core.audit.log_signer import AuditLogSigner
 
@@ -82,6 +83,283 @@ class TestAuditSprint5Validation(unittest.TestCase):
 
         self.assertFalse(result["verified"], "verify_integrity должен обнаружить tampering")
 
+    def test_sample_window_verifies_from_anchor(self) -> None:
+        """Проверка последних N строк: цепочка окна сверяется от строки перед окном"""
+        self._write_logs(120)
+
+        patches = self._patches() + [
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+        ]
+        self._start_patches(patches)
+        try:
+            result = verify_integrity(sample_limit=50)
+        finally:
+            self._stop_patches(patches)
+
+        self.assertTrue(result["verified"], f"Окно не проверено: {result['breaks']}")
+        self.assertEqual(result["checked"], 50)
+        self.assertEqual(result["total_in_db"], 120)
+
+    def test_async_writer_batches_and_flushes_on_logout(self) -> None:
+        """Фоновый писатель: пачки в одной транзакции, цепочка цела, logout сбрасывает очередь"""
+        patches = self._patches()
+        self._start_patches(patches)
+        try:
+            writer = audit_logger.start_writer(batch_size=50, flush_interval_ms=10000)
+            try:
+                for i in range(120):
+                    audit_logger._submit("ClipboardCopied", entry_id=i, details=f"n={i}")
+                    if i == 60:
+                        # синхронная запись посреди очереди не рвёт цепочку
+                        audit_logger._log_event("EntryCreated", entry_id=i)
+                audit_logger._on_logged_out()
+                self.assertEqual(db_module.count_audit_logs(), 122)
+                self.assertLessEqual(writer.batches, 4)
+            finally:
+                audit_logger.shutdown()
+            rows = list(db_module.iter_audit_logs())
+            self.assertEqual(rows[-1]["action"], "UserLoggedOut")
+            res = verify_audit_chain(rows, AuditLogSigner(self.seed), presorted=True)
+        finally:
+            self._stop_patches(patches)
+        self.assertTrue(res["verified"], f"Цепочка нарушена: {res['breaks']}")
+
+    def test_writer_retries_and_counts_failed_batches(self) -> None:
+        """Сбой записи пачки: повтор, а если не помогло — счётчик failed, пачка не теряется молча"""
+        calls = []
+
+        def flaky(batch):
+            calls.append(list(batch))
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+
+        writer = AuditWriter(flaky)
+        with patch("core.audit.audit_writer._RETRY_DELAY", 0), self.assertLogs("core.audit.audit_writer", "WARNING"):
+            writer.submit("a")
+        self.assertEqual((writer.written, writer.failed, len(calls)), (1, 0, 2))
+
+        def broken(batch):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        writer = AuditWriter(broken)
+        with patch("core.audit.audit_writer._RETRY_DELAY", 0), self.assertLogs("core.audit.audit_writer", "ERROR"):
+            writer.submit("b")
+        self.assertEqual((writer.written, writer.failed), (0, 1))
+
+    def test_writer_queue_holds_no_vault_key(self) -> None:
+        """В очереди писателя — копия подписчика сессии, а не ключ хранилища"""
+        ek = b"test_key_32_bytes_long!!"
+        queued = []
+        patches = self._patches()
+        self._start_patches(patches)
+        signer_cache.open_session(ek)
+        try:
+            with patch.object(audit_logger, "_writer", AuditWriter(queued.extend)):
+                audit_logger._submit("ClipboardCopied", entry_id=1)
+        finally:
+            signer_cache.close_session()
+            self._stop_patches(patches)
+        signer = queued[0][-1]
+        self.assertIsInstance(signer, AuditLogSigner)
+        self.assertEqual(bytes(signer.export_key()), b"")
+        self.assertNotIn(ek, queued[0])
+
+    def test_checkpoint_incremental_verify(self) -> None:
+        """Контрольная точка: повторная проверка идёт только по новым строкам, подмена точки отбрасывается"""
+        self._write_logs(40)
+        patches = self._patches() + [
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+        ]
+        self._start_patches(patches)
+        try:
+            first = verify_integrity()
+            self.assertEqual((first["mode"], first["checked"]), ("full", 40))
+            for i in range(5):
+                audit_logger._log_event("ClipboardCopied", entry_id=i)
+            second = verify_integrity()
+            self.assertTrue(second["verified"])
+            self.assertEqual((second["mode"], second["checked"]), ("incremental", 5))
+            self.assertEqual(db_module.get_audit_checkpoint()["sequence_number"], 45)
+
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute("UPDATE audit_checkpoints SET sequence_number = 10")
+                conn.commit()
+            finally:
+                conn.close()
+            third = verify_integrity()
+            self.assertEqual((third["mode"], third["checked"]), ("full", 45))
+            self.assertEqual(verify_integrity(full=True)["checked"], 45)
+        finally:
+            self._stop_patches(patches)
+
+    def test_verify_reports_progress(self) -> None:
+        """on_progress получает (done, total) по мере чтения строк; последний вызов — всё проверено"""
+        self._write_logs(30)
+        patches = self._patches() + [
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+            patch("core.audit.integrity.VERIFY_BATCH_SIZE", 10),
+        ]
+        self._start_patches(patches)
+        try:
+            calls = []
+            result = verify_integrity(full=True, on_progress=lambda done, total: calls.append((done, total)))
+            self.assertTrue(result["verified"])
+            self.assertEqual(calls, [(10, 30), (20, 30), (30, 30), (30, 30)])
+        finally:
+            self._stop_patches(patches)
+
+    def test_verify_after_prune(self) -> None:
+        """После prune проверка идёт от первой оставшейся строки, в том числе когда удалена строка точки"""
+        self._write_logs(60)
+        patches = [
+            patch("core.audit.audit_logger.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.audit_logger.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+            patch("core.config.get", return_value="100", create=True),
+        ]
+        self._start_patches(patches)
+        try:
+            self.assertTrue(verify_integrity()["verified"])
+            self.assertEqual(db_module.get_audit_checkpoint()["sequence_number"], 60)
+            for i in range(90):
+                audit_logger._log_event("ClipboardCopied", entry_id=i)
+            # prune удаляет 50 строк — строка контрольной точки (60) остаётся
+            result = verify_integrity()
+            self.assertTrue(result["verified"], result["breaks"])
+            self.assertEqual(result["mode"], "incremental")
+            for full, parallel in ((True, False), (True, True)):
+                result = verify_integrity(full=full, parallel=parallel)
+                self.assertTrue(result["verified"], result["breaks"])
+                self.assertEqual((result["pruned_before"], result["checked"]), (51, 100))
+            # строка точки удалена — полная проверка от первой оставшейся, новая точка сохраняется
+            from core.audit.integrity import _checkpoint_message
+            from core.audit.log_verifier import chain_hash_of
+
+            chain_hash = chain_hash_of(db_module.get_audit_log_by_sequence(100))
+            signature = AuditLogSigner(self.seed).sign(_checkpoint_message(100, chain_hash))
+            db_module.set_audit_checkpoint(100, chain_hash, signature)
+            for i in range(80):
+                audit_logger._log_event("ClipboardCopied", entry_id=i)
+            result = verify_integrity()
+            self.assertTrue(result["verified"], result["breaks"])
+            self.assertEqual((result["mode"], result["pruned_before"]), ("full", 131))
+            self.assertEqual(db_module.get_audit_checkpoint()["sequence_number"], 230)
+
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute("UPDATE audit_log SET signature = 'tampered' WHERE sequence_number = 200")
+                conn.commit()
+            finally:
+                conn.close()
+            self.assertFalse(verify_integrity(full=True)["verified"])
+        finally:
+            self._stop_patches(patches)
+
+    def test_merkle_segments_prove_single_event(self) -> None:
+        """Сегменты Меркла: доказательство одной строки и обнаружение подмены в закрытом сегменте"""
+        from core.audit import merkle
+        from core.audit.integrity import verify_event, verify_events, verify_segments
+
+        n = merkle.SEGMENT_SIZE * 2 + 10
+        self._write_logs(n)
+        self.assertEqual(len(db_module.list_audit_segments()), 2)
+
+        patches = self._patches() + [
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+        ]
+        self._start_patches(patches)
+        try:
+            signer = AuditLogSigner(self.seed)
+            proof = merkle.prove_event(300)
+            self.assertLessEqual(len(proof["path"]), 8)
+            self.assertTrue(merkle.verify_proof(proof, signer, db_module.get_audit_log_by_sequence(300)))
+            self.assertFalse(merkle.verify_proof(proof, signer, db_module.get_audit_log_by_sequence(301)))
+            self.assertTrue(verify_segments(workers=2)["verified"])
+            self.assertTrue(verify_events([5, 300, n])["verified"])
+
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute("UPDATE audit_log SET signature = 'tampered' WHERE sequence_number = 300")
+                conn.commit()
+            finally:
+                conn.close()
+            self.assertFalse(verify_event(300))
+            self.assertTrue(verify_event(5))
+            result = verify_segments(workers=2)
+            self.assertEqual(result["breaks"], [{"segment": 1, "reason": "merkle_root_mismatch"}])
+        finally:
+            self._stop_patches(patches)
+
+    def test_verify_events_marks_unconfirmed_tail_rows(self) -> None:
+        """Хвост без сегмента не прошёл проверку: строки после разрыва и до точки не считаются проверенными"""
+        from core.audit.integrity import verify_events
+
+        patches = self._patches() + [
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+        ]
+        self._write_logs(20)
+        self._start_patches(patches)
+        try:
+            self.assertTrue(verify_integrity()["verified"])
+        finally:
+            self._stop_patches(patches)
+        self._write_logs(10)
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("UPDATE audit_log SET signature = 'tampered' WHERE sequence_number = 25")
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._start_patches(patches)
+        try:
+            result = verify_events([3, 22, 27, 30])
+        finally:
+            self._stop_patches(patches)
+        self.assertFalse(result["verified"])
+        self.assertEqual(result["breaks"], [
+            {"sequence": 3, "reason": "unverified"},
+            {"sequence": 27, "reason": "chain_break"},
+            {"sequence": 30, "reason": "chain_break"},
+        ])
+        self.assertEqual(result["valid_entries"], 1)
+
+    def test_write_seals_only_its_own_segments(self) -> None:
+        """Запись журнала закрывает только сегменты со своими строками; старые — после проверки цепочки"""
+        from core.audit import merkle
+
+        size = merkle.SEGMENT_SIZE
+        self._write_logs(size + 5)
+        # сегмент 0 без корня (журнал до версии 7) и изменённая строка в нём
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("DELETE FROM audit_segments")
+            conn.execute("UPDATE audit_log SET signature = 'tampered' WHERE sequence_number = 5")
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._write_logs(size)
+        self.assertEqual([s["segment_index"] for s in db_module.list_audit_segments()], [1])
+
+        patches = self._patches() + [
+            patch("core.audit.integrity.derive_audit_signing_key", return_value=self.seed),
+            patch("core.audit.integrity.get_encryption_key", return_value=b"test_key_32_bytes_long!!"),
+        ]
+        self._start_patches(patches)
+        try:
+            self.assertFalse(verify_integrity(full=True)["verified"])
+            self.assertIsNone(db_module.get_audit_segment(0))
+        finally:
+            self._stop_patches(patches)
+
     def test_test2_performance_throughput(self) -> None:
         """TEST-2: throughput записи и время проверки цепочки"""
         patches = self._patches()
@@ -1,13 +1,23 @@
+import io
+import base64
 import json
+import logging
 import os
+import random
 import tempfile
+import time
+import tracemalloc
 import unittest
-from unittest import mock
+import zlib
 
+from core.import_export.compression import available_codecs, get_codec, select_codec
 from core.import_export.exporter import ExportOptions, VaultExporter
-from core.import_export.formats.csv_format import csv_to_entries, entries_to_csv
+from core.import_export.formats.bitwarden_format import entries_to_bitwarden, iter_bitwarden_entries
+from core.import_export.formats.csv_format import CSV_FIELDS, csv_to_entries, entries_to_csv
+from core.import_export.formats.export_v2_format import ExportV2Reader, write_encrypted_export_v2
 from core.import_export.formats.json_format import build_encrypted_export, parse_encrypted_export
-from core.import_export.importer import VaultImporter
+from core.import_export.duplicates import DuplicateIndex, make_duplicate_index
+from core.import_export.importer import VaultImporter, detect_format
 from core.import_export.key_exchange import (
     add_contact,
     generate_rsa_keypair,
@@ -19,6 +29,9 @@ from core.import_export import qr_codec
 from core.import_export.sharing_service import SharingService
 from core.key_manager import set_encryption_key
 
+# замеры бенчмарков — в лог (pytest -o log_cli=true --log-cli-level=INFO), сами проверки — assert
+_log = logging.getLogger(__name__)
+
 
 SAMPLE = [
     {
@@ -66,9 +79,276 @@ class TestSprint6ImportExport(unittest.TestCase):
 
         importer = VaultImporter(create_entry=create_entry, list_entries=lambda: [])
         result = importer.import_file(path, "dry_run", export_password="exp-pass")
-        self.assertEqual(len(result.added), 1)
+        self.assertEqual(result.added_count, 1)
         os.unlink(path)
 
+    def test_importer_batches_create_entries(self):
+        rows = [dict(SAMPLE[0], title="Site%d" % i) for i in range(1100)]
+        rows.append(dict(SAMPLE[0], title="Site5"))  # дубликат внутри файла
+        pkg = build_encrypted_export(rows, "exp-pass")
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(pkg, f)
+        batches = []
+
+        def create_entries(items):
+            batches.append(len(items))
+            return [dict(item, id=sum(batches) - len(items) + n + 1) for n, item in enumerate(items)]
+
+        importer = VaultImporter(create_entries=create_entries, list_entries=lambda: [])
+        try:
+            result = importer.import_file(path, "merge", export_password="exp-pass")
+        finally:
+            os.unlink(path)
+        self.assertEqual(batches, [500, 500, 100])
+        self.assertEqual(result.added_count, 1100)
+        self.assertEqual(result.skipped_count, 1)
+        # в результате — id и ограниченный образец без паролей, а не все созданные записи
+        self.assertEqual(result.added_ids, list(range(1, 1101)))
+        self.assertEqual(len(result.added_sample), 20)
+        self.assertNotIn("password", result.added_sample[0])
+        self.assertFalse(hasattr(result, "added"))
+
+    def test_duplicate_strategies(self):
+        existing = [{"id": 1, "title": "My Bank", "username": "Alice", "url": "https://www.bank.example.com/login",
+                     "password": "Secret1!"}]
+        same_site = {"title": " my  bank", "username": "alice", "url": "bank.example.com"}
+        other_site = {"title": "My Bank", "username": "alice", "url": "https://evil.example.net"}
+        typo = {"title": "My Bnak!", "username": "alice", "url": "http://bank.example.com:8080"}
+        matches = {}
+        for name in ("exact", "normalized_url", "fuzzy"):
+            index = make_duplicate_index(name)
+            index.extend(existing)
+            matches[name] = [e in index for e in (same_site, other_site, typo)]
+            self.assertEqual(index.find_id(same_site if name != "exact" else other_site), 1)
+            # индекс держит ключи и id, не записи с паролями
+            self.assertNotIn("Secret1!", repr(vars(index)))
+        self.assertEqual(matches["exact"], [False, True, False])
+        self.assertEqual(matches["normalized_url"], [True, False, False])
+        self.assertEqual(matches["fuzzy"], [True, False, True])
+        with self.assertRaises(ValueError):
+            VaultImporter(duplicate_strategy="nope")
+
+    def test_perf_merge_duplicate_index(self):
+        # IMP-PERF: merge N записей в хранилище из N записей (половина — дубликаты);
+        # индекс дубликатов — линейно по N, прежний проход по списку — N^2
+        class _ScanIndex(DuplicateIndex):
+            # прежний VaultImporter._find_duplicate как стратегия — для сравнения
+            def __init__(self):
+                super().__init__()
+                self._items = []
+
+            def add(self, entry):
+                self._items.append(entry)
+
+            def __contains__(self, entry):
+                title = (entry.get("title") or "").lower()
+                user = (entry.get("username") or "").lower()
+                for e in self._items:
+                    if (e.get("title") or "").lower() == title and (e.get("username") or "").lower() == user:
+                        return True
+                return False
+
+        def merge(n, strategy):
+            existing = [{"id": i, "title": "Site%d" % i, "username": "user%d" % i} for i in range(n)]
+            incoming = [{"title": "Site%d" % i, "username": "user%d" % i, "password": "p"} for i in range(n // 2, n + n // 2)]
+            importer = VaultImporter(
+                create_entries=lambda items: items, list_entries=lambda: existing, duplicate_strategy=strategy
+            )
+            started = time.perf_counter()
+            result = importer.import_entries(incoming, "merge")
+            elapsed = time.perf_counter() - started
+            self.assertEqual((result.added_count, result.skipped_count), (n - n // 2, n // 2))
+            return elapsed
+
+        scan_1k = merge(1000, _ScanIndex)
+        timings = {n: merge(n, "exact") for n in (1000, 10000, 100000)}
+        _log.info("IMP-PERF merge (index): %s; scan 1k: %.3f s",
+                  ", ".join("%dk: %.3f s" % (n // 1000, t) for n, t in timings.items()), scan_1k)
+        self.assertLess(timings[1000], scan_1k)
+        # линейный рост: x100 записей — не больше x300 времени (N^2 дал бы x10000)
+        self.assertLess(timings[100000], max(timings[1000], 0.005) * 300)
+
+    def test_bitwarden_stream_parser(self):
+        # IMP-STREAM: items по одному элементу, значения разрезаны границами фрагментов
+        rows = [dict(SAMPLE[0], title="Сайт %d" % i, notes="a\\\"b} ]" * (i % 5)) for i in range(40)]
+        data = json.loads(entries_to_bitwarden(rows))
+        data = {"encrypted": False, "folders": [{"id": "f1", "name": "work"}], "count": 12345, **data}
+        text = json.dumps(data, ensure_ascii=False)
+        expected = list(iter_bitwarden_entries(io.StringIO(text)))
+        self.assertEqual(len(expected), 40)
+        self.assertEqual(expected[3]["title"], "Сайт 3")
+        self.assertEqual(expected[3]["notes"], rows[3]["notes"])
+        for chunk in (1, 7, 100):
+            self.assertEqual(list(iter_bitwarden_entries(io.StringIO(text), chunk=chunk)), expected)
+        # числа, разрезанные границей фрагмента после ".", "e" или "-"
+        numbers = '{"v": 12.5e3, "n": -7, "x": [1.25E-3, 0], "items": [{"name": "a", "revisionDate": 170}], "z": 42}'
+        for chunk in range(1, 16):
+            parsed = list(iter_bitwarden_entries(io.StringIO(numbers), chunk=chunk))
+            self.assertEqual([e["title"] for e in parsed], ["a"], chunk)
+        with self.assertRaises(ValueError):
+            list(iter_bitwarden_entries(io.StringIO('{"encrypted": true, "items": []}')))
+        with self.assertRaises(ValueError):
+            list(iter_bitwarden_entries(io.StringIO(text[: len(text) // 2]), chunk=64))
+
+    def test_streaming_import_budget(self):
+        # IMP-STREAM: файл читается построчно — пик памяти не растёт с размером файла;
+        # лимит по числу записей, replace не очищает хранилище, если файл не прошёл проверку
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+
+        def write_csv(n):
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write("\n\n" + ",".join(CSV_FIELDS) + "\n")
+                for i in range(n):
+                    f.write("Site%d,user%d,pw%d,https://s%d.example.com,work,%s\n" % (i, i, i, i, "n" * 40))
+
+        def peak(n):
+            write_csv(n)
+            importer = VaultImporter(max_rows=n)
+            tracemalloc.start()
+            try:
+                count = sum(1 for _ in importer.iter_file(path))
+                return count, tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        try:
+            small = peak(1000)
+            big = peak(50000)
+            self.assertEqual((small[0], big[0]), (1000, 50000))
+            self.assertGreater(os.path.getsize(path), 4 * 1024 * 1024)
+            self.assertLess(big[1], max(small[1] * 2, 1024 * 1024))
+
+            deleted = []
+            batches = []
+            importer = VaultImporter(
+                create_entries=lambda items: batches.append(len(items)) or items,
+                delete_all=lambda: deleted.append(True),
+                max_rows=49999,
+            )
+            with self.assertRaises(ValueError):
+                importer.import_file(path, "replace")
+            self.assertEqual((deleted, batches), ([], []))
+
+            write_csv(1200)
+            result = importer.import_file(path, "replace")
+            self.assertEqual((deleted, batches, result.added_count), ([True], [500, 500, 200], 1200))
+        finally:
+            os.unlink(path)
+
+    def test_export_v2_container(self):
+        # EXP-2 v2: чанки по CHUNK_ENTRIES, произвольный доступ к чанку, подпись индекса, импорт по чанкам
+        rows = [dict(SAMPLE[0], id=i + 1, title="Site%d" % i) for i in range(600)]
+        exporter = VaultExporter(lambda: rows)
+        fd, path = tempfile.mkstemp(suffix=".csx")
+        os.close(fd)
+        try:
+            exporter.write_encrypted_v2_file(path, "exp-pass", options=ExportOptions(compress=True))
+            with open(path, "rb") as f:
+                data = f.read()
+                self.assertEqual(detect_format(data[:64]), "encrypted_v2")
+                reader = ExportV2Reader(f, "exp-pass")
+                self.assertEqual((reader.chunk_count, reader.entry_count), (3, 600))
+                self.assertEqual(reader.read_chunk(2)[0]["title"], "Site512")
+                self.assertEqual([e["title"] for e in reader.iter_entries()], [r["title"] for r in rows])
+
+            result = VaultImporter().import_file(path, "dry_run", export_password="exp-pass")
+            self.assertEqual(result.added_count, 600)
+            self.assertEqual(result.added_sample[-1]["title"], "Site%d" % (len(result.added_sample) - 1))
+
+            # подмена байта в чанке 1 — ошибка только при чтении этого чанка
+            tampered = bytearray(data)
+            tampered[reader._chunks[1][0] + 5] ^= 1
+            bad = io.BytesIO(bytes(tampered))
+            bad_reader = ExportV2Reader(bad, "exp-pass")
+            self.assertEqual(len(bad_reader.read_chunk(0)), 256)
+            with self.assertRaises(ValueError):
+                bad_reader.read_chunk(1)
+            # обрезка и неверный пароль — до первой записи
+            with self.assertRaises(ValueError):
+                ExportV2Reader(io.BytesIO(data[:-10]), "exp-pass")
+            with self.assertRaises(Exception):
+                ExportV2Reader(io.BytesIO(data), "wrong-pass")
+        finally:
+            os.unlink(path)
+
+        buf = io.BytesIO()
+        self.assertEqual(write_encrypted_export_v2(buf, [], "p"), 0)
+        self.assertEqual(list(ExportV2Reader(buf, "p").iter_entries()), [])
+
+    def test_compression_codecs(self):
+        text = json.dumps([dict(SAMPLE[0], title="Site%d" % i) for i in range(500)]).encode("utf-8")
+        for name in available_codecs():
+            codec = get_codec(name)
+            self.assertEqual(codec.decompress(codec.compress(text)), text, name)
+            # поток: вход и сжатые данные кусками произвольной длины
+            packed = b"".join(codec.iter_compress(text[i:i + 777] for i in range(0, len(text), 777)))
+            pieces = (packed[i:i + 100] for i in range(0, len(packed), 100))
+            self.assertEqual(b"".join(codec.iter_decompress(pieces)), text, name)
+        self.assertEqual(get_codec(True).spec, "gzip:9")
+        self.assertEqual(get_codec(False).spec, "none")
+        for bad in ("nope", "zlib:42", "zlib:x"):
+            with self.assertRaises(ValueError):
+                get_codec(bad)
+        with self.assertRaises(ValueError):
+            VaultExporter(lambda: SAMPLE).export_encrypted_json("p", options=ExportOptions(compress="nope"))
+        self.assertEqual(select_codec(os.urandom(4096)).spec, "none")
+        self.assertNotEqual(select_codec(text).spec, "none")
+
+        # v1: кодек в metadata; пакет до кодеков (только compressed) читается как gzip
+        pkg = build_encrypted_export(SAMPLE, "p", compress="lzma:1")
+        self.assertEqual(pkg["metadata"]["compression"], "lzma:1")
+        # compressed для старых читателей означает gzip; другой кодек — версия пакета 2
+        self.assertFalse(pkg["metadata"]["compressed"])
+        self.assertEqual(pkg["metadata"]["version"], 2)
+        self.assertEqual(parse_encrypted_export(pkg, "p")[0]["title"], "Site")
+        legacy = build_encrypted_export(SAMPLE, "p", compress=True)
+        self.assertTrue(legacy["metadata"]["compressed"])
+        self.assertEqual(legacy["metadata"]["version"], 1)
+        del legacy["metadata"]["compression"]
+        self.assertEqual(parse_encrypted_export(legacy, "p")[0]["title"], "Site")
+
+        # QR: payload без codec — zlib
+        payload = qr_codec.build_payload("share_link", {"url": "https://example.com/" + "a" * 200})
+        self.assertEqual(qr_codec.decode_chunks(qr_codec.encode_chunks(payload))["data"]["url"][-3:], "aaa")
+        inner = json.dumps({"type": "public_key", "data": {"pem": "x"}}, sort_keys=True).encode("utf-8")
+        old = {"v": 1, "blob": base64.b64encode(zlib.compress(inner)).decode("ascii")}
+        old["checksum"] = qr_codec._checksum(json.dumps(old, sort_keys=True).encode("utf-8"))
+        self.assertEqual(qr_codec.decode_chunks(qr_codec.encode_chunks(old))["data"], {"pem": "x"})
+
+    def test_perf_export_codecs(self):
+        # EXP-PERF: размер и время экспорта v2 синтетического хранилища на 50k записей по кодекам
+        rnd = random.Random(1)
+        words = ["mail", "bank", "shop", "git", "cloud", "work", "home", "news", "forum", "game"]
+        alphabet = "abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789!@#$%"
+        rows = [
+            {
+                "title": "%s %d" % (rnd.choice(words).title(), i),
+                "username": "user%d@example.com" % rnd.randrange(5000),
+                "password": "".join(rnd.choice(alphabet) for _ in range(16)),
+                "url": "https://%s.%s.com/login" % (rnd.choice(words), rnd.choice(words)),
+                "category": rnd.choice(words),
+                "notes": " ".join(rnd.choice(words) for _ in range(rnd.randrange(20))),
+            }
+            for i in range(50000)
+        ]
+        results = {}
+        for spec in (False, "zlib:1", "zlib:6", True, "lzma:1", "auto"):
+            buf = io.BytesIO()
+            started = time.perf_counter()
+            write_encrypted_export_v2(buf, rows, "exp-pass", compress=spec)
+            results[spec] = (len(buf.getvalue()), time.perf_counter() - started)
+            if spec == "auto":
+                self.assertEqual(sum(1 for _ in ExportV2Reader(buf, "exp-pass").iter_entries()), 50000)
+        _log.info("EXP-PERF 50k: %s", ", ".join(
+            "%s %.0f KB %.2f s" % (get_codec(k).spec if k != "auto" else k, n / 1024, t) for k, (n, t) in results.items()
+        ))
+        plain = results[False][0]
+        self.assertLess(results["zlib:1"][0], plain / 2)
+        self.assertLessEqual(results["auto"][0], results["zlib:1"][0])
+
     def test_rsa_wrapped_export(self):
         priv, pub = generate_rsa_keypair()
         pkg = build_encrypted_export(SAMPLE, "", recipient_public_key_pem=pub)
@@ -90,13 +370,66 @@ class TestSprint6ImportExport(unittest.TestCase):
         payload = qr_codec.build_payload("public_key", {"fingerprint": "abc", "pem": "test"})
         chunks = qr_codec.encode_chunks(payload)
         self.assertGreaterEqual(len(chunks), 1)
-        with mock.patch.object(qr_codec, "MAX_CHUNK_LEN", 120):
-            big = qr_codec.build_payload("share_package", {"blob_hint": "y" * 400})
-            multi = qr_codec.encode_chunks(big)
+        big = qr_codec.build_payload("share_package", {"blob_hint": "y" * 400})
+        multi = qr_codec.encode_chunks(big, version=3)
         self.assertGreater(len(multi), 1)
         decoded = qr_codec.decode_chunks(multi)
         self.assertEqual(decoded["type"], "share_package")
 
+    def test_qr_binary_frames(self):
+        # QR-2: base45 (RFC 9285), ёмкость по версии/уровню, сборка в любом порядке с повторами
+        self.assertEqual(qr_codec.base45_encode(b"Hello!!"), "%69 VD92EX0")
+        self.assertEqual(qr_codec.base45_decode("UJCLQE7W581"), b"base-45")
+        with self.assertRaises(ValueError):
+            qr_codec.base45_decode("GGW")
+        self.assertEqual(
+            [qr_codec.alphanumeric_capacity(v, ec) for v, ec in ((1, "L"), (1, "H"), (10, "M"), (20, "M"), (40, "L"))],
+            [25, 10, 311, 970, 4296],
+        )
+
+        _, pub = generate_rsa_keypair()
+        rnd = random.Random(7)
+        noise = "".join(rnd.choice("0123456789abcdef") for _ in range(6000))
+        payload = qr_codec.build_payload("share_package", {"pem": pub, "blob": noise})
+        chunks = qr_codec.encode_chunks(payload, version=10, error_correction="M")
+        self.assertTrue(all(len(c) <= 311 for c in chunks))
+        self.assertTrue(all(set(c) <= set(qr_codec.BASE45_ALPHABET) for c in chunks))
+        # прежний транспорт (CSM1): JSON + base64, кадры по 900 символов снова в JSON, байтовый режим QR (8 бит)
+        legacy_raw = json.dumps(payload, sort_keys=True)
+        parts = [legacy_raw[i:i + 900] for i in range(0, len(legacy_raw), 900)]
+        legacy = ["CSM1:" + json.dumps({"v": 1, "chunk": i, "total": len(parts), "data": part})
+                  for i, part in enumerate(parts)]
+        new_bits = sum(len(c) for c in chunks) * 5.5
+        legacy_bits = sum(len(line) for line in legacy) * 8
+        _log.info("QR-2 bits: CSM1 %d, CSM2 %d (x%.2f)", legacy_bits, new_bits, legacy_bits / new_bits)
+        self.assertLess(new_bits * 1.2, legacy_bits)
+
+        assembler = qr_codec.QrAssembler()
+        order = list(reversed(chunks)) + chunks[:2]
+        for n, line in enumerate(order):
+            done = assembler.add(line)
+            self.assertEqual(done, n >= len(chunks) - 1)
+        self.assertEqual((assembler.received, assembler.missing()), (len(chunks), []))
+        self.assertEqual(assembler.result()["data"]["blob"], noise)
+        self.assertEqual(qr_codec.decode_chunks(chunks[1:] + chunks[:1])["data"]["pem"], pub)
+
+        partial = qr_codec.QrAssembler()
+        partial.add(chunks[1])
+        self.assertEqual(partial.missing(), [0] + list(range(2, len(chunks))))
+        with self.assertRaises(ValueError):
+            partial.result()
+        other = qr_codec.encode_chunks(qr_codec.build_payload("share_link", {"url": noise[:3000]}), version=10)
+        with self.assertRaises(ValueError):
+            partial.add(other[0])
+        broken = chunks[0][:-3] + ("0" if chunks[0][-3] != "0" else "1") + chunks[0][-2:]
+        with self.assertRaises(ValueError):
+            qr_codec.QrAssembler().add(broken)
+        with self.assertRaises(ValueError):
+            qr_codec.encode_chunks(payload, version=1, error_correction="H")
+
+        # CSM1 по-прежнему читается
+        self.assertEqual(qr_codec.decode_chunks(legacy[::-1])["data"]["pem"], pub)
+
     def test_contacts(self):
         _, pub = generate_rsa_keypair()
         fp = public_key_fingerprint(pub)